@@ -0,0 +1,402 @@
+import asyncio
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+
+class QueueFullError(Exception):
+    """Raised when a run is shed instead of queued (or waited past its deadline)."""
+
+    def __init__(self, message: str, retry_after: int = 5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# Counter stores hold the global in-flight count (and the current limit) so
+# every worker process admits against the same numbers.
+
+class MemoryCounterStore:
+    """Single-process stand-in for the shared store."""
+
+    def __init__(self):
+        self._counters: dict[str, int] = {}
+        self._values: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, name: str, limit: int) -> bool:
+        with self._lock:
+            if self._counters.get(name, 0) >= limit:
+                return False
+            self._counters[name] = self._counters.get(name, 0) + 1
+            return True
+
+    def release(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] = max(self._counters.get(name, 0) - 1, 0)
+
+    def total(self, name: str) -> int:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def get_value(self, name: str, default: float) -> float:
+        with self._lock:
+            return self._values.get(name, default)
+
+    def set_value(self, name: str, value: float) -> None:
+        with self._lock:
+            self._values[name] = value
+
+    def init_value(self, name: str, value: float) -> None:
+        with self._lock:
+            self._values.setdefault(name, value)
+
+
+class SQLiteCounterStore:
+    """Shared by the worker processes of one host through a SQLite file.
+
+    Each process keeps its own row per counter, so the rows of a worker that
+    died (its pid is gone) are simply dropped instead of leaking slots.
+    """
+
+    def __init__(self, path: str):
+        self.worker = os.getpid()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS admission_counters ("
+            "name TEXT NOT NULL, worker INTEGER NOT NULL, value INTEGER NOT NULL, PRIMARY KEY (name, worker))"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS admission_values (name TEXT PRIMARY KEY, value REAL NOT NULL)")
+        self.purge_dead_workers()
+
+    def purge_dead_workers(self) -> None:
+        with self._lock:
+            workers = [row[0] for row in self._conn.execute("SELECT DISTINCT worker FROM admission_counters")]
+            for worker in workers:
+                if worker == self.worker or not pid_alive(worker):
+                    self._conn.execute("DELETE FROM admission_counters WHERE worker = ?", (worker,))
+
+    def try_acquire(self, name: str, limit: int) -> bool:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                total = self._conn.execute(
+                    "SELECT COALESCE(SUM(value), 0) FROM admission_counters WHERE name = ?", (name,)
+                ).fetchone()[0]
+                if total >= limit:
+                    return False
+                self._conn.execute(
+                    "INSERT INTO admission_counters (name, worker, value) VALUES (?, ?, 1) "
+                    "ON CONFLICT (name, worker) DO UPDATE SET value = value + 1",
+                    (name, self.worker),
+                )
+                return True
+            finally:
+                self._conn.execute("COMMIT")
+
+    def release(self, name: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE admission_counters SET value = MAX(value - 1, 0) WHERE name = ? AND worker = ?",
+                (name, self.worker),
+            )
+
+    def total(self, name: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COALESCE(SUM(value), 0) FROM admission_counters WHERE name = ?", (name,)
+            ).fetchone()[0]
+
+    def get_value(self, name: str, default: float) -> float:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM admission_values WHERE name = ?", (name,)).fetchone()
+        return row[0] if row is not None else default
+
+    def set_value(self, name: str, value: float) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO admission_values (name, value) VALUES (?, ?)", (name, value))
+
+    def init_value(self, name: str, value: float) -> None:
+        # Keeps the value other workers already set (e.g. the limit they learned)
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO admission_values (name, value) VALUES (?, ?)", (name, value))
+
+
+class RedisCounterStore:
+    """Shared across hosts through any Redis-compatible server. Counters expire
+    after `ttl` seconds without activity, so slots of a crashed worker heal."""
+
+    ACQUIRE_SCRIPT = """
+    local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+    if current >= tonumber(ARGV[1]) then return 0 end
+    redis.call('INCR', KEYS[1])
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    return 1
+    """
+    RELEASE_SCRIPT = """
+    local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+    if current > 0 then redis.call('DECR', KEYS[1]) end
+    return 1
+    """
+
+    def __init__(self, url: str, prefix: str = "media-rec:admission:", ttl: int = 600):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("`redis` not installed. Please install using `pip install redis`")
+        self.prefix = prefix
+        self.ttl = ttl
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+        self._acquire = self._client.register_script(self.ACQUIRE_SCRIPT)
+        self._release = self._client.register_script(self.RELEASE_SCRIPT)
+
+    def try_acquire(self, name: str, limit: int) -> bool:
+        return bool(self._acquire(keys=[self.prefix + name], args=[limit, self.ttl]))
+
+    def release(self, name: str) -> None:
+        self._release(keys=[self.prefix + name])
+
+    def total(self, name: str) -> int:
+        return int(self._client.get(self.prefix + name) or 0)
+
+    def get_value(self, name: str, default: float) -> float:
+        value = self._client.get(self.prefix + "value:" + name)
+        return float(value) if value is not None else default
+
+    def set_value(self, name: str, value: float) -> None:
+        self._client.set(self.prefix + "value:" + name, value)
+
+    def init_value(self, name: str, value: float) -> None:
+        self._client.set(self.prefix + "value:" + name, value, nx=True)
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def create_counter_store(name: str, path: str = "admission.db", redis_url: Optional[str] = None):
+    if name == "memory":
+        return MemoryCounterStore()
+    if name == "sqlite":
+        return SQLiteCounterStore(path)
+    if name == "redis":
+        return RedisCounterStore(redis_url or "redis://localhost:6379/0")
+    raise ValueError(f"Unknown admission store: {name}")
+
+
+class AdmissionController:
+    """Global admission for agent runs with an AIMD concurrency limit.
+
+    The limit grows by about one slot per `limit` successful runs and is cut
+    by `decrease_factor` (at most once per `cooldown`) when an upstream answers
+    429/503 or a run takes longer than `latency_target`. Runs over the limit
+    wait up to `queue_timeout`; a run is shed right away, with a Retry-After
+    estimate, when `max_queue` runs already wait or the estimated wait is
+    past the deadline.
+
+    Shared stores (SQLite, Redis) are called in a thread, never on the event
+    loop; the limit and in-flight count they last returned are kept for the
+    synchronous checks (`should_shed`, `stats`).
+    """
+
+    COUNTER = "agent_runs"
+
+    def __init__(
+        self,
+        store,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        max_queue: int = 64,
+        queue_timeout: float = 30.0,
+        latency_target: float = 60.0,
+        decrease_factor: float = 0.5,
+        cooldown: float = 5.0,
+        poll_interval: float = 0.1,
+    ):
+        self.store = store
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.poll_interval = poll_interval
+        self.store.init_value("limit", float(min(max(initial_limit, min_limit), max_limit)))
+        self._blocking = not isinstance(store, MemoryCounterStore)
+        self._lock = threading.Lock()
+        self._limit = self.store.get_value("limit", float(min_limit))
+        self._in_flight = self.store.total(self.COUNTER)
+        self._condition: Optional[asyncio.Condition] = None
+        self._last_decrease = 0.0
+        self.avg_run_seconds: Optional[float] = None
+        self.running = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.increases = 0
+        self.decreases = 0
+        self.throttled = 0
+
+    @property
+    def limit(self) -> float:
+        return self._limit
+
+    def _set_limit(self, limit: float) -> None:
+        self._limit = min(max(limit, self.min_limit), self.max_limit)
+        self.store.set_value("limit", self._limit)
+
+    def _current_limit(self) -> float:
+        return self.store.get_value("limit", float(self.min_limit))
+
+    def increase(self) -> None:
+        with self._lock:
+            limit = self._current_limit()
+            self._set_limit(limit + 1 / limit)
+            self.increases += 1
+
+    def decrease(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_decrease < self.cooldown:
+                return
+            self._last_decrease = now
+            self._set_limit(self._current_limit() * self.decrease_factor)
+            self.decreases += 1
+
+    def observe_upstream(self, host: str, status_code: int, seconds: float) -> None:
+        """Hook for the HTTP pool: upstream throttling shrinks the limit."""
+        if status_code in (429, 503):
+            self.throttled += 1
+            self.decrease()
+
+    async def _call(self, fn, *args):
+        return await asyncio.to_thread(fn, *args) if self._blocking else fn(*args)
+
+    def _refresh(self) -> None:
+        self._limit = self._current_limit()
+        self._in_flight = self.store.total(self.COUNTER)
+
+    def _try_acquire(self) -> bool:
+        self._limit = self._current_limit()
+        acquired = self.store.try_acquire(self.COUNTER, max(int(self._limit), 1))
+        self._in_flight = self.store.total(self.COUNTER)
+        return acquired
+
+    async def _acquire_slot(self) -> bool:
+        if not self._blocking:
+            return self._try_acquire()
+        attempt = asyncio.ensure_future(asyncio.to_thread(self._try_acquire))
+        try:
+            return await asyncio.shield(attempt)
+        except asyncio.CancelledError:
+            # A thread já pode ter pego a vaga: devolve quando terminar
+            def give_back(future: asyncio.Future) -> None:
+                if not future.cancelled() and future.exception() is None and future.result():
+                    asyncio.ensure_future(asyncio.to_thread(self.store.release, self.COUNTER))
+            attempt.add_done_callback(give_back)
+            raise
+
+    def _release(self, seconds: Optional[float]) -> None:
+        self.store.release(self.COUNTER)
+        if seconds is not None:
+            if seconds > self.latency_target:
+                self.decrease()
+            else:
+                self.increase()
+        self._refresh()
+
+    def estimated_wait(self) -> float:
+        if self.avg_run_seconds is None or self._in_flight < int(self.limit):
+            return 0.0
+        return (self.waiting + 1) * self.avg_run_seconds / max(int(self.limit), 1)
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.estimated_wait() or self.poll_interval))
+
+    def should_shed(self) -> bool:
+        return self.waiting >= self.max_queue or self.estimated_wait() > self.queue_timeout
+
+    def _reject(self, reason: str) -> QueueFullError:
+        self.rejected += 1
+        return QueueFullError(f"Agent runs over capacity ({reason})", retry_after=self.retry_after())
+
+    async def acquire(self) -> None:
+        await self._call(self._refresh)
+        if self.waiting >= self.max_queue:
+            raise self._reject(f"{self.waiting} runs waiting")
+        if self.estimated_wait() > self.queue_timeout:
+            raise self._reject(f"estimated wait over {self.queue_timeout:.0f}s")
+
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        deadline = time.monotonic() + self.queue_timeout
+        self.waiting += 1
+        try:
+            while not await self._acquire_slot():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timed_out += 1
+                    raise self._reject(f"no slot within {self.queue_timeout:.0f}s")
+                # Local releases notify; slots freed by other workers are picked up by polling
+                async with self._condition:
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), min(remaining, self.poll_interval))
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            self.waiting -= 1
+        self.admitted += 1
+        self.running += 1
+
+    async def release(self, seconds: Optional[float] = None) -> None:
+        self.running -= 1
+        if seconds is not None:
+            self.avg_run_seconds = seconds if self.avg_run_seconds is None else 0.8 * self.avg_run_seconds + 0.2 * seconds
+        await self._call(self._release, seconds)
+        if self._condition is not None:
+            async with self._condition:
+                self._condition.notify()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        started_at = time.perf_counter()
+        succeeded = False
+        try:
+            yield
+            succeeded = True
+        finally:
+            # Failed runs say nothing about upstream latency
+            await self.release(time.perf_counter() - started_at if succeeded else None)
+
+    def stats(self) -> dict:
+        return {
+            "store": type(self.store).__name__,
+            "limit": self.limit,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self._in_flight,
+            "running": self.running,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "throttled": self.throttled,
+            "avg_run_seconds": self.avg_run_seconds or 0.0,
+        }
@@ -0,0 +1,335 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Optional
+
+from agno.agent import Agent
+from agno.run.response import RunResponseContentEvent
+from agno.utils.string import parse_response_model_str
+from pydantic import BaseModel
+
+import deadlines
+from admission import AdmissionController
+from metrics import REPAIRED_ITEMS, STAGE_SECONDS, TOOL_SECONDS, observe_run_messages
+from repair import RepairReport, list_field, merge_reports, parse_list, reprompt
+from prompts import PromptAssembler
+from run_store import RunStore, tool_calls_of
+
+
+def tool_timing_hook(agent: Agent, function_name: str, function_call: Callable, arguments: dict) -> Any:
+    start = time.perf_counter()
+    try:
+        return function_call(**arguments)
+    finally:
+        elapsed = time.perf_counter() - start
+        agent_name = agent.name if agent is not None else ""
+        TOOL_SECONDS.observe(elapsed, agent=agent_name, tool=function_name)
+        STAGE_SECONDS.observe(elapsed, agent=agent_name, stage="tool")
+
+
+def deadline_tool_hook(agent: Agent, function_name: str, function_call: Callable, arguments: dict) -> Any:
+    remaining = deadlines.remaining()
+    if remaining is None:
+        return function_call(**arguments)
+    if remaining <= 0:
+        # O modelo responde com o que já tem
+        return f"Error: request deadline exceeded, {function_name} was not called"
+    # Tool calls started in time are cut at the deadline by the toolkit (CachedExaTools)
+    return function_call(**arguments)
+
+
+def run_status(error: BaseException) -> str:
+    if isinstance(error, asyncio.CancelledError):
+        return "cancelled"
+    return "timeout" if isinstance(error, TimeoutError) else "error"
+
+
+def parse_content(agent: Agent, content: Any) -> RepairReport:
+    """Same parsing agno does for `response_model`, done here so it can be timed.
+    List models (ListBooks/ListVideos) are parsed item by item (see repair.py)."""
+    if agent.response_model is None:
+        return RepairReport(content)
+    if list_field(agent.response_model) is not None:
+        return parse_list(agent.response_model, content)
+    if not isinstance(content, str):
+        return RepairReport(content)
+    parsed = parse_response_model_str(content, agent.response_model)
+    return RepairReport(parsed if parsed is not None else content)
+
+
+def run_copy(agent: Agent, hooks: tuple[Callable, ...] = ()) -> Agent:
+    # The module level agents keep per-run state (run_id, messages, session),
+    # so each run gets its own copy instead of sharing the instance.
+    return agent.deep_copy(update={
+        "parse_response": False,
+        "tool_hooks": (agent.tool_hooks or []) + [tool_timing_hook, deadline_tool_hook, *hooks],
+    })
+
+
+def tool_calls_of_all(responses: list) -> list[dict]:
+    return [call for response in responses for call in tool_calls_of(response)]
+
+
+def raw_output(response: Any) -> Any:
+    """Model text before parsing: Gemini parses structured output natively, so
+    the content may already be a model while the message keeps the text."""
+    for message in reversed(response.messages or []):
+        if message.role == "assistant" and isinstance(message.content, str) and message.content:
+            return message.content
+    content = response.content
+    return content.model_dump_json() if isinstance(content, BaseModel) else content
+
+
+def run_tokens(messages: Optional[list]) -> dict:
+    tokens = {"input": 0, "output": 0}
+    for message in messages or []:
+        if message.role == "assistant" and message.metrics is not None:
+            tokens["input"] += message.metrics.input_tokens or 0
+            tokens["output"] += message.metrics.output_tokens or 0
+    return tokens
+
+
+def model_seconds(messages: Optional[list]) -> float:
+    return sum(
+        message.metrics.time or 0.0 for message in messages or []
+        if message.role == "assistant" and message.metrics is not None
+    )
+
+
+def count_list_items(agent: Agent, content: Any) -> Optional[int]:
+    field = list_field(agent.response_model) if agent.response_model is not None else None
+    if field is None or not isinstance(content, agent.response_model):
+        return None
+    return len(getattr(content, field))
+
+
+class AgentRunner:
+    """Runs agents on their async API, each run holding a slot from the
+    AdmissionController (which may queue it or reject it with `QueueFullError`).
+
+    With a `run_store`, every run (prompt, model, tool calls, raw output,
+    parsed result, timings) is also recorded under its cache `key`. With
+    `prompts`, the user message is assembled (and budgeted) by the
+    PromptAssembler, and tool calls are refused once the run's input tokens
+    pass its budget (each tool result is sent back with the whole context).
+    Model calls stop at the request deadline (deadlines.py), tool calls are
+    not made after it, and re-prompts are skipped when the time left is
+    shorter than the first call took.
+    """
+
+    def __init__(
+        self,
+        admission: AdmissionController,
+        expected_items: int = 12,
+        max_reprompts: int = 1,
+        run_store: Optional[RunStore] = None,
+        prompts: Optional[PromptAssembler] = None,
+    ):
+        self.admission = admission
+        self.run_store = run_store
+        self.prompts = prompts
+        self.expected_items = expected_items
+        self.max_reprompts = max_reprompts
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.repaired = 0
+        self.dropped = 0
+        self.truncated = 0
+        self.reprompts = 0
+        self._hooks = (self._budget_tool_hook,) if prompts is not None and prompts.max_input_tokens else ()
+
+    @property
+    def queue_full(self) -> bool:
+        return self.admission.should_shed()
+
+    @asynccontextmanager
+    async def _slot(self, agent_name: str):
+        queued_at = time.perf_counter()
+        async with self.admission.slot():
+            STAGE_SECONDS.observe(time.perf_counter() - queued_at, agent=agent_name, stage="queue")
+            self.running += 1
+            started_at = time.perf_counter()
+            try:
+                yield
+                self.completed += 1
+            except BaseException:
+                self.failed += 1
+                raise
+            finally:
+                self.running -= 1
+                STAGE_SECONDS.observe(time.perf_counter() - started_at, agent=agent_name, stage="total")
+
+    def _parse(self, agent: Agent, content: Any) -> RepairReport:
+        parse_started_at = time.perf_counter()
+        report = parse_content(agent, content)
+        STAGE_SECONDS.observe(time.perf_counter() - parse_started_at, agent=agent.name, stage="parse")
+        self.repaired += report.repaired
+        self.dropped += report.dropped
+        self.truncated += report.truncated
+        for outcome, count in (("repaired", report.repaired), ("dropped", report.dropped), ("truncated", report.truncated)):
+            if count:
+                REPAIRED_ITEMS.inc(count, agent=agent.name, outcome=outcome)
+        return report
+
+    def _record(
+        self,
+        agent: Agent,
+        prompt: str,
+        key: Optional[str],
+        started_at: float,
+        status: str,
+        responses: list,
+        raw_outputs: list,
+        content: Any = None,
+        error: Optional[BaseException] = None,
+        stream: bool = False,
+    ) -> None:
+        messages = [message for response in responses for message in (response.messages or [])]
+        tokens = run_tokens(messages)
+        if self.prompts is not None:
+            self.prompts.observe(agent, tokens)
+        if self.run_store is None:
+            return
+        seconds = time.perf_counter() - started_at
+        items = count_list_items(agent, content)
+        tool_calls = tool_calls_of_all(responses)
+        try:
+            self.run_store.record({
+                "created_at": time.time(),
+                "agent": agent.name,
+                "model": getattr(agent.model, "id", None),
+                "response_model": agent.response_model.__name__ if agent.response_model is not None else None,
+                "key": key,
+                "prompt": prompt,
+                "status": status,
+                "error": f"{type(error).__name__}: {error}" if error is not None else None,
+                "items": items,
+                "seconds": seconds,
+                "timings": {
+                    "model": model_seconds(messages),
+                    "tool": sum(call["seconds"] or 0.0 for call in tool_calls),
+                    "model_calls": len(raw_outputs),
+                    "tokens": tokens,
+                    "stream": stream,
+                    "prompt_version": self.prompts.version(agent) if self.prompts is not None else None,
+                },
+                "tool_calls": tool_calls,
+                "raw_output": raw_outputs,
+                "parsed": content.model_dump(mode="json") if items is not None else None,
+            })
+        except Exception as e:
+            # Gravar a execução nunca deve derrubar a requisição
+            print(f"Error details: run store: {str(e)}")
+
+    def _message(self, agent: Agent, prompt: str) -> str:
+        return self.prompts.assemble(agent, prompt) if self.prompts is not None else prompt
+
+    def _over_budget(self, agent: Agent, responses: list) -> bool:
+        if self.prompts is None:
+            return False
+        messages = [message for response in responses for message in (response.messages or [])]
+        return self.prompts.over_budget(agent, run_tokens(messages)["input"])
+
+    def _budget_tool_hook(self, agent: Agent, function_name: str, function_call: Callable, arguments: dict) -> Any:
+        run_messages = agent.run_messages if agent is not None else None
+        messages = run_messages.messages if run_messages is not None else []
+        if self.prompts.over_budget(agent, run_tokens(messages)["input"]):
+            # O modelo responde com o que já tem, sem aumentar o contexto
+            return f"Error: input token budget used, {function_name} was not called"
+        return function_call(**arguments)
+
+    async def run(
+        self,
+        agent: Agent,
+        prompt: str,
+        expected_items: Optional[int] = None,
+        key: Optional[str] = None,
+        **kwargs: Any,
+    ) -> Any:
+        """Runs the agent once; list answers that lost items to broken or cut-off
+        JSON get up to `max_reprompts` follow-ups asking only for the missing
+        count, unless the run already used its input token budget or would
+        not finish before the deadline."""
+        async with self._slot(agent.name):
+            started_at = time.perf_counter()
+            responses, raw_outputs = [], []
+            try:
+                run_agent = run_copy(agent, self._hooks)
+                response = await deadlines.wait_for_deadline(
+                    run_agent.arun(self._message(agent, prompt), stream=False, **kwargs)
+                )
+                first_call_seconds = time.perf_counter() - started_at
+                responses.append(response)
+                raw_outputs.append(raw_output(response))
+                observe_run_messages(agent.name, response.messages)
+                report = self._parse(agent, response.content)
+
+                field = list_field(agent.response_model) if agent.response_model is not None else None
+                for _ in range(self.max_reprompts if field else 0):
+                    missing = report.missing(expected_items or self.expected_items)
+                    if not missing or self._over_budget(agent, responses):
+                        break
+                    remaining = deadlines.remaining()
+                    if remaining is not None and remaining < first_call_seconds:
+                        break
+                    # O que já foi parseado é a resposta parcial se o prazo acabar no re-prompt
+                    deadlines.offer(report.content)
+                    self.reprompts += 1
+                    REPAIRED_ITEMS.inc(agent=agent.name, outcome="reprompted")
+                    follow_up = await deadlines.wait_for_deadline(run_agent.arun(
+                        self._message(agent, reprompt(prompt, report.content, field, missing)), stream=False, **kwargs
+                    ))
+                    responses.append(follow_up)
+                    raw_outputs.append(raw_output(follow_up))
+                    observe_run_messages(agent.name, follow_up.messages)
+                    report = merge_reports(agent.response_model, field, report, self._parse(agent, follow_up.content))
+            except BaseException as e:
+                self._record(agent, prompt, key, started_at, run_status(e), responses, raw_outputs, error=e)
+                raise
+
+            response.content = report.content
+            self._record(agent, prompt, key, started_at, "ok", responses, raw_outputs, report.content)
+            return response
+
+    async def stream(self, agent: Agent, prompt: str, key: Optional[str] = None, **kwargs: Any) -> AsyncIterator[str]:
+        """Yields the raw text deltas of a streamed run, holding a slot until it ends.
+
+        Agno only streams model output when it does not parse the response
+        itself, so the copy keeps `response_model` (the schema is still sent to
+        the model) but has `parse_response` disabled.
+        """
+        async with self._slot(agent.name):
+            started_at = time.perf_counter()
+            run_agent = run_copy(agent, self._hooks)
+            chunks = []
+            try:
+                async for event in await run_agent.arun(self._message(agent, prompt), stream=True, **kwargs):
+                    if isinstance(event, RunResponseContentEvent) and isinstance(event.content, str):
+                        chunks.append(event.content)
+                        yield event.content
+            except BaseException as e:
+                responses = [run_agent.run_response] if run_agent.run_response is not None else []
+                self._record(
+                    agent, prompt, key, started_at, run_status(e), responses, ["".join(chunks)], error=e, stream=True
+                )
+                raise
+            responses = []
+            if run_agent.run_response is not None:
+                responses.append(run_agent.run_response)
+                observe_run_messages(agent.name, run_agent.run_response.messages)
+            text = "".join(chunks)
+            # Só vale parsear de novo quando a execução vai ser gravada
+            content = parse_content(agent, text).content if self.run_store is not None else None
+            self._record(agent, prompt, key, started_at, "ok", responses, [text], content, stream=True)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "repaired_items": self.repaired,
+            "dropped_items": self.dropped,
+            "truncated_runs": self.truncated,
+            "reprompts": self.reprompts,
+        }
@@ -0,0 +1,190 @@
+import os
+import threading
+from functools import lru_cache
+from textwrap import dedent
+from typing import Callable, Optional
+
+from agno.agent import Agent
+
+from catalog import Catalog
+from http_pool import HttpPool
+from tool_cache import ToolCache
+from models import ListBooks, ListVideos, Prompts
+
+# The Gemini/Exa modules are heavy to import, so they are only imported when
+# the agents are actually built through a LazyAgent.
+#
+# Descriptions and instructions are the system prefix of every run and must
+# stay byte-identical between runs (Gemini caches repeated prefixes): no
+# dates or per-request data here, those go in the user message (prompts.py).
+
+GEMINI_HOST = "generativelanguage.googleapis.com"
+GEMINI_MODEL_ID = "gemini-2.0-flash-exp"
+
+
+class LazyAgent:
+    """Proxy that builds its Agent on first attribute access (thread-safe)."""
+
+    def __init__(self, factory: Callable[[], Agent]):
+        self._factory = factory
+        self._agent = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._agent is not None
+
+    def load(self) -> Agent:
+        if self._agent is None:
+            with self._lock:
+                if self._agent is None:
+                    self._agent = self._factory()
+        return self._agent
+
+    def __getattr__(self, name: str):
+        return getattr(self.load(), name)
+
+
+@lru_cache(maxsize=None)
+def gemini_model(http_pool: HttpPool, model_id: str = GEMINI_MODEL_ID, max_output_tokens: Optional[int] = None):
+    from agno.models.google import Gemini
+    from google.genai.types import HttpOptions
+
+    # Every run works on a copy of the agent (and builds its own genai client),
+    # so the connections must come from the shared pool to be reused.
+    http_options = HttpOptions(
+        timeout=int(http_pool.timeout.read * 1000),
+        httpx_client=http_pool.client(GEMINI_HOST),
+        httpx_async_client=http_pool.async_client(GEMINI_HOST),
+    )
+    return Gemini(
+        id=model_id,
+        api_key=os.getenv('API_KEY_GEMINI'),
+        max_output_tokens=max_output_tokens,
+        client_params={"http_options": http_options},
+    )
+
+
+def exa_tools(http_pool: HttpPool, text_length_limit: int = 1000, cache: Optional[ToolCache] = None):
+    from agno.tools.exa import ExaTools
+    from exa_client import CachedExaTools, PooledExa
+
+    # text_length_limit: characters of page text per result, the bulk of the tool output sent back to the model
+    options = dict(api_key=os.getenv('API_KEY_EXA'),num_results=12,show_results=True,text_length_limit=text_length_limit)
+    tools = CachedExaTools(cache, **options) if cache is not None else ExaTools(**options)
+    tools.exa = PooledExa(tools.api_key, http_pool)
+    return tools
+
+
+def build_book_recommendation_agent(
+    catalog: Catalog,
+    http_pool: HttpPool,
+    max_output_tokens: Optional[int] = None,
+    tool_text_limit: int = 1000,
+    tool_cache: Optional[ToolCache] = None,
+) -> Agent:
+    return Agent(
+        name="Shelfie",
+        tools=[catalog.search_tool("book"), exa_tools(http_pool, tool_text_limit, tool_cache)],
+        model=gemini_model(http_pool, GEMINI_MODEL_ID, max_output_tokens),
+        description=dedent("""\
+            You are Shelfie, a passionate and knowledgeable literary curator! 📚
+            You help readers discover their next favorite books, combining deep literary knowledge with current ratings and reviews.
+            Do not invent data. If not found, that's okay. Return empty."""),
+        instructions=dedent("""\
+            1. Understand the reader's preferences and requirements (genre, length, content warnings) from their input
+            2. Search the local catalog first (search_local_catalog) and reuse the data it returns; use Exa only for what it does not cover
+            3. Recommend at least 12 books, diverse in authors and perspectives, covering the 3 similarity groups: genre & themes, author & writing style, plot & characters
+            4. Fill the fields with current, verified data: Goodreads/StoryGraph ratings, page count, a brief engaging plot summary, awards, series information, audiobook availability, upcoming adaptations
+            5. Start every genre with an emoji (eg: 📚 🔮 💕 🔪) and give each content advisory an emoji; trigger warnings must differ from content advisories
+            6. Include a brief explanation for each recommendation"""),
+        markdown=False,
+        response_model=ListBooks,
+        show_tool_calls=True,
+    )
+
+
+def build_prompt_recommendation_agent(http_pool: HttpPool) -> Agent:
+    return Agent(
+        name="Prompts",
+        model=gemini_model(http_pool),
+        description=dedent("""\
+            You are a specialist in writing prompts for explore similar books."""),
+        markdown=True,
+        response_model=Prompts,
+    )
+
+
+def build_video_recommendation_agent(
+    catalog: Catalog,
+    http_pool: HttpPool,
+    max_output_tokens: Optional[int] = None,
+    tool_text_limit: int = 1000,
+    tool_cache: Optional[ToolCache] = None,
+) -> Agent:
+    return Agent(
+        name="Cinephile",
+        tools=[catalog.search_tool("video"), exa_tools(http_pool, tool_text_limit, tool_cache)],
+        model=gemini_model(http_pool, GEMINI_MODEL_ID, max_output_tokens),
+        description=dedent("""\
+            You are Cinephile, a movie and TV show expert! 🎬📺
+            You help users discover their next favorite movies and TV shows, combining deep knowledge with current ratings and reviews.
+            Do not invent data. If not found, that's okay. Return empty."""),
+        instructions=dedent("""\
+            1. Understand the user's preferences and requirements (genre, length, content warnings) from their input
+            2. Search the local catalog first (search_local_catalog) and reuse the data it returns; use Exa only for what it does not cover
+            3. Recommend at least 12 movies and TV shows, diverse in creators and perspectives, covering the 3 similarity groups: genre & themes, author & writing style, plot & characters
+            4. Fill the fields with current, verified data: directors and actors, IMDB/TMDB ratings, runtime in minutes, number of seasons (if applicable), streaming services, a brief engaging plot summary, awards
+            5. Start every genre with an emoji (eg: 📚 🔮 💕 🔪) and give each content advisory an emoji; trigger warnings must differ from content advisories
+            6. Include a brief explanation for each recommendation"""),
+        response_model=ListVideos,
+        markdown=True,
+        show_tool_calls=True,
+    )
+
+
+# Fast tier: no tools, a single model call over the catalog records put in the prompt
+def build_fast_book_recommendation_agent(
+    http_pool: HttpPool,
+    model_id: str = GEMINI_MODEL_ID,
+    max_output_tokens: Optional[int] = None,
+) -> Agent:
+    return Agent(
+        name="Shelfie Fast",
+        model=gemini_model(http_pool, model_id, max_output_tokens),
+        description=dedent("""\
+            You are Shelfie, a knowledgeable literary curator recommending books similar to the one a reader enjoyed.
+            Do not invent data. If not known, leave the field empty."""),
+        instructions=dedent("""\
+            - Start from the catalog records given with the request and copy their data as is
+            - Complete the list with books you know well, only filling the fields you are sure about
+            - Ensure similarities by these 3 groups genre & themes, author & writing style, plot & characters
+            - Add emoji indicators for all genres (eg: 📚 🔮 💕 🔪)
+            - Minimum 12 recommendations per query
+            - Include a brief explanation for each recommendation"""),
+        markdown=False,
+        response_model=ListBooks,
+    )
+
+
+def build_fast_video_recommendation_agent(
+    http_pool: HttpPool,
+    model_id: str = GEMINI_MODEL_ID,
+    max_output_tokens: Optional[int] = None,
+) -> Agent:
+    return Agent(
+        name="Cinephile Fast",
+        model=gemini_model(http_pool, model_id, max_output_tokens),
+        description=dedent("""\
+            You are Cinephile, a movie and TV show expert recommending titles similar to the one a user enjoyed.
+            Do not invent data. If not known, leave the field empty."""),
+        instructions=dedent("""\
+            - Start from the catalog records given with the request and copy their data as is
+            - Complete the list with movies and tv shows you know well, only filling the fields you are sure about
+            - Ensure similarities by these 3 groups genre & themes, author & writing style, plot & characters
+            - Add emoji indicators for all genres (eg: 📚 🔮 💕 🔪)
+            - Minimum 12 recommendations per query
+            - Include a brief explanation for each recommendation"""),
+        response_model=ListVideos,
+        markdown=True,
+    )
@@ -0,0 +1,38 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable, Iterable, Optional
+
+
+def group_by_key(values: Iterable[Any], key_func: Callable[[Any], Hashable]) -> dict[Hashable, list[Any]]:
+    """Groups repeated inputs so each distinct key is only computed once."""
+    groups: dict[Hashable, list[Any]] = {}
+    for value in values:
+        groups.setdefault(key_func(value), []).append(value)
+    return groups
+
+
+async def iter_batch(
+    groups: dict[Hashable, list[Any]],
+    worker: Callable[[Any], Awaitable[Any]],
+    max_concurrency: int = 4,
+) -> AsyncIterator[tuple[Hashable, list[Any], Any, Optional[Exception]]]:
+    """Runs `worker(values[0])` for every group with bounded concurrency.
+
+    Yields `(key, values, result, error)` in completion order. Pending work is
+    cancelled if the consumer stops iterating (e.g. the client disconnects).
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_one(key, values):
+        async with semaphore:
+            try:
+                return key, values, await worker(values[0]), None
+            except Exception as e:
+                return key, values, None, e
+
+    tasks = [asyncio.create_task(run_one(key, values)) for key, values in groups.items()]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
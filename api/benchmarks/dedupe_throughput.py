@@ -0,0 +1,86 @@
+"""Times the dedupe stage on a large merged list with injected near-duplicates.
+
+    python benchmarks/dedupe_throughput.py --items 5000 --duplicates 0.3
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedupe import dedupe_items, title_key  # noqa: E402
+from models import Book  # noqa: E402
+
+# Pseudo-words keep titles varied without shipping a word list
+SYLLABLES = (
+    "ka lo mi ne ra shi to va el an or is un dar mor wyn th en gal bri sto ven ash bel cor dra fen gor "
+    "hal jun kel lir mas nor pel quin ros sel tar ul vex wil yor zan ber cal dun eth fal grim"
+).split()
+
+
+def book(title: str, author: str) -> Book:
+    return Book(
+        title=title,
+        author=author,
+        similarity_type="genre & themes",
+        publication_year="2001",
+        explanation="e",
+        genre=["📚 Fiction"],
+        plot_summary="p",
+    )
+
+
+def word() -> str:
+    return "".join(random.choices(SYLLABLES, k=random.randint(1, 3)))
+
+
+def title() -> str:
+    words = [word() for _ in range(random.randint(1, 5))]
+    if random.random() < 0.1:
+        words.append(str(random.randint(1, 9)))
+    return " ".join(words).title()
+
+
+def variant(title: str) -> str:
+    # The kind of drift seen in model output: articles, case, punctuation, series notes
+    return random.choice([
+        lambda t: f"The {t}",
+        lambda t: t.upper(),
+        lambda t: f"{t}.",
+        lambda t: f"{t} (Book One)",
+        lambda t: t.replace(" ", "  "),
+    ])(title)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--duplicates", type=float, default=0.3, help="fraction of items that are near-duplicates")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    unique = int(args.items * (1 - args.duplicates))
+    titles = {}
+    while len(titles) < unique:
+        candidate = title()
+        titles.setdefault(title_key(candidate), candidate)
+    originals = [book(candidate, f"Author {i}") for i, candidate in enumerate(titles.values())]
+    items = originals + [
+        book(variant(original.title), original.author)
+        for original in random.choices(originals, k=args.items - unique)
+    ]
+    random.shuffle(items)
+
+    started_at = time.perf_counter()
+    kept = dedupe_items(items)
+    elapsed = time.perf_counter() - started_at
+    print(f"{len(items)} items -> {len(kept)} kept ({unique} unique) in {elapsed * 1000:.1f} ms")
+    # Random titles can genuinely be near-duplicates of each other, so only missed duplicates fail
+    return 0 if len(kept) <= unique else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
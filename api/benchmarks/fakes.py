@@ -0,0 +1,194 @@
+"""Deterministic local stand-ins for Gemini and Exa, used by the load test.
+
+`FakeGemini` is a real agno Model, so agent runs go through the same agno
+code path (tool calls, hooks, structured output, streaming) as in production;
+only the provider calls are replaced by sleeps and generated payloads. The
+same prompt always produces the same recommendations.
+"""
+import asyncio
+import json
+import time
+import zlib
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from agno.models.base import Model
+from agno.models.response import ModelResponse
+
+import agents
+from http_pool import HttpPool
+
+SIMILARITY_TYPES = ("genre & themes", "author & writing style", "plot & characters")
+
+
+def filler(seed: int, size: int) -> str:
+    words = ("lorem", "ipsum", "dolor", "sit", "amet", "saga", "quest", "mystery", "romance", "epic")
+    text = " ".join(words[(seed + i) % len(words)] for i in range(size // 6 + 1))
+    return text[:size]
+
+
+def fake_book(seed: int, i: int, payload: int) -> dict:
+    return {
+        "title": f"Book {seed}-{i}",
+        "author": f"Author {seed % 97}-{i}",
+        "similarity_type": SIMILARITY_TYPES[i % 3],
+        "publication_year": str(1950 + (seed + i) % 70),
+        "explanation": filler(seed + i, payload // 2),
+        "genre": ["📚 Fiction", "🔮 Fantasy"],
+        "goodreads_rating": round(3 + (seed + i) % 20 / 10, 2),
+        "page_count": 200 + (seed + i) % 500,
+        "plot_summary": filler(seed - i, payload // 2),
+    }
+
+
+def fake_video(seed: int, i: int, payload: int) -> dict:
+    return {
+        "title": f"Video {seed}-{i}",
+        "type": "Movie" if i % 2 else "TV Show",
+        "similarity_type": SIMILARITY_TYPES[i % 3],
+        "explanation": filler(seed + i, payload // 2),
+        "directors": [f"Director {seed % 89}-{i}"],
+        "actors": [f"Actor {i}", f"Actor {i + 1}"],
+        "genre": ["🎬 Drama"],
+        "release_year": 1950 + (seed + i) % 70,
+        "imdb_rating": round(5 + (seed + i) % 40 / 10, 1),
+        "plot_summary": filler(seed - i, payload // 2),
+    }
+
+
+def fake_content(response_format: Any, prompt: str, items: int, payload: int) -> str:
+    seed = zlib.crc32(prompt.encode())
+    fields = getattr(response_format, "model_fields", {})
+    if "videos" in fields:
+        return json.dumps({"videos": [fake_video(seed, i, payload) for i in range(items)]}, ensure_ascii=False)
+    return json.dumps({"books": [fake_book(seed, i, payload) for i in range(items)]}, ensure_ascii=False)
+
+
+@dataclass
+class FakeGemini(Model):
+    """Answers after `latency` seconds; before that, asks for `tool_calls`
+    searches (one per model turn) when the agent has an Exa tool."""
+
+    id: str = "fake-gemini"
+    name: str = "FakeGemini"
+    provider: str = "Fake"
+    supports_native_structured_outputs: bool = True
+    latency: float = 0.05
+    tool_calls: int = 1
+    items: int = 12
+    payload: int = 400
+    stream_chunks: int = 8
+
+    def _next_turn(self, messages: list, tools: Optional[list]) -> dict:
+        prompt = next((m.get_content_string() for m in reversed(messages) if m.role == "user"), "")
+        names = [tool.get("function", {}).get("name") for tool in tools or []]
+        done = sum(1 for m in messages if m.role == "tool")
+        if "search_exa" in names and done < self.tool_calls:
+            arguments = json.dumps({"query": f"{prompt[:60]} #{done}"})
+            call = {"id": f"call_{done}", "type": "function", "function": {"name": "search_exa", "arguments": arguments}}
+            return {"tool_calls": [call]}
+        return {"prompt": prompt}
+
+    def _answer(self, turn: dict, response_format: Any) -> dict:
+        if "tool_calls" in turn:
+            return turn
+        return {"content": fake_content(response_format, turn["prompt"], self.items, self.payload)}
+
+    def invoke(self, messages: list, response_format: Any = None, tools: Optional[list] = None, **kwargs) -> dict:
+        time.sleep(self.latency)
+        return self._answer(self._next_turn(messages, tools), response_format)
+
+    async def ainvoke(self, messages: list, response_format: Any = None, tools: Optional[list] = None, **kwargs) -> dict:
+        await asyncio.sleep(self.latency)
+        return self._answer(self._next_turn(messages, tools), response_format)
+
+    def _chunks(self, answer: dict) -> list[dict]:
+        if "tool_calls" in answer:
+            return [answer]
+        content = answer["content"]
+        size = len(content) // self.stream_chunks + 1
+        return [{"content": content[i:i + size]} for i in range(0, len(content), size)]
+
+    def invoke_stream(self, messages: list, response_format: Any = None, tools: Optional[list] = None, **kwargs) -> Iterator[dict]:
+        chunks = self._chunks(self._answer(self._next_turn(messages, tools), response_format))
+        for chunk in chunks:
+            time.sleep(self.latency / len(chunks))
+            yield chunk
+
+    async def ainvoke_stream(
+        self, messages: list, response_format: Any = None, tools: Optional[list] = None, **kwargs
+    ) -> AsyncIterator[dict]:
+        chunks = self._chunks(self._answer(self._next_turn(messages, tools), response_format))
+        for chunk in chunks:
+            await asyncio.sleep(self.latency / len(chunks))
+            yield chunk
+
+    def parse_provider_response(self, response: dict, response_format: Any = None, **kwargs) -> ModelResponse:
+        model_response = ModelResponse(role="assistant", content=response.get("content"), tool_calls=response.get("tool_calls", []))
+        # Like Gemini, native structured output comes back already parsed
+        if model_response.content is not None and hasattr(response_format, "model_validate_json"):
+            model_response.parsed = response_format.model_validate_json(model_response.content)
+        return model_response
+
+    def parse_provider_response_delta(self, response: dict) -> ModelResponse:
+        return ModelResponse(role="assistant", content=response.get("content"), tool_calls=response.get("tool_calls"))
+
+
+class FakeExa:
+    """Replaces the Exa client inside ExaTools; each search sleeps `latency`
+    seconds and returns `num_results` results of `payload` characters."""
+
+    def __init__(self, latency: float = 0.02, payload: int = 1000):
+        self.latency = latency
+        self.payload = payload
+        self.calls = 0
+
+    def __deepcopy__(self, memo):
+        # Shared by the per-run agent copies, like the real pooled client
+        return self
+
+    def search_and_contents(self, query: str, num_results: int = 5, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        seed = zlib.crc32(query.encode())
+        results = [
+            SimpleNamespace(
+                url=f"https://example.com/{seed}/{i}",
+                title=f"Result {seed}-{i}",
+                author=None,
+                published_date="2024-01-01",
+                text=filler(seed + i, self.payload),
+                highlights=None,
+            )
+            for i in range(num_results)
+        ]
+        return SimpleNamespace(results=results)
+
+
+def install_fakes(
+    model_latency: float = 0.05,
+    tool_latency: float = 0.02,
+    tool_calls: int = 1,
+    items: int = 12,
+    payload: int = 400,
+    tool_payload: int = 1000,
+) -> FakeExa:
+    """Makes the agent builders use the fakes; call before the agents are built."""
+    fake_exa = FakeExa(tool_latency, tool_payload)
+
+    def gemini_model(http_pool: HttpPool, model_id: str = agents.GEMINI_MODEL_ID, max_output_tokens=None) -> FakeGemini:
+        return FakeGemini(id=model_id, latency=model_latency, tool_calls=tool_calls, items=items, payload=payload)
+
+    def exa_tools(http_pool: HttpPool, text_length_limit: int = 1000, cache=None):
+        from agno.tools.exa import ExaTools
+        from exa_client import CachedExaTools
+
+        options = dict(api_key="fake", num_results=12, show_results=False, text_length_limit=text_length_limit)
+        tools = CachedExaTools(cache, **options) if cache is not None else ExaTools(**options)
+        tools.exa = fake_exa
+        return tools
+
+    agents.gemini_model = gemini_model
+    agents.exa_tools = exa_tools
+    return fake_exa
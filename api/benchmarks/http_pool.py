@@ -0,0 +1,125 @@
+"""Compares Exa tool calls with and without the shared connection pool against a local stub server.
+
+The stub answers Exa's /search endpoint over HTTP/1.1 keep-alive, counts the
+TCP connections it accepts and delays each new one by `--handshake` seconds
+(standing in for TLS), so the output shows how many connections and how much
+latency each mode costs for the same parallel workload. Exits non-zero if the
+pooled run opens more connections than the per-host limit.
+
+    python benchmarks/http_pool.py --calls 200 --parallel 16 --delay 0.01 --handshake 0.05
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exa_py import Exa  # noqa: E402
+
+from exa_client import PooledExa  # noqa: E402
+from http_pool import HttpPool  # noqa: E402
+
+
+class StubExaServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, delay: float, handshake: float):
+        super().__init__(("127.0.0.1", 0), StubExaHandler)
+        self.delay = delay
+        self.handshake = handshake
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        with self._lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+
+class StubExaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        # Stands in for the TLS handshake every new connection to the real API pays
+        time.sleep(self.server.handshake)
+        super().setup()
+
+    def do_POST(self):
+        query = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["query"]
+        time.sleep(self.server.delay)
+        results = [
+            {"id": f"{query}-{i}", "url": f"https://example.com/{i}", "title": f"{query} {i}", "text": "stub"}
+            for i in range(12)
+        ]
+        body = json.dumps({"requestId": "stub", "results": results}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(client: Exa, calls: int, parallel: int) -> list[float]:
+    def call(i: int) -> float:
+        started_at = time.perf_counter()
+        client.search(f"query {i}", num_results=12)
+        return time.perf_counter() - started_at
+
+    with ThreadPoolExecutor(parallel) as executor:
+        return list(executor.map(call, range(calls)))
+
+
+def report(name: str, latencies: list[float], elapsed: float, connections: int) -> None:
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{name:>8}: {len(latencies) / elapsed:7.1f} calls/s  p50 {statistics.median(latencies) * 1000:6.1f} ms  "
+        f"p95 {p95 * 1000:6.1f} ms  connections {connections}"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--parallel", type=int, default=16)
+    parser.add_argument("--delay", type=float, default=0.01, help="stub server latency per call, seconds")
+    parser.add_argument("--handshake", type=float, default=0.05, help="extra setup time per new connection, seconds")
+    parser.add_argument("--max-connections", type=int, default=20)
+    args = parser.parse_args()
+
+    server = StubExaServer(args.delay, args.handshake)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    started_at = time.perf_counter()
+    latencies = run(Exa("stub", base_url=base_url), args.calls, args.parallel)
+    report("unpooled", latencies, time.perf_counter() - started_at, server.connections)
+
+    server.connections = 0
+    http_pool = HttpPool(max_connections=args.max_connections)
+    started_at = time.perf_counter()
+    latencies = run(PooledExa("stub", http_pool, base_url=base_url), args.calls, args.parallel)
+    report("pooled", latencies, time.perf_counter() - started_at, server.connections)
+
+    stats = http_pool.stats()
+    print(
+        f"pool: {stats['connections_opened']} connections opened, {stats['idle']} idle, {stats['active']} active, "
+        f"{stats['wait_seconds']:.3f}s total wait for {stats['requests']} requests"
+    )
+    server.shutdown()
+    # Every pooled call must reuse a connection once the pool is warm
+    return 0 if server.connections <= args.max_connections else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
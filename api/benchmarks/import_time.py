@@ -0,0 +1,78 @@
+"""Measures the cold import time of the API module and fails if it exceeds a budget.
+
+Each run imports `recommendation_api` in a fresh interpreter, so nothing is
+cached between samples. The heavy model/tool SDKs (agno.models.google,
+agno.tools.exa, traceloop) are built after startup and must not show up here.
+
+    python benchmarks/import_time.py                 # budget from IMPORT_TIME_BUDGET (default 1.5 s)
+    python benchmarks/import_time.py --budget 1.0 --runs 7
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULE = "recommendation_api"
+# Modules that should only be imported when the agents are built
+DEFERRED_MODULES = ("agno.models.google", "agno.tools.exa", "traceloop.sdk")
+
+IMPORT_TIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)")
+
+
+def import_once() -> tuple[float, dict[str, int]]:
+    """Returns the total import time in seconds and the cumulative microseconds per module."""
+    env = dict(os.environ, API_KEY_GEMINI=os.getenv("API_KEY_GEMINI", "benchmark"))
+    env.pop("API_KEY_TRACELOOP", None)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {MODULE}"],
+        cwd=API_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    modules = {}
+    for match in IMPORT_TIME_RE.finditer(result.stderr):
+        modules[match.group(4)] = int(match.group(2))
+    return modules[MODULE] / 1e6, modules
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET", "1.5")))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports to list")
+    args = parser.parse_args()
+
+    samples = []
+    modules = {}
+    for _ in range(args.runs):
+        seconds, modules = import_once()
+        samples.append(seconds)
+
+    median = statistics.median(samples)
+    print(f"{MODULE}: median {median:.3f}s, min {min(samples):.3f}s, max {max(samples):.3f}s over {args.runs} runs")
+    print(f"budget: {args.budget:.3f}s")
+
+    print("slowest imports (last run, cumulative):")
+    for name, micros in sorted(modules.items(), key=lambda item: item[1], reverse=True)[1:args.top + 1]:
+        print(f"  {micros / 1e6:7.3f}s  {name}")
+
+    failed = False
+    loaded = [name for name in DEFERRED_MODULES if name in modules]
+    if loaded:
+        print(f"FAIL: imported at startup, should be deferred: {', '.join(loaded)}")
+        failed = True
+    if median > args.budget:
+        print(f"FAIL: import time {median:.3f}s is over the {args.budget:.3f}s budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
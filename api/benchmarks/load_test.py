@@ -0,0 +1,283 @@
+"""Load test of the recommendation endpoints with Gemini and Exa replaced by local fakes.
+
+Drives the FastAPI app in-process (real middleware, admission control,
+caches, agno runs) at increasing concurrency and reports, per endpoint and
+level, p50/p95/p99 latency, throughput, errors, memory (RSS) and event-loop
+lag. Every request uses a distinct title/prompt unless `--distinct` is set,
+so caches and single-flight only help when asked to. Results are written as
+JSON; with `--baseline`, p95 and throughput are compared against a previous
+result file and the exit code is non-zero on a regression.
+
+    python benchmarks/load_test.py --levels 1,8,32 --requests 100 --output results.json
+    python benchmarks/load_test.py --baseline results.json --tolerance 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Throwaway stores and fake credentials, set before the app reads its config
+STATE_DIR = tempfile.mkdtemp(prefix="media-rec-load-")
+for name, value in {
+    "CLIENT_API_KEY": "load-test",
+    "API_KEY_GEMINI": "fake",
+    "API_KEY_EXA": "fake",
+    "CATALOG_PATH": os.path.join(STATE_DIR, "catalog.db"),
+    "JOB_STORE_PATH": os.path.join(STATE_DIR, "jobs.db"),
+    "RESPONSE_CACHE_PATH": os.path.join(STATE_DIR, "response_cache.db"),
+    "RESULT_SET_PATH": os.path.join(STATE_DIR, "result_sets.db"),
+    "ADMISSION_STORE_PATH": os.path.join(STATE_DIR, "admission.db"),
+    "RUN_STORE_PATH": os.path.join(STATE_DIR, "runs.db"),
+    "RATE_LIMIT_PATH": os.path.join(STATE_DIR, "ratelimit.db"),
+    "METRICS_STORE_PATH": os.path.join(STATE_DIR, "metrics.db"),
+    "SEMANTIC_CACHE_STORE_PATH": os.path.join(STATE_DIR, "semantic_cache.db"),
+    "TOOL_CACHE_PATH": os.path.join(STATE_DIR, "tool_cache.db"),
+    # agno would otherwise post every run to its API (set to true to include that cost)
+    "AGNO_TELEMETRY": "false",
+}.items():
+    os.environ.setdefault(name, value)
+os.environ.pop("API_KEY_TRACELOOP", None)
+
+import httpx  # noqa: E402
+
+from fakes import install_fakes  # noqa: E402
+
+API_KEY = os.environ["CLIENT_API_KEY"]
+
+# Pseudo-words, so distinct prompts also look distinct to the semantic cache
+SYLLABLES = "ka lo mi ne ra shi to va el an or is un dar mor wyn th en gal bri sto ven ash bel cor dra fen gor".split()
+
+
+def pseudo_words(i: int, count: int = 4) -> str:
+    words = []
+    for n in range(count):
+        i, a = divmod(i * 7919 + n * 104729 + 1, len(SYLLABLES))
+        i, b = divmod(i, len(SYLLABLES))
+        words.append(SYLLABLES[a] + SYLLABLES[b])
+    return " ".join(words)
+
+
+# name -> (path, body for request i); `stream` endpoints are read to the end
+ENDPOINTS = {
+    "books_similar": ("/books/recommendations/similar", lambda i: {"book_title": f"Load Test Book {i}"}),
+    "books_custom": ("/books/recommendations/custom", lambda i: {"prompt": f"cozy mysteries about {pseudo_words(i)}"}),
+    "books_similar_stream": ("/books/recommendations/similar/stream", lambda i: {"book_title": f"Load Test Stream {i}"}),
+    "videos_similar": (
+        "/videos/recommendations/similar",
+        lambda i: {"title": f"Load Test Movie {i}", "media_type": "movie"},
+    ),
+    "videos_custom": ("/videos/recommendations/custom", lambda i: {"prompt": f"space operas about {pseudo_words(i)}"}),
+}
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(int(round(q * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+def rss_mb() -> float:
+    """Current resident memory; falls back to the peak where /proc is missing."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if platform.system() == "Darwin" else peak / 1024
+
+
+class LoopMonitor:
+    """Samples event-loop lag (how late a short sleep wakes up) and memory."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags: list[float] = []
+        self.peak_rss = 0.0
+        self._task = None
+
+    async def _run(self):
+        while True:
+            started_at = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(time.perf_counter() - started_at - self.interval, 0.0))
+            self.peak_rss = max(self.peak_rss, rss_mb())
+
+    def __enter__(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+
+async def send(client: httpx.AsyncClient, path: str, body: dict) -> tuple[float, int]:
+    started_at = time.perf_counter()
+    async with client.stream("POST", path, json=body) as response:
+        async for _ in response.aiter_bytes():
+            pass
+    return time.perf_counter() - started_at, response.status_code
+
+
+async def run_level(client, name: str, concurrency: int, requests: int, distinct: int, offset: int) -> dict:
+    path, make_body = ENDPOINTS[name]
+    latencies: list[float] = []
+    statuses: dict[str, int] = {}
+    next_request = iter(range(requests))
+
+    async def worker():
+        for i in next_request:
+            key = offset + (i % distinct if distinct else i)
+            try:
+                seconds, status = await send(client, path, make_body(key))
+            except Exception as e:
+                seconds, status = 0.0, type(e).__name__
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if status == 200:
+                latencies.append(seconds)
+
+    rss_before = rss_mb()
+    with LoopMonitor() as monitor:
+        started_at = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started_at
+
+    return {
+        "requests": requests,
+        "ok": len(latencies),
+        "statuses": statuses,
+        "elapsed_seconds": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "p50": percentile(latencies, 0.50) * 1000,
+            "p95": percentile(latencies, 0.95) * 1000,
+            "p99": percentile(latencies, 0.99) * 1000,
+            "max": max(latencies, default=0.0) * 1000,
+        },
+        "event_loop_lag_ms": {
+            "p99": percentile(monitor.lags, 0.99) * 1000,
+            "max": max(monitor.lags, default=0.0) * 1000,
+        },
+        "rss_mb": {"before": rss_before, "peak": max(monitor.peak_rss, rss_before), "after": rss_mb()},
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Lists the (endpoint, level) pairs whose p95 or throughput got worse than `tolerance`."""
+    regressions = []
+    old_levels = {level["concurrency"]: level["endpoints"] for level in baseline.get("levels", [])}
+    for level in results["levels"]:
+        for name, new in level["endpoints"].items():
+            old = old_levels.get(level["concurrency"], {}).get(name)
+            if old is None:
+                continue
+            old_p95, new_p95 = old["latency_ms"]["p95"], new["latency_ms"]["p95"]
+            old_rps, new_rps = old["throughput_rps"], new["throughput_rps"]
+            print(
+                f"{name:>22} c={level['concurrency']:<4} p95 {old_p95:8.1f} -> {new_p95:8.1f} ms   "
+                f"throughput {old_rps:7.1f} -> {new_rps:7.1f} req/s"
+            )
+            if old_p95 and new_p95 > old_p95 * (1 + tolerance):
+                regressions.append(f"{name} c={level['concurrency']}: p95 {old_p95:.1f} -> {new_p95:.1f} ms")
+            if old_rps and new_rps < old_rps * (1 - tolerance):
+                regressions.append(f"{name} c={level['concurrency']}: throughput {old_rps:.1f} -> {new_rps:.1f} req/s")
+    return regressions
+
+
+async def main_async(args) -> dict:
+    install_fakes(
+        model_latency=args.model_latency,
+        tool_latency=args.tool_latency,
+        tool_calls=args.tool_calls,
+        items=args.items,
+        payload=args.payload,
+        tool_payload=args.tool_payload,
+    )
+    import recommendation_api
+
+    app = recommendation_api.app
+    # Every request comes from the same address; slowapi would reject most of them
+    recommendation_api.limiter.enabled = False
+
+    levels = []
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        await recommendation_api.ensure_agents()
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://load-test", headers={"X-API-Key": API_KEY}, timeout=None
+        ) as client:
+            offset = 0
+            for concurrency in args.levels:
+                endpoints = {}
+                for name in args.endpoints:
+                    result = await run_level(client, name, concurrency, args.requests, args.distinct, offset)
+                    offset += args.requests
+                    endpoints[name] = result
+                    print(
+                        f"{name:>22} c={concurrency:<4} {result['throughput_rps']:7.1f} req/s  "
+                        f"p50 {result['latency_ms']['p50']:7.1f}  p95 {result['latency_ms']['p95']:7.1f}  "
+                        f"p99 {result['latency_ms']['p99']:7.1f} ms  lag p99 {result['event_loop_lag_ms']['p99']:6.1f} ms  "
+                        f"rss {result['rss_mb']['peak']:6.1f} MB  {result['statuses']}"
+                    )
+                levels.append({"concurrency": concurrency, "endpoints": endpoints})
+
+    return {
+        "created_at": time.time(),
+        "python": platform.python_version(),
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("output", "baseline")
+        },
+        "env": {
+            name: os.environ[name] for name in (
+                "AGENT_MAX_CONCURRENCY", "AGENT_MAX_QUEUE", "ADMISSION_STORE", "RESPONSE_CACHE_BACKEND",
+                "FANOUT_DEFAULT", "ROUTING_ENABLED",
+            ) if name in os.environ
+        },
+        "levels": levels,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--levels", type=lambda s: [int(v) for v in s.split(",")], default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint and level")
+    parser.add_argument("--endpoints", type=lambda s: s.split(","), default=list(ENDPOINTS))
+    parser.add_argument("--distinct", type=int, default=0, help="distinct titles/prompts per run (0 = all distinct)")
+    parser.add_argument("--model-latency", type=float, default=0.05, help="seconds per fake model call")
+    parser.add_argument("--tool-latency", type=float, default=0.02, help="seconds per fake Exa search")
+    parser.add_argument("--tool-calls", type=int, default=1, help="Exa searches per agent run")
+    parser.add_argument("--items", type=int, default=12, help="recommendations per answer")
+    parser.add_argument("--payload", type=int, default=400, help="text characters per recommendation")
+    parser.add_argument("--tool-payload", type=int, default=1000, help="text characters per Exa result")
+    parser.add_argument("--output", default="load_test_results.json")
+    parser.add_argument("--baseline", help="previous result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression (0.2 = 20%%)")
+    args = parser.parse_args()
+    unknown = [name for name in args.endpoints if name not in ENDPOINTS]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)} (choose from {', '.join(ENDPOINTS)})")
+
+    results = asyncio.run(main_async(args))
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
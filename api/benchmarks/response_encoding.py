@@ -0,0 +1,83 @@
+"""Serialization cost per ListBooks/ListVideos response: FastAPI's response_model path vs FastJSONResponse.
+
+    python benchmarks/response_encoding.py --items 12,50 --payload 400 --rounds 2000
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_model_field  # noqa: E402
+
+from benchmarks.fakes import fake_book, fake_video  # noqa: E402
+from models import ListBooks, ListVideos  # noqa: E402
+from serialization import brotli, compress, encode_json  # noqa: E402
+
+
+def sample(list_model, items: int, payload: int):
+    if list_model is ListBooks:
+        return ListBooks(books=[fake_book(1234, i, payload) for i in range(items)])
+    return ListVideos(videos=[fake_video(1234, i, payload) for i in range(items)])
+
+
+def timed(function, rounds: int) -> float:
+    """Microseconds per call."""
+    started_at = time.perf_counter()
+    for _ in range(rounds):
+        function()
+    return (time.perf_counter() - started_at) / rounds * 1e6
+
+
+def fastapi_paths(list_model, content):
+    field = create_model_field(name=f"Response_{list_model.__name__}", type_=list_model, mode="serialization")
+    loop = asyncio.new_event_loop()
+
+    def legacy():
+        # FastAPI before the dump_json fast path: dump, validate, jsonable_encoder, json.dumps
+        value, _ = field.validate(content.model_dump(), {}, loc=("response",))
+        return json.dumps(jsonable_encoder(value), ensure_ascii=False, separators=(",", ":")).encode()
+
+    paths = {"fastapi legacy": legacy}
+    if "dump_json" in inspect.signature(serialize_response).parameters:
+        paths["fastapi dump_json"] = lambda: loop.run_until_complete(
+            serialize_response(field=field, response_content=content, dump_json=True)
+        )
+    return paths
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=lambda s: [int(v) for v in s.split(",")], default=[12, 50])
+    parser.add_argument("--payload", type=int, default=400, help="text characters per recommendation")
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    for list_model in (ListBooks, ListVideos):
+        for items in args.items:
+            content = sample(list_model, items, args.payload)
+            paths = fastapi_paths(list_model, content)
+            paths["fast string"] = lambda: encode_json(content, "string")
+            paths["fast float"] = lambda: encode_json(content, "float")
+            body = encode_json(content, "string")
+            # The fast path must keep the wire format of the response_model path
+            assert json.loads(body) == json.loads(paths["fastapi legacy"]())
+
+            print(f"{list_model.__name__} x {items} ({len(body) / 1024:.1f} KiB)")
+            for name, function in paths.items():
+                print(f"  {name:>18}: {timed(function, args.rounds):8.1f} us")
+            for encoding in ("gzip", "br") if brotli is not None else ("gzip",):
+                size = len(compress(body, encoding))
+                micros = timed(lambda: compress(body, encoding), max(args.rounds // 10, 1))
+                print(f"  {'+ ' + encoding:>18}: {micros:8.1f} us  -> {size / 1024:.1f} KiB ({size / len(body):.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Iterable, Optional
+
+from pydantic import BaseModel
+
+from response_cache import normalize_title
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Fields that describe who made the item, per kind
+CREATOR_FIELDS = {"book": ("author",), "video": ("directors", "actors")}
+
+
+def tokenize(text: str) -> list[str]:
+    return [token for token in TOKEN_RE.findall(normalize_title(text)) if len(token) > 1 or token.isdigit()]
+
+
+def as_list(value) -> list[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return [str(v) for v in value]
+
+
+class Catalog:
+    """Local metadata store of every Book/Video the agents have produced.
+
+    Records live in SQLite; an in-memory inverted index over title, creator
+    and genre tokens is rebuilt on startup and updated on every insert.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS catalog ("
+            "id INTEGER PRIMARY KEY, kind TEXT NOT NULL, key TEXT NOT NULL, data TEXT NOT NULL, "
+            "updated_at REAL NOT NULL, UNIQUE (kind, key))"
+        )
+        self._records: dict[int, tuple[str, dict]] = {}
+        self._index: dict[str, set[int]] = defaultdict(set)
+        self._record_tokens: dict[int, set[str]] = {}
+        for record_id, kind, data in self._conn.execute("SELECT id, kind, data FROM catalog"):
+            self._index_record(record_id, kind, json.loads(data))
+
+    def _index_record(self, record_id: int, kind: str, data: dict) -> None:
+        for token in self._record_tokens.pop(record_id, ()):
+            self._index[token].discard(record_id)
+        tokens = set(tokenize(data.get("title", "")))
+        for field in CREATOR_FIELDS[kind] + ("genre", "subgenres"):
+            for value in as_list(data.get(field)):
+                tokens.update(tokenize(value))
+        for token in tokens:
+            self._index[token].add(record_id)
+        self._record_tokens[record_id] = tokens
+        self._records[record_id] = (kind, data)
+
+    @staticmethod
+    def record_key(kind: str, data: dict) -> str:
+        creator = next((as_list(data.get(field)) for field in CREATOR_FIELDS[kind] if data.get(field)), [])
+        return f"{normalize_title(data.get('title', ''))}|{normalize_title(creator[0]) if creator else ''}"
+
+    def add(self, kind: str, items: Iterable[BaseModel]) -> None:
+        now = time.time()
+        with self._lock:
+            for item in items:
+                data = item.model_dump(mode="json")
+                key = self.record_key(kind, data)
+                record_id = self._conn.execute(
+                    "INSERT INTO catalog (kind, key, data, updated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (kind, key) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at "
+                    "RETURNING id",
+                    (kind, key, json.dumps(data, ensure_ascii=False), now),
+                ).fetchone()[0]
+                self._index_record(record_id, kind, data)
+
+    def search(self, query: str, kind: Optional[str] = None, limit: int = 12) -> list[dict]:
+        """Ranks records by the summed IDF of the query tokens they contain."""
+        total = max(len(self._records), 1)
+        scores: dict[int, float] = defaultdict(float)
+        with self._lock:
+            for token in set(tokenize(query)):
+                postings = self._index.get(token)
+                if not postings:
+                    continue
+                idf = math.log(1 + total / len(postings))
+                for record_id in postings:
+                    if kind is None or self._records[record_id][0] == kind:
+                        scores[record_id] += idf
+            ranked = sorted(scores, key=scores.get, reverse=True)[:limit]
+            return [self._records[record_id][1] for record_id in ranked]
+
+    def lookup(self, kind: str, title: str) -> Optional[dict]:
+        """Returns the record whose normalized title matches `title`, if any."""
+        key = normalize_title(title)
+        for data in self.search(title, kind=kind, limit=5):
+            if normalize_title(data.get("title", "")) == key:
+                return data
+        return None
+
+    def related(self, kind: str, data: dict, limit: int = 20) -> list[dict]:
+        """Records sharing the creators or genres of `data`, best matches first (itself excluded)."""
+        terms = [value for field in CREATOR_FIELDS[kind] + ("genre", "subgenres") for value in as_list(data.get(field))]
+        key = self.record_key(kind, data)
+        return [
+            record for record in self.search(" ".join(terms), kind=kind, limit=limit + 1)
+            if self.record_key(kind, record) != key
+        ][:limit]
+
+    def search_tool(self, kind: str, limit: int = 12) -> Callable[[str], str]:
+        noun = "books" if kind == "book" else "movies and TV shows"
+
+        def search_local_catalog(query: str) -> str:
+            results = self.search(query, kind=kind, limit=limit)
+            if not results:
+                return "No matches in the local catalog."
+            return json.dumps(results, ensure_ascii=False)
+
+        search_local_catalog.__doc__ = (
+            f"Search the local catalog of {noun} already researched, by title, "
+            f"{'author' if kind == 'book' else 'director, actor'} or genre keywords.\n\n"
+            "Args:\n    query (str): Keywords to search for.\n\n"
+            "Returns:\n    str: JSON list of matching records with their full metadata."
+        )
+        return search_local_catalog
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def stats(self) -> dict:
+        return {"records": len(self._records), "tokens": len(self._index)}
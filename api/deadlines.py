@@ -0,0 +1,191 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import Context, ContextVar, copy_context
+from typing import Any, AsyncIterator, Optional
+
+from pydantic import BaseModel
+
+from repair import list_field
+
+
+# Marks the end of the items in iter_within_deadline
+_END = object()
+
+
+class DeadlineExceeded(Exception):
+    """The deadline passed with nothing (partial or cached) to return."""
+
+
+class Deadline:
+    """Time budget of one request.
+
+    Set in a context variable, so everything the request awaits sees it:
+    agent runs stop their model calls and skip tool calls and re-prompts
+    once it passes. Runs offer the answers they have on the way (the first
+    parse before a re-prompt, finished fan-out groups, a fast-tier answer
+    that was escalated), which are the partial result of the request.
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.partials: list[BaseModel] = []
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def offer(self, content: Any) -> None:
+        if isinstance(content, BaseModel) and list_field(type(content)) is not None:
+            self.partials.append(content)
+
+    def partial(self, list_model: type[BaseModel]) -> Optional[BaseModel]:
+        """Items of every offered answer merged (duplicates are left to the dedupe stage)."""
+        field = list_field(list_model)
+        items = [
+            item for content in self.partials if isinstance(content, list_model)
+            for item in getattr(content, field)
+        ]
+        return list_model(**{field: items}) if items else None
+
+
+class SharedDeadline:
+    """Deadline of a run shared by several requests (single-flight).
+
+    The run may go on while any of its requests still has time (none of
+    them having a deadline means no deadline), and what it offers goes to
+    every request's own deadline.
+    """
+
+    def __init__(self):
+        self.members: list[Any] = []
+
+    def join(self, deadline: Any) -> None:
+        self.members.append(deadline)
+
+    def leave(self, deadline: Any) -> None:
+        self.members.remove(deadline)
+
+    def remaining(self) -> Optional[float]:
+        left = [member.remaining() if member is not None else None for member in self.members]
+        if not left or None in left:
+            return None
+        return max(left)
+
+    @property
+    def expired(self) -> bool:
+        left = self.remaining()
+        return left is not None and left <= 0
+
+    def offer(self, content: Any) -> None:
+        for member in self.members:
+            if member is not None:
+                member.offer(content)
+
+
+_current: ContextVar[Optional[Any]] = ContextVar("deadline", default=None)
+
+
+def current() -> Optional[Any]:
+    return _current.get()
+
+
+def shared_context(shared: SharedDeadline) -> Context:
+    """Copy of the current context whose deadline is `shared` (for a task run on behalf of several requests)."""
+    context = copy_context()
+    context.run(_current.set, shared)
+    return context
+
+
+def remaining() -> Optional[float]:
+    """Seconds left for the current request; None when it has no deadline."""
+    deadline = _current.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+def deadline_expired() -> bool:
+    """True when the current request has a deadline and it passed (its answers may be incomplete)."""
+    deadline = _current.get()
+    return deadline is not None and deadline.expired
+
+
+def offer(content: Any) -> None:
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.offer(content)
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]):
+    """Sets a deadline for the block (none when `seconds` is 0/None)."""
+    if not seconds:
+        yield None
+        return
+    deadline = Deadline(seconds)
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+async def wait_for_deadline(awaitable) -> Any:
+    """Awaits under the current deadline, raising TimeoutError when it passes.
+
+    A shared deadline can move while waiting (another request joined the
+    run), so it is checked again each time the wait ends.
+    """
+    deadline = _current.get()
+    if deadline is None:
+        return await awaitable
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=deadline.remaining())
+            if done:
+                return task.result()
+            if deadline.expired:
+                raise TimeoutError("Request deadline exceeded")
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+async def iter_within_deadline(items: AsyncIterator[Any], seconds: Optional[float]) -> AsyncIterator[Any]:
+    """Yields from `items` until the deadline, then raises TimeoutError.
+
+    The items are produced by their own task, started under the deadline
+    (so its runs see it) and cancelled when it passes: a stalled model or
+    tool call is interrupted there, not in the task sending the response.
+    """
+    if not seconds:
+        async for item in items:
+            yield item
+        return
+
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        try:
+            async for item in items:
+                await queue.put((item, None))
+            await queue.put((_END, None))
+        except Exception as e:
+            await queue.put((None, e))
+
+    with deadline_scope(seconds) as deadline:
+        producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            item, error = await asyncio.wait_for(queue.get(), deadline.remaining())
+            if error is not None:
+                raise error
+            if item is _END:
+                return
+            yield item
+    finally:
+        producer.cancel()
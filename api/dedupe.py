@@ -0,0 +1,167 @@
+import math
+import re
+from typing import Iterable, Optional
+
+from pydantic import BaseModel
+
+from response_cache import normalize_title
+
+# Series/edition notes such as "(The Expanse #1)" or "[Special Edition]"
+BRACKETS_RE = re.compile(r"\([^)]*\)|\[[^\]]*\]")
+DIGITS_RE = re.compile(r"\d+")
+
+
+def title_key(title: str) -> str:
+    return normalize_title(BRACKETS_RE.sub(" ", title)) or normalize_title(title)
+
+
+def trigrams(key: str) -> set[str]:
+    padded = f" {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def dice(shared: int, size_a: int, size_b: int) -> float:
+    return 2 * shared / (size_a + size_b) if size_a + size_b else 0.0
+
+
+def creators_match(a: Optional[str], b: Optional[str], threshold: float) -> bool:
+    """Authors match when either is unknown, they share a name ("Herbert, Frank"
+    vs "Frank Herbert", "Le Guin" vs "Ursula K. Le Guin") or are near-identical."""
+    if not a or not b:
+        return True
+    key_a, key_b = normalize_title(a), normalize_title(b)
+    if any(len(token) > 2 for token in set(key_a.split()) & set(key_b.split())):
+        return True
+    grams_a, grams_b = trigrams(key_a), trigrams(key_b)
+    return dice(len(grams_a & grams_b), len(grams_a), len(grams_b)) >= threshold
+
+
+def merge_items(kept: BaseModel, other: BaseModel) -> BaseModel:
+    """Fills the null fields of `kept` from `other` and unions their list fields."""
+    update = {}
+    for name, value in other:
+        current = getattr(kept, name)
+        if current is None and value is not None:
+            update[name] = value
+        elif isinstance(current, list) and isinstance(value, list):
+            extra = [v for v in value if v not in current]
+            if extra:
+                update[name] = current + extra
+    return kept.model_copy(update=update) if update else kept
+
+
+class Deduplicator:
+    """Collapses near-duplicate books/videos as they are added.
+
+    Titles are compared on a normalized key (accents, case, punctuation,
+    leading article and bracketed series notes removed). Exact keys are a dict
+    lookup; otherwise candidates come from a character-trigram inverted index
+    bucketed by trigram count and are verified by Dice similarity. A candidate
+    with `size` trigrams must share at least `min_shared` of them to reach the
+    threshold, so probing any `len(grams) - min_shared + 1` of the query's
+    trigrams is enough to find it; the rarest ones are probed, which keeps the
+    candidate set small on thousands of items.
+    Titles must also agree on their numbers ("Book 2" is not "Book 3"), books
+    on their author and videos on their release year. Titles matching
+    `exclude_titles` (the seed of a "similar" request) are dropped.
+    """
+
+    def __init__(self, threshold: float = 0.85, exclude_titles: Iterable[str] = ()):
+        self.threshold = threshold
+        self.items: list[BaseModel] = []
+        self.merged = 0
+        self.excluded = 0
+        self._keys: dict[str, list[int]] = {}
+        # numbers -> trigram count -> trigram -> item indices; titles only match when their numbers agree
+        self._index: dict[frozenset, dict[int, dict[str, list[int]]]] = {}
+        self._grams: list[set[str]] = []
+        # numbers -> trigram -> number of indexed items containing it
+        self._frequency: dict[frozenset, dict[str, int]] = {}
+        self._excluded = []
+        for title in exclude_titles:
+            key = title_key(title)
+            self._excluded.append((key, trigrams(key), frozenset(DIGITS_RE.findall(key))))
+
+    def _same_work(self, index: int, item: BaseModel) -> bool:
+        kept = self.items[index]
+        if not creators_match(getattr(kept, "author", None), getattr(item, "author", None), self.threshold):
+            return False
+        year_a, year_b = getattr(kept, "release_year", None), getattr(item, "release_year", None)
+        return year_a is None or year_b is None or abs(year_a - year_b) <= 1
+
+    def _is_excluded(self, key: str, grams: set[str], numbers: frozenset) -> bool:
+        for excluded_key, excluded_grams, excluded_numbers in self._excluded:
+            if key == excluded_key:
+                return True
+            similarity = dice(len(grams & excluded_grams), len(grams), len(excluded_grams))
+            if similarity >= self.threshold and numbers == excluded_numbers:
+                return True
+        return False
+
+    def find(self, key: str, grams: set[str], numbers: frozenset, item: BaseModel) -> Optional[int]:
+        for index in self._keys.get(key, ()):
+            if self._same_work(index, item):
+                return index
+
+        index_by_size = self._index.get(numbers)
+        if not grams or index_by_size is None:
+            return None
+        size = len(grams)
+        smallest = math.ceil(self.threshold * size / (2 - self.threshold))
+        largest = math.floor(size * (2 - self.threshold) / self.threshold)
+        frequency = self._frequency[numbers]
+        rarest = sorted(grams, key=lambda gram: frequency.get(gram, 0))
+
+        best, best_similarity = None, self.threshold
+        for other_size in range(smallest, largest + 1):
+            index_by_gram = index_by_size.get(other_size)
+            if index_by_gram is None:
+                continue
+            min_shared = math.ceil(self.threshold * (size + other_size) / 2)
+            candidates = set()
+            for gram in rarest[:size - min_shared + 1]:
+                candidates.update(index_by_gram.get(gram, ()))
+            for index in candidates:
+                similarity = dice(len(grams & self._grams[index]), size, other_size)
+                if similarity >= best_similarity and self._same_work(index, item):
+                    best, best_similarity = index, similarity
+        return best
+
+    def add(self, item: BaseModel) -> bool:
+        """Returns True if the item was kept as new, False if it was merged or excluded."""
+        key = title_key(item.title)
+        grams = trigrams(key)
+        numbers = frozenset(DIGITS_RE.findall(key))
+        if self._is_excluded(key, grams, numbers):
+            self.excluded += 1
+            return False
+
+        index = self.find(key, grams, numbers, item)
+        if index is not None:
+            self.items[index] = merge_items(self.items[index], item)
+            self.merged += 1
+            return False
+
+        index = len(self.items)
+        self.items.append(item)
+        self._keys.setdefault(key, []).append(index)
+        index_by_gram = self._index.setdefault(numbers, {}).setdefault(len(grams), {})
+        frequency = self._frequency.setdefault(numbers, {})
+        for gram in grams:
+            index_by_gram.setdefault(gram, []).append(index)
+            frequency[gram] = frequency.get(gram, 0) + 1
+        self._grams.append(grams)
+        return True
+
+
+def dedupe_items(items: Iterable[BaseModel], threshold: float = 0.85, exclude_titles: Iterable[str] = ()) -> list:
+    deduplicator = Deduplicator(threshold, exclude_titles)
+    for item in items:
+        deduplicator.add(item)
+    return deduplicator.items
+
+
+def dedupe_list(content: BaseModel, field: str, threshold: float = 0.85, exclude_titles: Iterable[str] = ()) -> BaseModel:
+    """Returns a copy of a ListBooks/ListVideos with duplicates merged and seed titles removed."""
+    items = dedupe_items(getattr(content, field), threshold, exclude_titles)
+    return content.model_copy(update={field: items})
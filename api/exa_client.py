@@ -0,0 +1,124 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from typing import Any, Dict, Optional, Union
+from urllib.parse import urlsplit
+
+from agno.tools.exa import ExaTools
+from exa_py import Exa
+from exa_py.api import ExaJSONEncoder
+
+import deadlines
+from http_pool import HttpPool
+from tool_cache import ToolCache, normalize_query
+
+
+class PooledExa(Exa):
+    """Exa client whose JSON calls go through the shared keep-alive pool.
+
+    exa_py sends every call with module-level `requests` functions, so each
+    search paid a new TCP + TLS handshake. Streaming calls and PATCH/DELETE
+    still use the original implementation.
+    """
+
+    def __init__(self, api_key: str, http_pool: HttpPool, **kwargs: Any):
+        super().__init__(api_key, **kwargs)
+        self.http_client = http_pool.client(urlsplit(self.base_url).hostname)
+
+    def request(
+        self,
+        endpoint: str,
+        data: Optional[Union[Dict[str, Any], str]] = None,
+        method: str = "POST",
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Union[Dict[str, Any], Any]:
+        request_headers = {**self.headers, **(headers or {})}
+        streaming = (
+            (isinstance(data, dict) and data.get("stream"))
+            or (params and params.get("stream") == "true")
+            or request_headers.get("Accept") == "text/event-stream"
+        )
+        if streaming or method.upper() not in ("GET", "POST"):
+            return super().request(endpoint, data=data, method=method, params=params, headers=headers)
+
+        if isinstance(data, str):
+            content = data
+        else:
+            content = json.dumps(data, cls=ExaJSONEncoder) if data else None
+        res = self.http_client.request(
+            method.upper(),
+            self.base_url + endpoint,
+            content=content if method.upper() == "POST" else None,
+            params=params,
+            headers=request_headers,
+        )
+        if res.status_code >= 400:
+            raise ValueError(f"Request failed with status code {res.status_code}: {res.text}")
+        return res.json()
+
+
+
+class CachedExaTools(ExaTools):
+    """ExaTools whose search_exa, find_similar and get_contents results go
+    through a ToolCache. Same signatures and docstrings, so the tool schema
+    sent to the model does not change. Calls also stop at the request
+    deadline (deadlines.py) when it comes before the toolkit timeout."""
+
+    def __init__(self, cache: ToolCache, **kwargs: Any):
+        self.cache = cache
+        super().__init__(**kwargs)
+
+    def _execute_with_timeout(self, func, *args, **kwargs):
+        # The toolkit is shared by every run, so the deadline of the request
+        # is read per call instead of lowering `self.timeout`
+        timeout = self.timeout
+        remaining = deadlines.remaining()
+        if remaining is not None:
+            timeout = min(timeout, remaining)
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            return executor.submit(func, *args, **kwargs).result(timeout=timeout)
+        except TimeoutError:
+            raise TimeoutError(f"Operation timed out after {timeout:.1f} seconds")
+        finally:
+            # Não espera a chamada abandonada terminar
+            executor.shutdown(wait=False)
+
+    def _options(self) -> dict:
+        # Toolkit settings that change what a call returns
+        return {
+            name: getattr(self, name)
+            for name in (
+                "text", "text_length_limit", "highlights", "summary", "num_results", "livecrawl",
+                "start_crawl_date", "end_crawl_date", "start_published_date", "end_published_date",
+                "use_autoprompt", "type", "category", "include_domains", "exclude_domains",
+            )
+        }
+
+    @wraps(ExaTools.search_exa)
+    def search_exa(self, query: str, num_results: int = 5, category: Optional[str] = None) -> str:
+        return self.cache.call(
+            "search_exa",
+            {"query": normalize_query(query), "num_results": self.num_results or num_results, "category": category},
+            self._options(),
+            lambda: super(CachedExaTools, self).search_exa(query, num_results, category),
+        )
+
+    @wraps(ExaTools.find_similar)
+    def find_similar(self, url: str, num_results: int = 5) -> str:
+        return self.cache.call(
+            "find_similar",
+            {"url": url, "num_results": self.num_results or num_results},
+            self._options(),
+            lambda: super(CachedExaTools, self).find_similar(url, num_results),
+        )
+
+    @wraps(ExaTools.get_contents)
+    def get_contents(self, urls: list[str]) -> str:
+        return self.cache.call(
+            "get_contents",
+            {"urls": sorted(urls)},
+            self._options(),
+            lambda: super(CachedExaTools, self).get_contents(urls),
+        )
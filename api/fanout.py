@@ -0,0 +1,52 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Iterable
+
+from pydantic import BaseModel
+
+# The three groups every Book/Video `similarity_type` comes from
+SIMILARITY_GROUPS = ("genre & themes", "author & writing style", "plot & characters")
+
+
+def group_prompt(prompt: str, group: str, count: int) -> str:
+    return (
+        f"{prompt}\n\n"
+        f"Focus only on recommendations similar by {group}. Return exactly {count} recommendations, "
+        f"all with similarity_type \"{group}\" (this replaces the minimum of 12 recommendations per query)."
+    )
+
+
+def merge_lists(list_model: type[BaseModel], field: str, contents: Iterable[BaseModel]) -> BaseModel:
+    """Concatenates the items of several lists (duplicates are collapsed by the dedupe stage)."""
+    return list_model(**{field: [item for content in contents for item in getattr(content, field)]})
+
+
+async def fan_out(
+    run_group: Callable[[str, str], Awaitable[Any]],
+    prompt: str,
+    list_model: type[BaseModel],
+    field: str,
+    per_group: int = 4,
+    groups: tuple[str, ...] = SIMILARITY_GROUPS,
+) -> tuple[BaseModel, bool]:
+    """Runs one focused prompt per similarity group concurrently and merges the results.
+
+    `run_group(group_prompt, group)` returns the run content. Groups that fail
+    or return something other than `list_model` are left out; the error is
+    only raised when no group produced a list. Returns the merged list and
+    whether every group is in it (incomplete answers should not be cached).
+    """
+    results = await asyncio.gather(
+        *(run_group(group_prompt(prompt, group, per_group), group) for group in groups),
+        return_exceptions=True,
+    )
+    contents = [result for result in results if isinstance(result, list_model)]
+    if not contents:
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise errors[0]
+        raise ValueError("Invalid response from recommendation agent")
+
+    for group, result in zip(groups, results):
+        if isinstance(result, BaseException):
+            print(f"Error details: fan-out group {group}: {str(result)}")
+    return merge_lists(list_model, field, contents), len(contents) == len(groups)
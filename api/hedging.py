@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+
+import deadlines
+from metrics import HEDGED_RUNS
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(int(round(q * (len(values) - 1))), len(values) - 1)]
+
+
+class Hedger:
+    """Hedged agent runs.
+
+    When a run is still going after the `quantile` latency of the agent's
+    last `window` runs with the same expected item count (a 4-item fan-out
+    group is faster than a 12-item list), an identical second run is started
+    and whichever finishes first wins; the other one is cancelled. A run's
+    latency is measured from the first run's start to the winner's finish,
+    so the slow runs that got hedged still count as slow. Hedging needs
+    `min_samples` runs of history, never waits less than `min_delay`, is
+    limited to `max_ratio` of the runs, and is skipped when `can_hedge()`
+    says no (admission shedding) or the request deadline would end before a
+    typical run could finish.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        quantile: float = 0.95,
+        min_samples: int = 20,
+        window: int = 200,
+        min_delay: float = 5.0,
+        max_ratio: float = 0.1,
+        can_hedge: Callable[[], bool] = lambda: True,
+    ):
+        self.enabled = enabled
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.window = window
+        self.min_delay = min_delay
+        self.max_ratio = max_ratio
+        self.can_hedge = can_hedge
+        self._lock = threading.Lock()
+        self._seconds: dict[tuple[str, Optional[int]], deque] = {}
+        self.runs = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def observe(self, name: str, seconds: float, expected_items: Optional[int] = None) -> None:
+        with self._lock:
+            self._seconds.setdefault((name, expected_items), deque(maxlen=self.window)).append(seconds)
+
+    def delay(self, name: str, expected_items: Optional[int] = None) -> Optional[float]:
+        """Seconds to wait before hedging a run of `name`; None when it should not be hedged."""
+        with self._lock:
+            samples = list(self._seconds.get((name, expected_items), ()))
+        if not self.enabled or len(samples) < self.min_samples:
+            return None
+        return max(percentile(samples, self.quantile), self.min_delay)
+
+    def _allow(self, name: str, expected_items: Optional[int]) -> bool:
+        if self.hedged + 1 > self.max_ratio * self.runs or not self.can_hedge():
+            return False
+        left = deadlines.remaining()
+        with self._lock:
+            samples = list(self._seconds.get((name, expected_items), ()))
+        # A hedge that cannot finish before the deadline only takes a slot
+        return left is None or left > percentile(samples, 0.5)
+
+    async def run(self, name: str, fn: Callable[[], Awaitable[Any]], expected_items: Optional[int] = None) -> Any:
+        self.runs += 1
+        delay = self.delay(name, expected_items)
+        started_at = time.perf_counter()
+        if delay is None:
+            result = await fn()
+            self.observe(name, time.perf_counter() - started_at, expected_items)
+            return result
+
+        first = asyncio.ensure_future(fn())
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and self._allow(name, expected_items):
+                self.hedged += 1
+                HEDGED_RUNS.inc(agent=name, outcome="started")
+                tasks.add(asyncio.ensure_future(fn()))
+
+            errors = []
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                errors += [task.exception() for task in done if task.exception() is not None]
+                winner = next((task for task in done if task.exception() is None), None)
+                if winner is not None:
+                    # O perdedor cancelado levaria pelo menos esse tempo
+                    self.observe(name, time.perf_counter() - started_at, expected_items)
+                    if winner is not first:
+                        self.hedge_wins += 1
+                        HEDGED_RUNS.inc(agent=name, outcome="won")
+                    return winner.result()
+            raise errors[0]
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> dict:
+        with self._lock:
+            keys = list(self._seconds)
+        return {
+            "enabled": self.enabled,
+            "runs": self.runs,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "hedge_ratio": self.hedged / self.runs if self.runs else 0.0,
+            "delay_seconds": {
+                name if expected_items is None else f"{name}/{expected_items}": self.delay(name, expected_items)
+                for name, expected_items in keys
+            },
+        }
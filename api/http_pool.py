@@ -0,0 +1,221 @@
+import importlib.util
+import threading
+import time
+from typing import Callable, Optional
+
+import httpx
+
+from metrics import HTTP_CONNECT_SECONDS, HTTP_POOL_WAIT_SECONDS
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# (host, status_code, seconds until the response headers arrived)
+ResponseListener = Callable[[str, int, float], None]
+
+
+class RequestTrace:
+    """httpcore trace callback splitting the time before a request is sent
+    into connection setup (TCP, TLS, HTTP/2 preface) and pool wait."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.setup_seconds = 0.0
+        self.sent_at: Optional[float] = None
+        self._step_started_at = 0.0
+
+    def __call__(self, name: str, info: dict) -> None:
+        now = time.perf_counter()
+        if name.startswith("connection.") or name.startswith("http2.send_connection_init"):
+            if name.endswith(".started"):
+                self._step_started_at = now
+            elif name.endswith(".complete"):
+                self.setup_seconds += now - self._step_started_at
+        elif self.sent_at is None and name.endswith("send_request_headers.started"):
+            self.sent_at = now
+
+    async def atrace(self, name: str, info: dict) -> None:
+        self(name, info)
+
+    @property
+    def wait_seconds(self) -> float:
+        if self.sent_at is None:
+            return 0.0
+        return max(self.sent_at - self.started_at - self.setup_seconds, 0.0)
+
+
+class HostStats:
+    def __init__(self, host: str, listeners: list[ResponseListener]):
+        self.host = host
+        self.listeners = listeners
+        self.requests = 0
+        self.throttled = 0
+        self.connections_opened = 0
+        self.wait_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, trace: RequestTrace, status_code: Optional[int]) -> None:
+        with self._lock:
+            self.requests += 1
+            self.wait_seconds += trace.wait_seconds
+            if trace.setup_seconds:
+                self.connections_opened += 1
+            if status_code == 429:
+                self.throttled += 1
+        HTTP_POOL_WAIT_SECONDS.observe(trace.wait_seconds, host=self.host)
+        if trace.setup_seconds:
+            HTTP_CONNECT_SECONDS.observe(trace.setup_seconds, host=self.host)
+        if status_code is not None:
+            elapsed = time.perf_counter() - trace.started_at
+            for listener in self.listeners:
+                listener(self.host, status_code, elapsed)
+
+
+class MeteredTransport(httpx.HTTPTransport):
+    def __init__(self, stats: HostStats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        trace = RequestTrace()
+        request.extensions["trace"] = trace
+        status_code = None
+        try:
+            response = super().handle_request(request)
+            status_code = response.status_code
+            return response
+        finally:
+            self.stats.observe(trace, status_code)
+
+
+class AsyncMeteredTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, stats: HostStats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        trace = RequestTrace()
+        request.extensions["trace"] = trace.atrace
+        status_code = None
+        try:
+            response = await super().handle_async_request(request)
+            status_code = response.status_code
+            return response
+        finally:
+            self.stats.observe(trace, status_code)
+
+
+def connection_states(transport: httpx.BaseTransport) -> tuple[int, int]:
+    """Returns (active, idle) connections currently held by a transport's pool."""
+    pool = getattr(transport, "_pool", None)
+    active = idle = 0
+    for connection in getattr(pool, "connections", []):
+        if connection.is_idle():
+            idle += 1
+        elif not connection.is_closed():
+            active += 1
+    return active, idle
+
+
+class HttpPool:
+    """Keep-alive connection pools shared by every agent, one per upstream host.
+
+    Each host gets its own limits, so a burst of Exa searches cannot starve
+    the Gemini calls (or the other way around). Sync clients serve the tools,
+    which agno runs in worker threads; async clients serve the model calls.
+    HTTP/2 is used when the `h2` package is installed.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 20,
+        max_keepalive: Optional[int] = None,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 60.0,
+        connect_timeout: float = 10.0,
+        http2: bool = True,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            # Fewer keep-alive slots than connections closes the extra ones after every burst
+            max_keepalive_connections=max_keepalive if max_keepalive is not None else max_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self._lock = threading.Lock()
+        self._stats: dict[str, HostStats] = {}
+        self._clients: dict[str, httpx.Client] = {}
+        self._async_clients: dict[str, httpx.AsyncClient] = {}
+        self._transports: list[tuple[str, httpx.BaseTransport]] = []
+        self.listeners: list[ResponseListener] = []
+
+    def __deepcopy__(self, memo):
+        # agno deep-copies agents (and their tools/model) per run; the pool is shared
+        return self
+
+    def add_listener(self, listener: ResponseListener) -> None:
+        """Called with every upstream response (e.g. so admission control sees 429s)."""
+        self.listeners.append(listener)
+
+    def _host_stats(self, host: str) -> HostStats:
+        if host not in self._stats:
+            self._stats[host] = HostStats(host, self.listeners)
+        return self._stats[host]
+
+    def client(self, host: str) -> httpx.Client:
+        with self._lock:
+            if host not in self._clients:
+                transport = MeteredTransport(self._host_stats(host), limits=self.limits, http2=self.http2)
+                self._transports.append((host, transport))
+                self._clients[host] = httpx.Client(transport=transport, timeout=self.timeout)
+            return self._clients[host]
+
+    def async_client(self, host: str) -> httpx.AsyncClient:
+        with self._lock:
+            if host not in self._async_clients:
+                transport = AsyncMeteredTransport(self._host_stats(host), limits=self.limits, http2=self.http2)
+                self._transports.append((host, transport))
+                self._async_clients[host] = httpx.AsyncClient(transport=transport, timeout=self.timeout)
+            return self._async_clients[host]
+
+    async def aclose(self) -> None:
+        with self._lock:
+            clients, async_clients = list(self._clients.values()), list(self._async_clients.values())
+            self._clients, self._async_clients, self._transports = {}, {}, []
+        for client in clients:
+            client.close()
+        for async_client in async_clients:
+            await async_client.aclose()
+
+    def host_stats(self) -> dict:
+        with self._lock:
+            transports = list(self._transports)
+        hosts = {}
+        for host, transport in transports:
+            stats = self._stats[host]
+            active, idle = connection_states(transport)
+            entry = hosts.setdefault(host, {
+                "active": 0,
+                "idle": 0,
+                "requests": stats.requests,
+                "throttled": stats.throttled,
+                "connections_opened": stats.connections_opened,
+                "wait_seconds": stats.wait_seconds,
+            })
+            entry["active"] += active
+            entry["idle"] += idle
+        return hosts
+
+    def stats(self) -> dict:
+        hosts = self.host_stats()
+        return {
+            "http2": self.http2,
+            "max_connections_per_host": self.limits.max_connections,
+            "active": sum(host["active"] for host in hosts.values()),
+            "idle": sum(host["idle"] for host in hosts.values()),
+            "requests": sum(host["requests"] for host in hosts.values()),
+            "throttled": sum(host["throttled"] for host in hosts.values()),
+            "connections_opened": sum(host["connections_opened"] for host in hosts.values()),
+            "wait_seconds": sum(host["wait_seconds"] for host in hosts.values()),
+            "hosts": hosts,
+        }
@@ -0,0 +1,305 @@
+import asyncio
+import ipaddress
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Iterable, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+
+from admission import pid_alive
+
+JobHandler = Callable[[dict], Awaitable[Any]]
+
+# Job status values
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+def check_callback_url(url: str, allowed_hosts: Iterable[str] = ()) -> Optional[str]:
+    """Raises ValueError unless `url` is http(s) and its host is in
+    `allowed_hosts` or, without an allowlist, only resolves to public
+    addresses (the server must not be made to call internal services).
+    Returns the checked address to connect to (None for allowed hosts)."""
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme not in ("http", "https") or not host:
+        raise ValueError("callback_url must be an http(s) URL")
+    allowed_hosts = {allowed.lower() for allowed in allowed_hosts}
+    if allowed_hosts:
+        if host not in allowed_hosts:
+            raise ValueError(f"callback_url host not allowed: {host}")
+        return None
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, parts.port or None, proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, UnicodeError):
+        raise ValueError(f"callback_url host does not resolve: {host}")
+    # "%" separa o escopo de endereços IPv6 link-local
+    if not all(ipaddress.ip_address(address.split("%", 1)[0]).is_global for address in addresses):
+        raise ValueError(f"callback_url host is not public: {host}")
+    return sorted(addresses)[0]
+
+
+def pin_address(url: str, address: Optional[str]) -> tuple[str, dict, dict]:
+    """Points `url` at the already checked `address`, keeping the original
+    Host header and TLS server name, so the host can't be resolved again to
+    an internal address (DNS rebinding). Returns (url, headers, extensions)."""
+    if address is None:
+        return url, {}, {}
+    parts = urlsplit(url)
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    userinfo, _, host_port = parts.netloc.rpartition("@")
+    netloc = f"[{ip}]" if ip.version == 6 else str(ip)
+    if parts.port:
+        netloc += f":{parts.port}"
+    if userinfo:
+        netloc = f"{userinfo}@{netloc}"
+    extensions = {"sni_hostname": parts.hostname} if parts.scheme == "https" else {}
+    return urlunsplit(parts._replace(netloc=netloc)), {"Host": host_port}, extensions
+
+
+class JobStore:
+    """Persists jobs in a SQLite file so results survive restarts and can be
+    polled from any worker process sharing the file."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, status TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, result TEXT, error TEXT, callback_url TEXT, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+        # pid of the worker process running the job (files created before it existed get the column here)
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "worker" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN worker INTEGER")
+
+    def insert(self, kind: str, payload: dict, callback_url: Optional[str], ttl: float) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, payload, status, callback_url, created_at, updated_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), QUEUED, callback_url, now, now, now + ttl),
+            )
+        return job_id
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def claim(self, job_id: str) -> Optional[dict]:
+        """Marks a job as running in this process and returns it, or None when
+        it is finished, expired or running in another live worker process.
+
+        Every worker re-queues the unfinished jobs on startup; the claim is
+        what makes each of them run only once.
+        """
+        worker = os.getpid()
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE id = ? AND expires_at >= ?", (job_id, now)
+                ).fetchone()
+                if row is None or row["status"] in (SUCCEEDED, FAILED):
+                    return None
+                # A job marked with this process' pid comes from a previous run that got
+                # the same pid back (restarted container): this process only claims a job once
+                owner = row["worker"]
+                if row["status"] == RUNNING and owner is not None and owner != worker and pid_alive(owner):
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, worker = ?, updated_at = ? WHERE id = ?",
+                    (RUNNING, worker, now, job_id),
+                )
+                return dict(row, status=RUNNING, attempts=row["attempts"] + 1, worker=worker)
+            finally:
+                self._conn.execute("COMMIT")
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE id = ? AND expires_at >= ?", (job_id, time.time())
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def unfinished(self) -> list[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._conn.execute("DELETE FROM jobs WHERE expires_at < ?", (time.time(),)).rowcount
+
+    def count_by_status(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS total FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["total"] for row in rows}
+
+
+class JobQueue:
+    """Runs registered job handlers on a pool of asyncio workers.
+
+    Submitting only writes the job and enqueues its id, so the HTTP request
+    returns immediately. Failed attempts are retried with exponential backoff
+    up to `max_attempts`; unfinished jobs are re-queued on startup. Callback
+    URLs are checked (`check_callback_url`) on submit and again before the
+    POST, which goes to the address that was checked; they are limited to
+    `callback_hosts` when given.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        workers: int = 4,
+        max_attempts: int = 3,
+        retry_backoff: float = 2.0,
+        ttl: float = 86400,
+        callback_hosts: Iterable[str] = (),
+    ):
+        self.store = store
+        self.callback_hosts = tuple(callback_hosts)
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.ttl = ttl
+        self.handlers: dict[str, JobHandler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list[asyncio.Task] = []
+        self.running = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+
+    @property
+    def running_workers(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self.handlers[kind] = handler
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        for job_id in self.store.unfinished():
+            self._queue.put_nowait(job_id)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._purge_loop()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def check_callback(self, callback_url: str) -> Optional[str]:
+        # Resolver o host bloqueia: fora do event loop
+        return await asyncio.to_thread(check_callback_url, callback_url, self.callback_hosts)
+
+    def submit(self, kind: str, payload: dict, callback_url: Optional[str] = None) -> str:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if self._queue is None:
+            raise RuntimeError("Job queue is not running")
+        job_id = self.store.insert(kind, payload, callback_url, self.ttl)
+        self._queue.put_nowait(job_id)
+        return job_id
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._execute(job_id)
+            except Exception as e:
+                print(f"Error details: job {job_id}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job_id: str) -> None:
+        job = self.store.claim(job_id)
+        if job is None:
+            return
+
+        attempts = job["attempts"]
+        self.running += 1
+        try:
+            result = await self.handlers[job["kind"]](json.loads(job["payload"]))
+        except Exception as e:
+            if attempts < self.max_attempts:
+                self.retried += 1
+                self.store.update(job_id, status=QUEUED, error=str(e))
+                asyncio.get_running_loop().call_later(
+                    self.retry_backoff ** attempts, self._queue.put_nowait, job_id
+                )
+                return
+            self.failed += 1
+            self.store.update(job_id, status=FAILED, error=str(e))
+        else:
+            self.succeeded += 1
+            self.store.update(job_id, status=SUCCEEDED, result=json.dumps(result), error=None)
+        finally:
+            self.running -= 1
+
+        if job["callback_url"]:
+            await self._notify(job["callback_url"], self.describe(self.store.get(job_id)))
+
+    async def _notify(self, callback_url: str, body: Optional[dict]) -> None:
+        try:
+            # The host may resolve elsewhere by now (jobs also outlive restarts)
+            address = await self.check_callback(callback_url)
+            url, headers, extensions = pin_address(callback_url, address)
+            async with httpx.AsyncClient(timeout=10) as client:
+                await client.post(url, json=body, headers=headers, extensions=extensions)
+        except (httpx.HTTPError, ValueError) as e:
+            print(f"Error details: callback to {callback_url} failed: {str(e)}")
+
+    async def _purge_loop(self) -> None:
+        while True:
+            await asyncio.sleep(min(self.ttl, 3600))
+            self.store.purge_expired()
+
+    @staticmethod
+    def describe(job: Optional[dict]) -> Optional[dict]:
+        if job is None:
+            return None
+        return {
+            "id": job["id"],
+            "kind": job["kind"],
+            "status": job["status"],
+            "attempts": job["attempts"],
+            "result": json.loads(job["result"]) if job["result"] else None,
+            "error": job["error"],
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"],
+            "expires_at": job["expires_at"],
+        }
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "running": self.running,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+            "stored": self.store.count_by_status(),
+        }
@@ -0,0 +1,311 @@
+import bisect
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+from admission import pid_alive
+
+# Latency buckets in seconds, from cache hits (ms) up to stalled agent runs (minutes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+
+def escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    @staticmethod
+    def merge(snapshots: Iterable[list]) -> dict[tuple, float]:
+        values: dict[tuple, float] = {}
+        for snapshot in snapshots:
+            for key, value in snapshot:
+                values[tuple(key)] = values.get(tuple(key), 0) + value
+        return values
+
+    def render(self, values: Optional[dict[tuple, float]] = None) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        if values is None:
+            with self._lock:
+                values = dict(self._values)
+        for key, value in values.items():
+            lines.append(f"{self.name}{format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> (bucket counts, sum, count); bucket counts are not cumulative
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return [[list(key), [list(counts), total, count]] for key, (counts, total, count) in self._series.items()]
+
+    @staticmethod
+    def merge(snapshots: Iterable[list]) -> dict[tuple, list]:
+        series: dict[tuple, list] = {}
+        for snapshot in snapshots:
+            for key, (counts, total, count) in snapshot:
+                merged = series.setdefault(tuple(key), [[0] * len(counts), 0.0, 0])
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+                merged[2] += count
+        return series
+
+    def render(self, series: Optional[dict[tuple, list]] = None) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        if series is None:
+            with self._lock:
+                series = {key: [list(counts), total, count] for key, (counts, total, count) in self._series.items()}
+        for key, (counts, total, count) in series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                labels = format_labels(self.labelnames, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsStore:
+    """Snapshots of every worker's metrics in a SQLite file (one row per pid),
+    so any worker can render the metrics of all of them."""
+
+    def __init__(self, path: str):
+        self.worker = os.getpid()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS metric_snapshots ("
+            "worker INTEGER PRIMARY KEY, updated_at REAL NOT NULL, metrics TEXT NOT NULL, gauges TEXT NOT NULL)"
+        )
+
+    def publish(self, metrics: dict, gauges: dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO metric_snapshots (worker, updated_at, metrics, gauges) VALUES (?, ?, ?, ?)",
+                (self.worker, time.time(), json.dumps(metrics), json.dumps(gauges)),
+            )
+
+    def load(self, retention: float) -> list[tuple[int, dict, dict]]:
+        with self._lock:
+            self._conn.execute("DELETE FROM metric_snapshots WHERE updated_at < ?", (time.time() - retention,))
+            rows = self._conn.execute("SELECT worker, metrics, gauges FROM metric_snapshots").fetchall()
+        return [(worker, json.loads(metrics), json.loads(gauges)) for worker, metrics, gauges in rows]
+
+
+class Registry:
+    """Holds metrics plus "stats" collectors, rendered in the Prometheus text format.
+
+    Collectors are callables returning the flat dicts the components already
+    expose on /stats; their numeric values are rendered as gauges.
+
+    With a MetricsStore (multi-worker mode) each worker publishes a snapshot
+    every `interval` seconds and on render; counters and histograms are
+    summed over all workers (exited ones included until `retention`, like
+    the Prometheus client's multiprocess mode) and gauges are rendered per
+    live worker with a `worker` label.
+    """
+
+    def __init__(self, prefix: str = "media_rec"):
+        self.prefix = prefix
+        self._metrics: list = []
+        self._collectors: dict[str, Callable[[], dict]] = {}
+        self.store: Optional[MetricsStore] = None
+        self.retention = 86400.0
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        metric = Counter(f"{self.prefix}_{name}", documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        metric = Histogram(f"{self.prefix}_{name}", documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, name: str, collect: Callable[[], dict]) -> None:
+        self._collectors[name] = collect
+
+    def gauges(self) -> dict[str, float]:
+        values = {}
+        for name, collect in self._collectors.items():
+            for key, value in collect().items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                values[f"{self.prefix}_{name}_{key}"] = value
+        return values
+
+    def publish(self) -> None:
+        if self.store is not None:
+            self.store.publish({metric.name: metric.snapshot() for metric in self._metrics}, self.gauges())
+
+    def share(self, store: MetricsStore, interval: float = 5.0, retention: float = 86400.0) -> None:
+        self.store = store
+        self.retention = retention
+
+        def publish_loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.publish()
+                except Exception as e:
+                    print(f"Error details: metrics publish: {str(e)}")
+
+        threading.Thread(target=publish_loop, name="metrics-publisher", daemon=True).start()
+
+    def render(self) -> str:
+        lines: list[str] = []
+        if self.store is None:
+            for metric in self._metrics:
+                lines.extend(metric.render())
+            for metric_name, value in self.gauges().items():
+                lines.append(f"# TYPE {metric_name} gauge")
+                lines.append(f"{metric_name} {value}")
+            return "\n".join(lines) + "\n"
+
+        self.publish()
+        snapshots = self.store.load(self.retention)
+        for metric in self._metrics:
+            lines.extend(metric.render(metric.merge(metrics.get(metric.name, []) for _, metrics, _ in snapshots)))
+        gauges: dict[str, list[str]] = {}
+        for worker, _, values in snapshots:
+            if worker != self.store.worker and not pid_alive(worker):
+                continue
+            for metric_name, value in values.items():
+                gauges.setdefault(metric_name, []).append(f'{metric_name}{{worker="{worker}"}} {value}')
+        for metric_name, samples in gauges.items():
+            lines.append(f"# TYPE {metric_name} gauge")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "agent_stage_seconds",
+    "Time spent per stage of an agent run (queue, model, tool, parse, total).",
+    ("agent", "stage"),
+)
+TOOL_SECONDS = REGISTRY.histogram(
+    "agent_tool_call_seconds",
+    "Duration of each tool call made by an agent.",
+    ("agent", "tool"),
+)
+MODEL_TOKENS = REGISTRY.histogram(
+    "agent_model_call_tokens",
+    "Tokens per model call.",
+    ("agent", "direction"),
+    buckets=TOKEN_BUCKETS,
+)
+TOKENS_TOTAL = REGISTRY.counter("agent_tokens_total", "Tokens consumed by agent runs.", ("agent", "direction"))
+REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_seconds",
+    "HTTP request latency per route.",
+    ("method", "route", "status"),
+)
+HTTP_POOL_WAIT_SECONDS = REGISTRY.histogram(
+    "http_pool_wait_seconds",
+    "Time an outbound request waited for a pooled connection.",
+    ("host",),
+)
+HTTP_CONNECT_SECONDS = REGISTRY.histogram(
+    "http_connect_seconds",
+    "TCP + TLS (+ HTTP/2 preface) setup time of new outbound connections.",
+    ("host",),
+)
+REPAIRED_ITEMS = REGISTRY.counter(
+    "structured_output_items_total",
+    "Items of list answers that needed repair or were dropped, and runs that were cut off or re-prompted.",
+    ("agent", "outcome"),
+)
+ROUTE_DECISIONS = REGISTRY.counter(
+    "route_decisions_total",
+    "Model tier chosen per recommendation request, and why.",
+    ("kind", "tier", "reason"),
+)
+ROUTE_SECONDS = REGISTRY.histogram(
+    "route_seconds",
+    "Latency of routed recommendation requests per tier and outcome.",
+    ("kind", "tier", "outcome"),
+)
+HEDGED_RUNS = REGISTRY.counter(
+    "hedged_runs_total",
+    "Hedged second agent runs started, and how many of them finished first.",
+    ("agent", "outcome"),
+)
+DEADLINE_EXCEEDED = REGISTRY.counter(
+    "deadline_exceeded_total",
+    "Requests that reached their deadline, by endpoint and what was returned (partial, cached or nothing).",
+    ("endpoint", "outcome"),
+)
+
+
+def observe_run_messages(agent_name: str, messages: Optional[list]) -> None:
+    """Records per model call latency and token counts from a finished run."""
+    for message in messages or []:
+        if message.role != "assistant" or message.metrics is None:
+            continue
+        if message.metrics.time is not None:
+            STAGE_SECONDS.observe(message.metrics.time, agent=agent_name, stage="model")
+        for direction, tokens in (("input", message.metrics.input_tokens), ("output", message.metrics.output_tokens)):
+            if tokens:
+                MODEL_TOKENS.observe(tokens, agent=agent_name, direction=direction)
+                TOKENS_TOTAL.inc(tokens, agent=agent_name, direction=direction)
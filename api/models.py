@@ -0,0 +1,91 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from decimal import Decimal
+
+
+# Models for Books
+class Book(BaseModel):
+    title: str = Field(..., description="The title of the book")
+    author: str = Field(..., description="The author of the book")
+    similarity_type: str = Field(..., description="The type of similarity: genre & themes, author & writing style, plot & characters")
+    publication_year: str = Field(..., description="The publication year")
+    explanation: str = Field(..., description="The explanation: why the book is similar?")
+    genre: list[str] = Field(..., description="The genre of the book starting with emojis representing the genre")
+    subgenres: Optional[list[str]] = Field(None, description="The subgenres")
+    goodreads_rating: Optional[Decimal] = Field(None, description="The Goodreads rating")
+    storygraph_rating: Optional[Decimal] = Field(None, description="The Storygraph rating")
+    page_count: Optional[int] = Field(None, description="The page count")
+    plot_summary: str = Field(..., description="The plot summary")
+    content_advisories: Optional[list[str]] = Field(None, description="The content advisories")
+    awards: Optional[list[str]] = Field(None, description="The awards")
+    series_info: Optional[str] = Field(None, description="The series information")
+    audiobook_available: Optional[bool] = Field(None, description="Audiobook availability")
+    upcoming_adaptations: Optional[str] = Field(None, description="Upcoming adaptations")
+    diversity_highlight: Optional[str] = Field(None, description="Diversity highlight")
+    trigger_warnings: Optional[list[str]] = Field(None, description="Trigger warnings")
+
+class ListBooks(BaseModel):
+    books: list[Book]
+
+class BookRequest(BaseModel):
+    book_title: str = Field(..., description="The title of the book to find recommendations for")
+
+class CustomPromptRequest(BaseModel):
+    prompt: str = Field(..., description="Custom prompt for recommendations")
+
+class Prompts(BaseModel):
+    prompts: list[str] = Field(default_factory=list, description="A list of prompts")
+
+# Models for Videos
+class Video(BaseModel):
+    title: str = Field(..., description="The title of the movie or TV show")
+    type: str = Field(..., description="Whether it's a 'Movie' or 'TV Show'")
+    similarity_type: str = Field(..., description="The type of similarity: genre & themes, author & writing style, plot & characters")
+    explanation: str = Field(..., description="The explanation: why that movie or tv show is similar?")
+    directors: Optional[list[str]] = Field(None, description="The director(s) of the movie or TV show")
+    actors: list[str] = Field(..., description="The main actors in the movie or TV show")
+    genre: list[str] = Field(..., description="The genre(s) of the movie or TV show, starting with emojis")
+    release_year: int = Field(..., description="The release year")
+    plot_summary: str = Field(..., description="A brief summary of the plot")
+    imdb_rating: Optional[float] = Field(None, description="The IMDB rating")
+    tmdb_rating: Optional[float] = Field(None, description="The TMDB rating")
+    runtime: Optional[int] = Field(None, description="The runtime in minutes")
+    content_advisories: Optional[list[str]] = Field(None, description="Content advisories")
+    awards: Optional[list[str]] = Field(None, description="Awards won")
+    series_season: Optional[str] = Field(None, description="How many seasons? (if applicable)")
+    streaming_services: Optional[list[str]] = Field(None, description="Where it's streaming")
+
+class ListVideos(BaseModel):
+    videos: list[Video]
+
+class VideoRequest(BaseModel):
+    title: str = Field(..., description="The title of the video to find recommendations for")
+    media_type: str = Field(..., description="Type of media (Movie or TV Show)")
+
+# Models for batch requests
+class BatchBookRequest(BaseModel):
+    book_titles: list[str] = Field(..., min_length=1, description="The titles of the books to find recommendations for")
+
+class BatchVideoRequest(BaseModel):
+    videos: list[VideoRequest] = Field(..., min_length=1, description="The videos to find recommendations for")
+
+# Models for background jobs
+class JobRequest(BaseModel):
+    kind: str = Field(..., description="The job kind, e.g. books/similar, videos/custom, books/batch")
+    request: dict = Field(..., description="The request body of the matching endpoint")
+    callback_url: Optional[str] = Field(None, description="URL that receives the finished job via POST")
+
+# Models for paged/projected list responses (?fields=...&limit=...)
+class BooksPage(BaseModel):
+    books: list[dict] = Field(..., description="The books of the page, with only the requested fields")
+    result_id: str = Field(..., description="Id of the full result set (detail lookups)")
+    offset: int = Field(..., description="Position of the first item in the result set")
+    total: int = Field(..., description="Items in the result set")
+    next_cursor: Optional[str] = Field(None, description="Cursor of the next page; null on the last one")
+
+class VideosPage(BaseModel):
+    videos: list[dict] = Field(..., description="The videos of the page, with only the requested fields")
+    result_id: str = Field(..., description="Id of the full result set (detail lookups)")
+    offset: int = Field(..., description="Position of the first item in the result set")
+    total: int = Field(..., description="Items in the result set")
+    next_cursor: Optional[str] = Field(None, description="Cursor of the next page; null on the last one")
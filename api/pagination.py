@@ -0,0 +1,86 @@
+import base64
+import hashlib
+import json
+from typing import Optional
+
+from pydantic import BaseModel
+
+from repair import list_field
+
+
+def parse_fields(item_model: type[BaseModel], fields: Optional[str]) -> Optional[tuple[str, ...]]:
+    """Splits "title,author,genre" into field names; None when no projection was asked for."""
+    if fields is None:
+        return None
+    names = tuple(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in item_model.model_fields]
+    if not names or unknown:
+        raise ValueError(
+            f"Unknown fields: {', '.join(unknown) or '(none given)'}; "
+            f"choose from {', '.join(item_model.model_fields)}"
+        )
+    return names
+
+
+def result_id(content: BaseModel) -> str:
+    """Content-addressed id, so the same answer is stored once however often it is served."""
+    return hashlib.sha256(content.__pydantic_serializer__.to_json(content)).hexdigest()[:24]
+
+
+def result_key(list_model: type[BaseModel], rid: str) -> str:
+    return f"results:{list_field(list_model)}:{rid}"
+
+
+def encode_cursor(rid: str, offset: int, limit: Optional[int], fields: Optional[tuple[str, ...]]) -> str:
+    payload = json.dumps({"r": rid, "o": offset, "l": limit, "f": fields}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(
+    cursor: str, item_model: type[BaseModel], max_limit: int
+) -> tuple[str, int, Optional[int], Optional[tuple[str, ...]]]:
+    """Result id, offset, limit and fields of a cursor. Cursors come from the
+    client, so each value is checked like the query parameters are."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        rid, offset, limit, fields = payload["r"], payload["o"], payload.get("l"), payload.get("f")
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(rid, str) or type(offset) is not int or offset < 0:
+        raise ValueError("Invalid cursor")
+    if limit is not None and (type(limit) is not int or not 1 <= limit <= max_limit):
+        raise ValueError("Invalid cursor")
+    if fields is not None and (not isinstance(fields, list) or not all(isinstance(name, str) for name in fields)):
+        raise ValueError("Invalid cursor")
+    return rid, offset, limit, parse_fields(item_model, ",".join(fields)) if fields else None
+
+
+def page(
+    content: BaseModel,
+    rid: str,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    fields: Optional[tuple[str, ...]] = None,
+) -> dict:
+    """One page of a ListBooks/ListVideos result set, items projected to `fields`.
+
+    Items keep their position in the result set (`offset` + index in the
+    page), which is what the detail endpoints take.
+    """
+    field = list_field(type(content))
+    items = getattr(content, field)
+    end = len(items) if limit is None else min(offset + limit, len(items))
+    include = set(fields) if fields else None
+    return {
+        field: [item.model_dump(include=include) for item in items[offset:end]],
+        "result_id": rid,
+        "offset": offset,
+        "total": len(items),
+        "next_cursor": encode_cursor(rid, end, limit, fields) if end < len(items) else None,
+    }
+
+
+def item_at(content: BaseModel, index: int) -> Optional[BaseModel]:
+    items = getattr(content, list_field(type(content)))
+    return items[index] if 0 <= index < len(items) else None
+
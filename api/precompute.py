@@ -0,0 +1,212 @@
+"""Precomputes "similar" recommendations for popular titles into the serving cache.
+
+Reads a title list (CSV with a header, or JSONL) with `title` and, for
+videos, `media_type` ("Movie" or "TV Show"); rows without a media type are
+books. Titles are run through the same flow as the "similar" endpoints
+(book/video recommendation agents, dedupe, response cache) with bounded
+parallelism. Every finished title is checkpointed in a SQLite file, so an
+interrupted pass resumes where it stopped and later passes only refresh
+what is missing from the cache or older than `--max-age`, oldest first,
+at most `--limit` titles per pass.
+
+The response cache must be shared with the server (RESPONSE_CACHE_BACKEND
+sqlite on the same disk, or redis); run it from cron ahead of peak hours:
+
+    python precompute.py popular_titles.csv --max-age 3d --limit 500
+"""
+import argparse
+import asyncio
+import csv
+import json
+import sqlite3
+import sys
+import threading
+import time
+from typing import Iterable, NamedTuple, Optional
+
+from batch import group_by_key, iter_batch
+from models import VideoRequest
+from replay import parse_duration
+from response_cache import similar_cache_key
+
+# Why an entry is (re)computed
+NEW = "new"
+MISSING = "missing"
+STALE = "stale"
+RETRY = "retry"
+
+
+class Title(NamedTuple):
+    title: str
+    media_type: Optional[str] = None
+
+    @property
+    def kind(self) -> str:
+        return "video" if self.media_type else "book"
+
+    @property
+    def cache_key(self) -> str:
+        return similar_cache_key(self.media_type or "book", self.title)
+
+
+def read_titles(path: str) -> list[Title]:
+    """Titles in file order (most popular first, by convention)."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    titles = []
+    for row in rows:
+        title = (row.get("title") or row.get("book_title") or "").strip()
+        if title:
+            titles.append(Title(title, (row.get("media_type") or "").strip() or None))
+    return titles
+
+
+class PrecomputeStore:
+    """Checkpoints of the pipeline: last status and refresh time per cache key."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS precomputed ("
+            "key TEXT PRIMARY KEY, title TEXT NOT NULL, media_type TEXT, status TEXT NOT NULL, "
+            "items INTEGER, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+            "refreshed_at REAL, updated_at REAL NOT NULL)"
+        )
+
+    def get_all(self) -> dict[str, dict]:
+        with self._lock:
+            return {row["key"]: dict(row) for row in self._conn.execute("SELECT * FROM precomputed")}
+
+    def succeeded(self, title: Title, items: int) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO precomputed (key, title, media_type, status, items, attempts, refreshed_at, updated_at) "
+                "VALUES (?, ?, ?, 'ok', ?, 0, ?, ?) ON CONFLICT (key) DO UPDATE SET "
+                "status = 'ok', items = excluded.items, error = NULL, attempts = 0, "
+                "refreshed_at = excluded.refreshed_at, updated_at = excluded.updated_at",
+                (title.cache_key, title.title, title.media_type, items, now, now),
+            )
+
+    def failed(self, title: Title, error: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO precomputed (key, title, media_type, status, error, attempts, updated_at) "
+                "VALUES (?, ?, ?, 'failed', ?, 1, ?) ON CONFLICT (key) DO UPDATE SET "
+                "status = 'failed', error = excluded.error, attempts = attempts + 1, updated_at = excluded.updated_at",
+                (title.cache_key, title.title, title.media_type, error, time.time()),
+            )
+
+
+def plan(
+    titles: Iterable[Title],
+    checkpoints: dict[str, dict],
+    in_cache,
+    max_age: float,
+    max_attempts: int,
+    now: Optional[float] = None,
+) -> list[tuple[Title, str]]:
+    """Titles due for a run and why: never computed or gone from the cache
+    first (in file order), then the stalest refreshed ones, then retries.
+    Titles that failed `max_attempts` times in a row wait `max_age` before
+    being tried again."""
+    now = time.time() if now is None else now
+    first, stale, retries = [], [], []
+    for key, values in group_by_key(titles, lambda title: title.cache_key).items():
+        title, checkpoint = values[0], checkpoints.get(key)
+        if checkpoint is None:
+            first.append((title, NEW))
+        elif checkpoint["status"] == "failed":
+            if checkpoint["attempts"] < max_attempts or now - checkpoint["updated_at"] >= max_age:
+                retries.append((title, RETRY))
+        elif now - checkpoint["refreshed_at"] >= max_age:
+            stale.append((checkpoint["refreshed_at"], title))
+        elif not in_cache(key):
+            first.append((title, MISSING))
+    stale.sort(key=lambda pair: pair[0])
+    return first + [(title, STALE) for _, title in stale] + retries
+
+
+async def precompute(due: list[tuple[Title, str]], store: PrecomputeStore, concurrency: int) -> dict:
+    import recommendation_api as api
+
+    async def worker(title: Title):
+        if title.kind == "book":
+            return await api.similar_books(title.title, refresh=True)
+        return await api.similar_videos(VideoRequest(title=title.title, media_type=title.media_type), refresh=True)
+
+    counts = {"ok": 0, "empty": 0, "failed": 0}
+    groups = {title.cache_key: [(title, reason)] for title, reason in due}
+    started_at = time.perf_counter()
+    async for key, values, content, error in iter_batch(groups, lambda value: worker(value[0]), concurrency):
+        title, reason = values[0]
+        items = api.count_items(content, type(content)) if type(content) in api.LIST_FIELDS else None
+        if error is None and items:
+            store.succeeded(title, items)
+            counts["ok"] += 1
+            outcome = f"{items} items"
+        else:
+            # Respostas vazias não entram no cache: tenta de novo na próxima passada
+            message = str(error) if error is not None else "Invalid or empty response from recommendation agent"
+            store.failed(title, message)
+            counts["failed" if error is not None else "empty"] += 1
+            outcome = f"failed: {message}"
+        done = sum(counts.values())
+        print(f"[{done}/{len(due)}] {title.kind} {title.title!r} ({reason}): {outcome}")
+    counts["seconds"] = time.perf_counter() - started_at
+
+    await api.http_pool.aclose()
+    if api.run_store is not None:
+        api.run_store.flush()
+    return counts
+
+
+def main() -> int:
+    import recommendation_api as api
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("titles", help="CSV (with a header) or JSONL file with title[, media_type]")
+    parser.add_argument("--max-age", type=parse_duration, default=api.PRECOMPUTE_MAX_AGE, help="refresh entries older than this (e.g. 3d)")
+    parser.add_argument("--limit", type=int, default=0, help="at most this many titles per pass (0 = all due)")
+    parser.add_argument("--concurrency", type=int, default=api.PRECOMPUTE_CONCURRENCY)
+    parser.add_argument("--max-attempts", type=int, default=api.PRECOMPUTE_MAX_ATTEMPTS)
+    parser.add_argument("--checkpoints", default=api.PRECOMPUTE_STORE_PATH, help="checkpoint file")
+    parser.add_argument("--dry-run", action="store_true", help="only list the titles due")
+    args = parser.parse_args()
+
+    if api.RESPONSE_CACHE_BACKEND == "memory" and not args.dry_run:
+        parser.error("the memory response cache is not shared with the server; set RESPONSE_CACHE_BACKEND to sqlite or redis")
+    if args.max_age >= api.RESPONSE_CACHE_TTL:
+        print(f"Warning: --max-age is not below RESPONSE_CACHE_TTL ({api.RESPONSE_CACHE_TTL:.0f}s); entries may expire before a refresh")
+
+    store = PrecomputeStore(args.checkpoints)
+    titles = read_titles(args.titles)
+    due = plan(
+        titles,
+        store.get_all(),
+        lambda key: api.response_cache.backend.get(key) is not None,
+        args.max_age,
+        args.max_attempts,
+    )
+    if args.limit:
+        due = due[:args.limit]
+    reasons = {reason: sum(1 for _, r in due if r == reason) for reason in (NEW, MISSING, STALE, RETRY)}
+    print(f"{len(titles)} titles, {len(due)} due {reasons}")
+    if args.dry_run:
+        for title, reason in due:
+            print(f"{reason:>8} {title.kind} {title.title}")
+        return 0
+
+    counts = asyncio.run(precompute(due, store, args.concurrency))
+    print(counts)
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
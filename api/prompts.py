@@ -0,0 +1,100 @@
+import hashlib
+import math
+import threading
+from datetime import date
+from typing import Callable, Optional
+
+from agno.agent import Agent
+
+# Rough estimate for Gemini on English text; the real counts come from the
+# usage metadata of each response.
+CHARS_PER_TOKEN = 4
+TRIM_MARKER = "\n[...]"
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+def system_prefix(agent: Agent) -> str:
+    """The part of the system message that is the same on every run."""
+    instructions = agent.instructions if isinstance(agent.instructions, str) else "\n".join(agent.instructions or [])
+    return f"{agent.description or ''}\n{instructions}"
+
+
+class PromptAssembler:
+    """Builds the user message of each run around a stable system prefix.
+
+    Agent description/instructions (the system prefix) never change between
+    runs, so Gemini can reuse its prompt cache; everything per request (the
+    prompt itself, catalog context, today's date at day granularity) goes in
+    the user message. The message is trimmed to fit `max_input_tokens` with
+    the prefix, and runs whose input already went over the budget make no
+    more tool calls and are not re-prompted (`over_budget` counts the calls
+    skipped). Token counts per agent are kept for /stats.
+    """
+
+    def __init__(self, max_input_tokens: int = 0, today: Callable[[], date] = date.today):
+        self.max_input_tokens = max_input_tokens
+        self.today = today
+        self._lock = threading.Lock()
+        self._agents: dict[str, dict] = {}
+
+    def _agent_stats(self, agent: Agent) -> dict:
+        stats = self._agents.get(agent.name)
+        if stats is None:
+            prefix = system_prefix(agent)
+            stats = self._agents[agent.name] = {
+                "prompt_version": hashlib.sha256(prefix.encode()).hexdigest()[:8],
+                "prefix_tokens": estimate_tokens(prefix),
+                "runs": 0,
+                "input_tokens": 0,
+                "output_tokens": 0,
+                "trimmed": 0,
+                "over_budget": 0,
+            }
+        return stats
+
+    def version(self, agent: Agent) -> str:
+        with self._lock:
+            return self._agent_stats(agent)["prompt_version"]
+
+    def assemble(self, agent: Agent, prompt: str) -> str:
+        context = f"\n\nToday's date: {self.today().isoformat()}"
+        with self._lock:
+            stats = self._agent_stats(agent)
+            if self.max_input_tokens:
+                budget = (self.max_input_tokens - stats["prefix_tokens"] - estimate_tokens(context)) * CHARS_PER_TOKEN
+                if len(prompt) > budget:
+                    stats["trimmed"] += 1
+                    prompt = prompt[:max(budget - len(TRIM_MARKER), 0)] + TRIM_MARKER
+        return prompt + context
+
+    def observe(self, agent: Agent, tokens: dict) -> None:
+        with self._lock:
+            stats = self._agent_stats(agent)
+            stats["runs"] += 1
+            stats["input_tokens"] += tokens["input"]
+            stats["output_tokens"] += tokens["output"]
+
+    def over_budget(self, agent: Agent, input_tokens: int) -> bool:
+        """True when a run already used its input budget (no tool calls or re-prompts then)."""
+        if not self.max_input_tokens or input_tokens <= self.max_input_tokens:
+            return False
+        with self._lock:
+            self._agent_stats(agent)["over_budget"] += 1
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_input_tokens": self.max_input_tokens,
+                "agents": {
+                    name: dict(
+                        stats,
+                        input_tokens_per_run=stats["input_tokens"] / stats["runs"] if stats["runs"] else 0.0,
+                        output_tokens_per_run=stats["output_tokens"] / stats["runs"] if stats["runs"] else 0.0,
+                    )
+                    for name, stats in self._agents.items()
+                },
+            }
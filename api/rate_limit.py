@@ -0,0 +1,92 @@
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from limits.storage import Storage
+
+
+class SQLiteRateLimitStorage(Storage):
+    """Fixed-window counters for slowapi/limits in a SQLite file, so every
+    worker process of a host counts against the same limits.
+
+    Registered as the "sqlite" scheme: `Limiter(storage_uri="sqlite:///path/ratelimit.db")`.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+    # Expired windows are deleted every this many increments
+    PURGE_EVERY = 1000
+
+    def __init__(self, uri: Optional[str] = None, wrap_exceptions: bool = False, **options):
+        # sqlite:///relative.db -> "relative.db", sqlite:////abs/path.db -> "/abs/path.db"
+        self.path = (uri or "sqlite:///ratelimit.db")[len("sqlite:///"):]
+        self._lock = threading.Lock()
+        self._increments = 0
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL NOT NULL)"
+        )
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        now = time.time()
+        with self._lock:
+            self._increments += 1
+            if self._increments % self.PURGE_EVERY == 0:
+                self._conn.execute("DELETE FROM rate_limits WHERE expires_at <= ?", (now,))
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Janela expirada recomeça do zero
+                return self._conn.execute(
+                    "INSERT INTO rate_limits (key, value, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET "
+                    "value = CASE WHEN expires_at <= ? THEN excluded.value ELSE value + excluded.value END, "
+                    "expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END "
+                    "RETURNING value",
+                    (key, amount, now + expiry, now, now),
+                ).fetchone()[0]
+            finally:
+                self._conn.execute("COMMIT")
+
+    def get(self, key: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM rate_limits WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row is not None else 0
+
+    def get_expiry(self, key: str) -> float:
+        with self._lock:
+            row = self._conn.execute("SELECT expires_at FROM rate_limits WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None and row[0] > time.time() else time.time()
+
+    def check(self) -> bool:
+        try:
+            with self._lock:
+                self._conn.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> int:
+        with self._lock:
+            return self._conn.execute("DELETE FROM rate_limits").rowcount
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM rate_limits WHERE key = ?", (key,))
+
+
+def rate_limit_storage_uri(name: str, path: str = "ratelimit.db", redis_url: Optional[str] = None) -> str:
+    if name == "memory":
+        return "memory://"
+    if name == "sqlite":
+        return f"sqlite:///{path}"
+    if name == "redis":
+        return redis_url or "redis://localhost:6379/0"
+    raise ValueError(f"Unknown rate limit storage: {name}")
@@ -1,23 +1,55 @@
-from fastapi import FastAPI, HTTPException, Security, Depends, Request
+from fastapi import FastAPI, HTTPException, Security, Depends, Request, Query
 from fastapi.security.api_key import APIKeyHeader, APIKey
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, ValidationError
+from typing import AsyncIterator, Awaitable, Callable, Optional, Union
+from contextlib import asynccontextmanager
+import asyncio
 import os
+import time
+import uuid
 from dotenv import load_dotenv
-from textwrap import dedent
-from decimal import Decimal
-
-from traceloop.sdk import Traceloop
-from traceloop.sdk.decorators import agent, tool
-
 
 from agno.agent import Agent
-from agno.models.google import Gemini
-from agno.tools.exa import ExaTools
+
+from models import (
+    Book, ListBooks, BookRequest, CustomPromptRequest, Video, ListVideos, VideoRequest,
+    BatchBookRequest, BatchVideoRequest, JobRequest, BooksPage, VideosPage,
+)
+from agents import (
+    LazyAgent, build_book_recommendation_agent, build_prompt_recommendation_agent, build_video_recommendation_agent,
+    build_fast_book_recommendation_agent, build_fast_video_recommendation_agent,
+)
+from tracing import agent, init_tracing
+from agent_runner import AgentRunner
+from admission import AdmissionController, QueueFullError, create_counter_store
+from response_cache import ResponseCache, create_backend, similar_cache_key
+from singleflight import SingleFlight, normalize_prompt
+from streaming import ndjson_line, sse_event, stream_items
+from batch import group_by_key, iter_batch
+from jobs import JobQueue, JobStore
+from catalog import Catalog
+from http_pool import HttpPool
+from fanout import fan_out
+from dedupe import Deduplicator, dedupe_list
+from routing import FAST, ModelRouter, Route
+from serialization import FastJSONResponse
+from pagination import decode_cursor, item_at, page, parse_fields, result_id, result_key
+from run_store import RunStore
+from prompts import PromptAssembler
+from replay import warm_caches
+from tool_cache import ToolCache
+from deadlines import (
+    DeadlineExceeded, deadline_expired, deadline_scope, iter_within_deadline, offer, wait_for_deadline,
+)
+from hedging import Hedger
+from semantic_cache import HashedNgramEmbedder, SemanticCache, SentenceTransformerEmbedder, SQLiteSemanticStore
+from rate_limit import rate_limit_storage_uri
+from metrics import DEADLINE_EXCEEDED, REGISTRY, REQUEST_SECONDS, MetricsStore
 
 # Load environment variables
 load_dotenv()
@@ -27,6 +59,141 @@ API_KEY_TMDB = os.getenv('API_KEY_TMDB')
 API_KEY = os.getenv('CLIENT_API_KEY')
 API_KEY_TRACELOOP=os.getenv('API_KEY_TRACELOOP')
 
+# Worker processes (uvicorn --workers reads WEB_CONCURRENCY too). With more than one,
+# rate limits, caches, admission and metrics must live outside the process:
+# SHARED_STATE is the default backend of all of them (memory, sqlite or redis)
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', 1))
+SHARED_STATE = os.getenv('SHARED_STATE', 'sqlite' if WEB_CONCURRENCY > 1 else 'memory')
+RATE_LIMIT_STORAGE = os.getenv('RATE_LIMIT_STORAGE', SHARED_STATE)
+RATE_LIMIT_PATH = os.getenv('RATE_LIMIT_PATH', 'ratelimit.db')
+# Metrics and semantic cache entries are shared through SQLite files (one host)
+METRICS_STORE_PATH = os.getenv('METRICS_STORE_PATH', 'metrics.db')
+SEMANTIC_CACHE_STORE_PATH = os.getenv('SEMANTIC_CACHE_STORE_PATH', 'semantic_cache.db')
+
+# Agent execution limits (starting concurrency for admission control, max waiting runs)
+AGENT_MAX_CONCURRENCY = int(os.getenv('AGENT_MAX_CONCURRENCY', 8))
+AGENT_MAX_QUEUE = int(os.getenv('AGENT_MAX_QUEUE', 64))
+
+# Adaptive admission control (AIMD) shared by all workers through the store (memory, sqlite or redis)
+ADMISSION_STORE = os.getenv('ADMISSION_STORE', SHARED_STATE)
+ADMISSION_STORE_PATH = os.getenv('ADMISSION_STORE_PATH', 'admission.db')
+ADMISSION_MIN_CONCURRENCY = int(os.getenv('ADMISSION_MIN_CONCURRENCY', 2))
+ADMISSION_MAX_CONCURRENCY = int(os.getenv('ADMISSION_MAX_CONCURRENCY', 4 * AGENT_MAX_CONCURRENCY))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 30))
+ADMISSION_LATENCY_TARGET = float(os.getenv('ADMISSION_LATENCY_TARGET', 90))
+
+# Response cache for the "similar" endpoints (memory, sqlite or redis)
+# With redis the *_MAX_ENTRIES limits don't apply: cache size depends on the server's maxmemory and eviction policy
+RESPONSE_CACHE_BACKEND = os.getenv('RESPONSE_CACHE_BACKEND', SHARED_STATE)
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', 7 * 24 * 3600))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 2000))
+RESPONSE_CACHE_PATH = os.getenv('RESPONSE_CACHE_PATH', 'response_cache.db')
+REDIS_URL = os.getenv('REDIS_URL')
+
+# Batch endpoints
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 500))
+BATCH_MAX_CONCURRENCY = int(os.getenv('BATCH_MAX_CONCURRENCY', 4))
+
+# Background jobs
+JOB_STORE_PATH = os.getenv('JOB_STORE_PATH', 'jobs.db')
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 4))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+JOB_TTL = float(os.getenv('JOB_TTL', 24 * 3600))
+# Hosts job callbacks may be sent to, comma separated (empty: any host resolving to public addresses)
+JOB_CALLBACK_HOSTS = [host.strip() for host in os.getenv('JOB_CALLBACK_HOSTS', '').split(',') if host.strip()]
+
+# Local catalog of books/videos from past runs
+CATALOG_PATH = os.getenv('CATALOG_PATH', 'catalog.db')
+
+# Semantic cache for the custom prompt endpoints
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', 0.85))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', 5000))
+SEMANTIC_CACHE_DIM = int(os.getenv('SEMANTIC_CACHE_DIM', 1024))
+SEMANTIC_CACHE_TTL = float(os.getenv('SEMANTIC_CACHE_TTL', 24 * 3600))
+# e.g. "all-MiniLM-L6-v2"; hashed n-grams when unset
+SEMANTIC_CACHE_MODEL = os.getenv('SEMANTIC_CACHE_MODEL')
+
+# Exa tool call results by normalized query (memory, sqlite to keep them on disk, or redis)
+TOOL_CACHE_ENABLED = os.getenv('TOOL_CACHE_ENABLED', 'true').lower() == 'true'
+TOOL_CACHE_BACKEND = os.getenv('TOOL_CACHE_BACKEND', SHARED_STATE)
+TOOL_CACHE_PATH = os.getenv('TOOL_CACHE_PATH', 'tool_cache.db')
+TOOL_CACHE_TTL = float(os.getenv('TOOL_CACHE_TTL', 24 * 3600))
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv('TOOL_CACHE_MAX_ENTRIES', 5000))
+TOOL_CACHE_MAX_RESULT_CHARS = int(os.getenv('TOOL_CACHE_MAX_RESULT_CHARS', 100_000))
+
+# Tolerant parsing of list answers: items lost to broken/cut-off JSON are asked for again (0 disables)
+REPAIR_EXPECTED_ITEMS = int(os.getenv('REPAIR_EXPECTED_ITEMS', 12))
+REPAIR_MAX_REPROMPTS = int(os.getenv('REPAIR_MAX_REPROMPTS', 1))
+
+# Run store: every agent run (prompt, model, tool calls, raw output, timings) for replay/analysis
+RUN_STORE_ENABLED = os.getenv('RUN_STORE_ENABLED', 'true').lower() == 'true'
+RUN_STORE_PATH = os.getenv('RUN_STORE_PATH', 'runs.db')
+RUN_STORE_RETENTION = float(os.getenv('RUN_STORE_RETENTION', 30 * 24 * 3600))
+# Refill the caches from recorded runs on startup (warm deploys)
+RUN_STORE_WARM_ON_STARTUP = os.getenv('RUN_STORE_WARM_ON_STARTUP', 'true').lower() == 'true'
+
+# Precomputation of popular titles into the response cache (precompute.py)
+PRECOMPUTE_STORE_PATH = os.getenv('PRECOMPUTE_STORE_PATH', 'precompute.db')
+PRECOMPUTE_MAX_AGE = float(os.getenv('PRECOMPUTE_MAX_AGE', 3 * 24 * 3600))
+PRECOMPUTE_CONCURRENCY = int(os.getenv('PRECOMPUTE_CONCURRENCY', 4))
+PRECOMPUTE_MAX_ATTEMPTS = int(os.getenv('PRECOMPUTE_MAX_ATTEMPTS', 3))
+
+# Fan-out mode: one focused run per similarity group instead of a single run
+FANOUT_DEFAULT = os.getenv('FANOUT_DEFAULT', 'false').lower() == 'true'
+FANOUT_ITEMS_PER_GROUP = int(os.getenv('FANOUT_ITEMS_PER_GROUP', 4))
+
+# Near-duplicate detection on every recommendation list (0-1, trigram Dice similarity)
+DEDUPE_THRESHOLD = float(os.getenv('DEDUPE_THRESHOLD', 0.85))
+
+# Model routing: "similar" requests with a catalog hit go to a cheaper model without tools
+ROUTING_ENABLED = os.getenv('ROUTING_ENABLED', 'true').lower() == 'true'
+ROUTING_FAST_MODEL = os.getenv('ROUTING_FAST_MODEL', 'gemini-2.0-flash-lite')
+ROUTING_MIN_CATALOG_HITS = int(os.getenv('ROUTING_MIN_CATALOG_HITS', 6))
+ROUTING_CONTEXT_ITEMS = int(os.getenv('ROUTING_CONTEXT_ITEMS', 20))
+# Fast answers with fewer items are redone on the full tier
+ROUTING_MIN_ITEMS = int(os.getenv('ROUTING_MIN_ITEMS', 8))
+
+# Prompt budget: input tokens per run (user message trimmed, no tool calls or re-prompt once over), output tokens per model call
+PROMPT_MAX_INPUT_TOKENS = int(os.getenv('PROMPT_MAX_INPUT_TOKENS', 64000))
+PROMPT_MAX_OUTPUT_TOKENS = int(os.getenv('PROMPT_MAX_OUTPUT_TOKENS', 8192)) or None
+# Characters of page text per Exa result sent back to the model
+PROMPT_TOOL_TEXT_LIMIT = int(os.getenv('PROMPT_TOOL_TEXT_LIMIT', 1000))
+
+# Deadlines per endpoint in seconds (0 disables). Model and tool calls stop at the deadline and
+# the best partial or cached answer is returned (504 when there is none); batch and jobs have none
+DEADLINE_SIMILAR = float(os.getenv('DEADLINE_SIMILAR', 60))
+DEADLINE_CUSTOM = float(os.getenv('DEADLINE_CUSTOM', 75))
+DEADLINE_STREAM = float(os.getenv('DEADLINE_STREAM', 90))
+
+# Hedged runs: a second identical run starts when the first outlasts the p95 of the agent's recent runs
+HEDGE_ENABLED = os.getenv('HEDGE_ENABLED', 'true').lower() == 'true'
+HEDGE_QUANTILE = float(os.getenv('HEDGE_QUANTILE', 0.95))
+HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', 20))
+HEDGE_MIN_DELAY = float(os.getenv('HEDGE_MIN_DELAY', 5))
+# Fraction of the runs that may be hedged
+HEDGE_MAX_RATIO = float(os.getenv('HEDGE_MAX_RATIO', 0.1))
+
+# Response encoding: Decimal ratings as "string" (exact, default) or "float"; gzip/brotli for large lists
+RESPONSE_DECIMAL_POLICY = os.getenv('RESPONSE_DECIMAL_POLICY', 'string')
+RESPONSE_COMPRESSION = os.getenv('RESPONSE_COMPRESSION', 'true').lower() == 'true'
+RESPONSE_COMPRESSION_MIN_SIZE = int(os.getenv('RESPONSE_COMPRESSION_MIN_SIZE', 4096))
+
+# Field projection and cursor pagination of list responses (?fields=title,author&limit=6);
+# the full lists are kept apart from the response cache, for the next pages and detail lookups
+RESULT_SET_BACKEND = os.getenv('RESULT_SET_BACKEND', RESPONSE_CACHE_BACKEND)
+RESULT_SET_PATH = os.getenv('RESULT_SET_PATH', 'result_sets.db')
+RESULT_SET_TTL = float(os.getenv('RESULT_SET_TTL', 3600))
+RESULT_SET_MAX_ENTRIES = int(os.getenv('RESULT_SET_MAX_ENTRIES', 2000))
+PAGE_MAX_LIMIT = int(os.getenv('PAGE_MAX_LIMIT', 50))
+
+# Shared outbound HTTP pool (Exa and Gemini), limits per upstream host
+HTTP_POOL_MAX_CONNECTIONS = int(os.getenv('HTTP_POOL_MAX_CONNECTIONS', 20))
+HTTP_POOL_MAX_KEEPALIVE = int(os.getenv('HTTP_POOL_MAX_KEEPALIVE', HTTP_POOL_MAX_CONNECTIONS))
+HTTP_POOL_KEEPALIVE_EXPIRY = float(os.getenv('HTTP_POOL_KEEPALIVE_EXPIRY', 30))
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 60))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 10))
+HTTP2_ENABLED = os.getenv('HTTP2_ENABLED', 'true').lower() == 'true'
+
 # API Key security
 API_KEY_NAME = "X-API-Key"
 api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=True)
@@ -39,19 +206,45 @@ async def get_api_key(api_key_header: str = Security(api_key_header)):
         detail="Invalid API Key"
     )
 
-# Inicializa o limiter
-limiter = Limiter(key_func=get_remote_address)
-
-Traceloop.init(
-  disable_batch=True, 
-  api_key=API_KEY_TRACELOOP
+# Inicializa o limiter (contadores compartilhados entre os workers quando SHARED_STATE não é memory)
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=rate_limit_storage_uri(RATE_LIMIT_STORAGE, path=RATE_LIMIT_PATH, redis_url=REDIS_URL),
 )
 
+if SHARED_STATE != 'memory':
+    REGISTRY.share(MetricsStore(METRICS_STORE_PATH))
 
-app = FastAPI(title="Media Recommendation API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await job_queue.start()
+    # Agentes e Traceloop carregam em segundo plano; /health/ready indica quando terminou
+    startup = asyncio.create_task(asyncio.to_thread(load_heavy_dependencies))
+    yield
+    startup.cancel()
+    await job_queue.stop()
+    await http_pool.aclose()
+    if run_store is not None:
+        await asyncio.to_thread(run_store.flush)
+
+app = FastAPI(title="Media Recommendation API", lifespan=lifespan)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started_at = time.perf_counter()
+    response = await call_next(request)
+    # Streaming responses are measured up to the first byte
+    route = request.scope.get("route")
+    REQUEST_SECONDS.observe(
+        time.perf_counter() - started_at,
+        method=request.method,
+        route=route.path if route is not None else "unmatched",
+        status=str(response.status_code),
+    )
+    return response
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["https://mediamatchmaker.vercel.app", "http://localhost:3000"],
@@ -63,230 +256,742 @@ app.add_middleware(
 )
 
 
-# Models for Books
-class Book(BaseModel):
-    title: str = Field(..., description="The title of the book")
-    author: str = Field(..., description="The author of the book")
-    similarity_type: str = Field(..., description="The type of similarity: genre & themes, author & writing style, plot & characters")
-    publication_year: str = Field(..., description="The publication year")
-    explanation: str = Field(..., description="The explanation: why the book is similar?")
-    genre: list[str] = Field(..., description="The genre of the book starting with emojis representing the genre")
-    subgenres: Optional[list[str]] = Field(None, description="The subgenres")
-    goodreads_rating: Optional[Decimal] = Field(None, description="The Goodreads rating")
-    storygraph_rating: Optional[Decimal] = Field(None, description="The Storygraph rating")
-    page_count: Optional[int] = Field(None, description="The page count")
-    plot_summary: str = Field(..., description="The plot summary")
-    content_advisories: Optional[list[str]] = Field(None, description="The content advisories")
-    awards: Optional[list[str]] = Field(None, description="The awards")
-    series_info: Optional[str] = Field(None, description="The series information")
-    audiobook_available: Optional[bool] = Field(None, description="Audiobook availability")
-    upcoming_adaptations: Optional[str] = Field(None, description="Upcoming adaptations")
-    diversity_highlight: Optional[str] = Field(None, description="Diversity highlight")
-    trigger_warnings: Optional[list[str]] = Field(None, description="Trigger warnings")
-
-class ListBooks(BaseModel):
-    books: list[Book]
-
-class BookRequest(BaseModel):
-    book_title: str = Field(..., description="The title of the book to find recommendations for")
-
-class CustomPromptRequest(BaseModel):
-    prompt: str = Field(..., description="Custom prompt for recommendations")
-
-class Prompts(BaseModel):
-    prompts: list[str] = Field(default_factory=list, description="A list of prompts")
-
-# Models for Videos
-class Video(BaseModel):
-    title: str = Field(..., description="The title of the movie or TV show")
-    type: str = Field(..., description="Whether it's a 'Movie' or 'TV Show'")
-    similarity_type: str = Field(..., description="The type of similarity: genre & themes, author & writing style, plot & characters")
-    explanation: str = Field(..., description="The explanation: why that movie or tv show is similar?")
-    directors: Optional[list[str]] = Field(None, description="The director(s) of the movie or TV show")
-    actors: list[str] = Field(..., description="The main actors in the movie or TV show")
-    genre: list[str] = Field(..., description="The genre(s) of the movie or TV show, starting with emojis")
-    release_year: int = Field(..., description="The release year")
-    plot_summary: str = Field(..., description="A brief summary of the plot")
-    imdb_rating: Optional[float] = Field(None, description="The IMDB rating")
-    tmdb_rating: Optional[float] = Field(None, description="The TMDB rating")
-    runtime: Optional[int] = Field(None, description="The runtime in minutes")
-    content_advisories: Optional[list[str]] = Field(None, description="Content advisories")
-    awards: Optional[list[str]] = Field(None, description="Awards won")
-    series_season: Optional[str] = Field(None, description="How many seasons? (if applicable)")
-    streaming_services: Optional[list[str]] = Field(None, description="Where it's streaming")
-
-class ListVideos(BaseModel):
-    videos: list[Video]
-
-class VideoRequest(BaseModel):
-    title: str = Field(..., description="The title of the video to find recommendations for")
-    media_type: str = Field(..., description="Type of media (Movie or TV Show)")
-
-# Initialize Gemini Model
-MODEL_GEMINI: Gemini = Gemini(id="gemini-2.0-flash-exp", api_key=API_KEY_GEMINI)
-
-# Initialize Agents
-book_recommendation_agent = Agent(
-    name="Shelfie",
-    tools=[ExaTools(api_key=API_KEY_EXA,num_results=12,show_results=True)],
-    model=MODEL_GEMINI,
-    description=dedent("""\
-        You are Shelfie, a passionate and knowledgeable literary curator with expertise in books worldwide! 📚
-
-        Your mission is to help readers discover their next favorite books by providing detailed,
-        personalized recommendations based on their preferences, reading history, and the latest
-        in literature. 
-        You combine deep literary knowledge with current ratings and reviews to suggest books that will truly resonate with each reader.
-        Do not invent data. If not found, that's okay. Return empty.
-                       """),
-    instructions=dedent("""\
-        Approach each recommendation with these steps:
-
-        1. Analysis Phase 📖
-        - Understand reader preferences from their input
-        - Consider mentioned favorite books' genre & themes, author & writing style, plot & characters
-        - Factor in any specific requirements (genre, length, content warnings)
-
-        2. Search & Curate 🔍
-        - Use Exa to search for relevant books
-        - Ensure diversity in recommendations, ensuring similarities by these 3 groups genre & themes, author & writing style, plot & characters
-        - Verify all book data is current and accurate
-
-        3. Detailed Information 📝
-        - Book title and author
-        - Type of similarity (genre & themes, author & writing style, plot & characters)
-        - Publication year
-        - Genre and subgenres
-        - Goodreads/StoryGraph rating
-        - Page count
-        - Brief, engaging plot summary
-        - Content advisories with emoji representing each one
-        - Trigger Warning (if applicable; should be different from Content Advisories)
-        - Awards and recognition
-        - All Streaming services
-
-        4. Extra Features ✨
-        - Include series information if applicable
-        - Mention audiobook availability
-        - Note any upcoming adaptations
-
-        Presentation Style:
-        - Add emoji indicators for all genres (eg: 📚 🔮 💕 🔪)
-        - Minimum 12 recommendations per query
-        - Include a brief explanation for each recommendation
-        - Highlight diversity in authors and perspectives
-        - Note trigger warnings when relevant"""),
-    markdown=False,
-    response_model=ListBooks,
-    add_datetime_to_instructions=True,
-    show_tool_calls=True,
-) 
-
-prompt_recommendation_agent = Agent(
-    name="Prompts",
-    model=MODEL_GEMINI,
-    description=dedent("""\
-        You are a specialist in writing prompts for explore similar books."""),
-    markdown=True,
-    response_model=Prompts,
-    add_datetime_to_instructions=True
+# Initialize local catalog (searched by the agents before Exa)
+catalog = Catalog(CATALOG_PATH)
+
+# Keep-alive connections shared by every agent run
+http_pool = HttpPool(
+    max_connections=HTTP_POOL_MAX_CONNECTIONS,
+    max_keepalive=HTTP_POOL_MAX_KEEPALIVE,
+    keepalive_expiry=HTTP_POOL_KEEPALIVE_EXPIRY,
+    timeout=HTTP_TIMEOUT,
+    connect_timeout=HTTP_CONNECT_TIMEOUT,
+    http2=HTTP2_ENABLED,
+)
+
+# Buscas repetidas no Exa (mesma consulta normalizada) são respondidas localmente
+tool_cache = ToolCache(
+    create_backend(
+        TOOL_CACHE_BACKEND,
+        max_entries=TOOL_CACHE_MAX_ENTRIES,
+        path=TOOL_CACHE_PATH,
+        redis_url=REDIS_URL,
+        namespace="tools",
+    ),
+    ttl=TOOL_CACHE_TTL,
+    max_result_chars=TOOL_CACHE_MAX_RESULT_CHARS,
+) if TOOL_CACHE_ENABLED else None
+
+# Initialize Agents (built by the startup hook, or on first use)
+book_recommendation_agent = LazyAgent(lambda: build_book_recommendation_agent(
+    catalog, http_pool, max_output_tokens=PROMPT_MAX_OUTPUT_TOKENS, tool_text_limit=PROMPT_TOOL_TEXT_LIMIT,
+    tool_cache=tool_cache,
+))
+prompt_recommendation_agent = LazyAgent(lambda: build_prompt_recommendation_agent(http_pool))
+video_recommendation_agent = LazyAgent(lambda: build_video_recommendation_agent(
+    catalog, http_pool, max_output_tokens=PROMPT_MAX_OUTPUT_TOKENS, tool_text_limit=PROMPT_TOOL_TEXT_LIMIT,
+    tool_cache=tool_cache,
+))
+fast_book_recommendation_agent = LazyAgent(lambda: build_fast_book_recommendation_agent(
+    http_pool, ROUTING_FAST_MODEL, max_output_tokens=PROMPT_MAX_OUTPUT_TOKENS
+))
+fast_video_recommendation_agent = LazyAgent(lambda: build_fast_video_recommendation_agent(
+    http_pool, ROUTING_FAST_MODEL, max_output_tokens=PROMPT_MAX_OUTPUT_TOKENS
+))
+AGENTS = (
+    book_recommendation_agent, prompt_recommendation_agent, video_recommendation_agent,
+    fast_book_recommendation_agent, fast_video_recommendation_agent,
+)
+
+def load_agents() -> None:
+    for lazy_agent in AGENTS:
+        lazy_agent.load()
+
+def warm_from_run_store() -> None:
+    global caches_warmed
+    try:
+        if run_store is not None:
+            removed = run_store.prune(RUN_STORE_RETENTION)
+            if RUN_STORE_WARM_ON_STARTUP:
+                warmed = warm_caches(
+                    run_store,
+                    response_cache,
+                    semantic_caches,
+                    response_ttl=RESPONSE_CACHE_TTL,
+                    semantic_ttl=SEMANTIC_CACHE_TTL,
+                    dedupe_threshold=DEDUPE_THRESHOLD,
+                )
+                print(f"Run store: {removed} old runs removed, caches warmed with {warmed}")
+    except Exception as e:
+        print(f"Error details: cache warming: {str(e)}")
+    finally:
+        caches_warmed = True
+
+def load_heavy_dependencies() -> None:
+    # Caches primeiro: respostas em cache não dependem dos agentes
+    warm_from_run_store()
+    try:
+        # Traceloop é opcional; as métricas de /metrics não dependem dele
+        if API_KEY_TRACELOOP:
+            init_tracing(API_KEY_TRACELOOP)
+        load_agents()
+    except Exception as e:
+        # Os agentes serão construídos novamente na primeira requisição
+        print(f"Error details: startup: {str(e)}")
+
+async def ensure_agents() -> None:
+    # Nunca constrói os agentes no event loop
+    if not all(lazy_agent.loaded for lazy_agent in AGENTS):
+        await asyncio.to_thread(load_agents)
+
+admission = AdmissionController(
+    create_counter_store(ADMISSION_STORE, path=ADMISSION_STORE_PATH, redis_url=REDIS_URL),
+    initial_limit=AGENT_MAX_CONCURRENCY,
+    min_limit=ADMISSION_MIN_CONCURRENCY,
+    max_limit=ADMISSION_MAX_CONCURRENCY,
+    max_queue=AGENT_MAX_QUEUE,
+    queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+    latency_target=ADMISSION_LATENCY_TARGET,
+)
+# 429/503 de Gemini ou Exa reduzem o limite de concorrência
+http_pool.add_listener(admission.observe_upstream)
+
+run_store = RunStore(RUN_STORE_PATH) if RUN_STORE_ENABLED else None
+caches_warmed = False
+
+# Prefixo de sistema estável; data e contexto da requisição vão na mensagem do usuário
+prompt_assembler = PromptAssembler(max_input_tokens=PROMPT_MAX_INPUT_TOKENS)
+
+agent_runner = AgentRunner(
+    admission,
+    expected_items=REPAIR_EXPECTED_ITEMS,
+    max_reprompts=REPAIR_MAX_REPROMPTS,
+    run_store=run_store,
+    prompts=prompt_assembler,
+)
+
+router = ModelRouter(
+    catalog,
+    enabled=ROUTING_ENABLED,
+    min_catalog_hits=ROUTING_MIN_CATALOG_HITS,
+    context_items=ROUTING_CONTEXT_ITEMS,
+    min_items=ROUTING_MIN_ITEMS,
+)
+
+response_cache = ResponseCache(
+    create_backend(
+        RESPONSE_CACHE_BACKEND,
+        max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+        path=RESPONSE_CACHE_PATH,
+        redis_url=REDIS_URL,
+        namespace="responses",
+    ),
+    ttl=RESPONSE_CACHE_TTL,
 )
 
-video_recommendation_agent = Agent(
-    name="Cinephile",
-    tools=[ExaTools(api_key=API_KEY_EXA,num_results=12,show_results=True)],
-    model=MODEL_GEMINI,
-    description=dedent("""\
-        You are Cinephile, a movie and TV show expert! 🎬📺
-        Your mission is to help users discover their next favorite movies and TV shows.
-        You combine deep knowledge with current ratings and reviews to suggest movies and tv show that will truly resonate with each watcher.
-        You have access to a search tool that can find movies and TV shows based on keywords.
-                       
-        Do not invent data. If not found, that's okay. Return empty.
-        """),
-    instructions=dedent("""\
-        Approach each recommendation with these steps:
-
-        1. Analysis Phase 📖
-        - Understand reader preferences from their input
-        - Consider mentioned favorite movie/tv shows' genre & themes, author & writing style, plot & characters
-        - Factor in any specific requirements (genre, length, content warnings)
-
-        2. Search & Curate 🔍
-        - Use Exa to search for relevant movies and tv shows
-        - Ensure diversity in recommendations (movies and tv shows), ensuring similarities by these 3 groups genre & themes, author & writing style, plot & characters
-        - Verify all movie and tv show data is current and accurate
-
-        3. Detailed Information 📝
-        - Movie or Tv Show title, director, actors
-        - Type of similarity (genre & themes, author & writing style, plot & characters)
-        - Release year
-        - Genre and subgenres
-        - IMDB rating, The Movie DBrating
-        - Runtime in minutes
-        - Similar videos
-        - Streaming services
-        - Brief, engaging plot summary
-        - Content advisories with emoji representing each one
-        - Trigger Warning (if applicable; should be different from Content Advisories)
-        - Qty of seasons (if applicable)
-        - Awards and recognition
-
-        4. Extra Features ✨
-        - Include books information if applicable
-
-        Presentation Style:
-        - Add emoji indicators for all genres (eg: 📚 🔮 💕 🔪)
-        - Minimum 12 recommendations per query
-        - Include a brief explanation for each recommendation
-        - Highlight diversity in authors and perspectives
-        - Note trigger warnings when relevant"""),
-    response_model=ListVideos,
-    markdown=True,
-    show_tool_calls=True,
-    add_datetime_to_instructions=True
+result_sets = ResponseCache(
+    create_backend(
+        RESULT_SET_BACKEND,
+        max_entries=RESULT_SET_MAX_ENTRIES,
+        path=RESULT_SET_PATH,
+        redis_url=REDIS_URL,
+        namespace="result-sets",
+    ),
+    ttl=RESULT_SET_TTL,
+)
+
+single_flight = SingleFlight()
+
+# Execuções lentas ganham uma segunda execução idêntica; a primeira a terminar vence
+hedger = Hedger(
+    enabled=HEDGE_ENABLED,
+    quantile=HEDGE_QUANTILE,
+    min_samples=HEDGE_MIN_SAMPLES,
+    min_delay=HEDGE_MIN_DELAY,
+    max_ratio=HEDGE_MAX_RATIO,
+    can_hedge=lambda: not admission.should_shed(),
 )
 
+embedder = (
+    SentenceTransformerEmbedder(SEMANTIC_CACHE_MODEL) if SEMANTIC_CACHE_MODEL
+    else HashedNgramEmbedder(dim=SEMANTIC_CACHE_DIM)
+)
+semantic_store = SQLiteSemanticStore(SEMANTIC_CACHE_STORE_PATH) if SHARED_STATE != 'memory' else None
+semantic_caches = {
+    list_model: SemanticCache(
+        embedder,
+        threshold=SEMANTIC_CACHE_THRESHOLD,
+        max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+        ttl=SEMANTIC_CACHE_TTL,
+        store=semantic_store,
+        namespace=list_model.__name__,
+    )
+    for list_model in (ListBooks, ListVideos)
+}
+
+def add_to_catalog(content) -> None:
+    if isinstance(content, ListBooks):
+        catalog.add("book", content.books)
+    elif isinstance(content, ListVideos):
+        catalog.add("video", content.videos)
+
+async def execute_agent(
+    recommendation_agent: Agent,
+    prompt: str,
+    expected_items: Optional[int] = None,
+    record_key: Optional[str] = None,
+):
+    response = await agent_runner.run(recommendation_agent, prompt, expected_items=expected_items, key=record_key)
+    # Só execuções que pesquisaram (com ferramentas) alimentam o catálogo
+    if recommendation_agent.tools:
+        add_to_catalog(response.content)
+    return response
+
+async def run_agent(
+    recommendation_agent: Agent,
+    prompt: str,
+    flight_key: Optional[str] = None,
+    expected_items: Optional[int] = None,
+    record_key: Optional[str] = None,
+):
+    await ensure_agents()
+    # Requisições idênticas simultâneas compartilham a mesma execução do agente
+    key = (recommendation_agent.name, flight_key or normalize_prompt(prompt))
+    return await single_flight.do(key, lambda: hedger.run(
+        recommendation_agent.name,
+        lambda: execute_agent(recommendation_agent, prompt, expected_items, record_key or flight_key),
+        expected_items,
+    ))
+
+def queue_full_exception(e: QueueFullError) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+def json_response(request: Request, content) -> FastJSONResponse:
+    return FastJSONResponse(
+        content,
+        accept_encoding=request.headers.get("accept-encoding", ""),
+        decimal_policy=RESPONSE_DECIMAL_POLICY,
+        min_size=RESPONSE_COMPRESSION_MIN_SIZE if RESPONSE_COMPRESSION else None,
+    )
+
+async def list_response(
+    request: Request,
+    content,
+    list_model: type[BaseModel],
+    fields: Optional[tuple[str, ...]] = None,
+    limit: Optional[int] = None,
+    partial: Optional[str] = None,
+) -> FastJSONResponse:
+    # O conteúdo já foi validado ao sair do agente (ou do cache): serializa sem validar de novo
+    if not isinstance(content, list_model):
+        raise ValueError("Invalid response from recommendation agent")
+    if fields is None and limit is None:
+        response = json_response(request, content)
+    else:
+        # Projeção/paginação: a lista completa fica guardada para as próximas páginas e o detalhe
+        rid = result_id(content)
+        await result_sets.aset(result_key(list_model, rid), content)
+        response = json_response(request, page(content, rid, limit=limit, fields=fields))
+    if partial is not None:
+        # O prazo do endpoint acabou: resposta parcial ("deadline") ou do cache ("cached")
+        response.headers["X-Partial-Result"] = partial
+    return response
+
+def projection(item_model: type[BaseModel], fields: Optional[str]) -> Optional[tuple[str, ...]]:
+    try:
+        return parse_fields(item_model, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+async def result_set(list_model: type[BaseModel], rid: str):
+    content = await result_sets.aget(result_key(list_model, rid), list_model)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Result set not found or expired")
+    return content
+
+async def result_page(
+    request: Request,
+    list_model: type[BaseModel],
+    item_model: type[BaseModel],
+    cursor: str,
+    fields: Optional[str],
+    limit: Optional[int],
+) -> FastJSONResponse:
+    try:
+        rid, offset, cursor_limit, cursor_fields = decode_cursor(cursor, item_model, PAGE_MAX_LIMIT)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Parâmetros explícitos substituem os que vieram no cursor
+    content = await result_set(list_model, rid)
+    fields = projection(item_model, fields) if fields is not None else cursor_fields
+    limit = limit if limit is not None else cursor_limit
+    return json_response(request, page(content, rid, offset, limit, fields))
+
+async def result_item(list_model: type[BaseModel], rid: str, index: int):
+    item = item_at(await result_set(list_model, rid), index)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return item
+
+def similar_books_prompt(book_title: str) -> str:
+    return f"I really enjoyed {book_title}, can you suggest similar books?"
+
+def similar_videos_prompt(video_request: VideoRequest) -> str:
+    return f"Search for {video_request.media_type} similar to {video_request.title}"
+
+LIST_FIELDS = {ListBooks: "books", ListVideos: "videos"}
+
+async def recommend(
+    recommendation_agent: Agent,
+    list_model: type[BaseModel],
+    prompt: str,
+    flight_key: Optional[str] = None,
+    fanout: bool = False,
+    exclude_titles: tuple[str, ...] = (),
+):
+    """Returns the content and whether it is complete (every fan-out group answered)."""
+    complete = True
+    if not fanout:
+        response = await run_agent(recommendation_agent, prompt, flight_key=flight_key)
+        content = response.content
+    else:
+        # Uma execução por grupo de similaridade, em paralelo
+        fanout_id = uuid.uuid4().hex[:12]
+
+        async def run_group(group_prompt: str, group: str):
+            group_key = f"{flight_key}|{group}" if flight_key else None
+            # Os grupos são gravados com o id desta requisição: o replay só junta grupos da mesma;
+            # prompts livres em fan-out ficam marcados para o replay não cachear só um grupo
+            response = await run_agent(
+                recommendation_agent,
+                group_prompt,
+                flight_key=group_key,
+                expected_items=FANOUT_ITEMS_PER_GROUP,
+                record_key=f"{group_key}|{fanout_id}" if group_key else f"fanout|{group}",
+            )
+            # Grupos prontos formam a resposta parcial se o prazo acabar
+            offer(response.content)
+            return response.content
+
+        content, complete = await fan_out(
+            run_group, prompt, list_model, LIST_FIELDS[list_model], per_group=FANOUT_ITEMS_PER_GROUP
+        )
+
+    # Remove duplicados (e o próprio título pesquisado) antes de cachear/retornar
+    if isinstance(content, list_model):
+        content = dedupe_list(content, LIST_FIELDS[list_model], DEDUPE_THRESHOLD, exclude_titles)
+    return content, complete
+
+def count_items(content, list_model: type[BaseModel]) -> Optional[int]:
+    return len(getattr(content, LIST_FIELDS[list_model])) if isinstance(content, list_model) else None
+
+async def routed_recommend(
+    kind: str,
+    route: Route,
+    recommendation_agent: Agent,
+    fast_agent: Optional[Agent],
+    list_model: type[BaseModel],
+    prompt: str,
+    flight_key: Optional[str] = None,
+    fanout: bool = False,
+    exclude_titles: tuple[str, ...] = (),
+):
+    if route.tier == FAST:
+        started_at = time.perf_counter()
+        try:
+            content, complete = await recommend(
+                fast_agent, list_model, route.prompt, flight_key=flight_key, exclude_titles=exclude_titles
+            )
+        except QueueFullError:
+            router.observe(kind, route, time.perf_counter() - started_at, "shed")
+            raise
+        except Exception as e:
+            print(f"Error details: fast tier: {str(e)}")
+            content = None
+        items = count_items(content, list_model)
+        if not router.should_escalate(route, items):
+            router.observe(kind, route, time.perf_counter() - started_at, "ok")
+            return content, complete
+        # Resposta rápida insuficiente: refaz com Exa (e fica como resposta parcial)
+        offer(content)
+        router.observe(kind, route, time.perf_counter() - started_at, "escalated")
+        route = router.escalate(kind, prompt)
+
+    started_at = time.perf_counter()
+    try:
+        content, complete = await recommend(
+            recommendation_agent, list_model, route.prompt, flight_key=flight_key, fanout=fanout, exclude_titles=exclude_titles
+        )
+    except QueueFullError:
+        router.observe(kind, route, time.perf_counter() - started_at, "shed")
+        raise
+    except Exception:
+        router.observe(kind, route, time.perf_counter() - started_at, "error")
+        raise
+    router.observe(kind, route, time.perf_counter() - started_at, "ok")
+    return content, complete
+
+def cacheable(content, list_model: type[BaseModel], complete: bool) -> bool:
+    # Respostas cortadas pelo prazo ou sem algum grupo do fan-out não entram no cache
+    return isinstance(content, list_model) and bool(getattr(content, LIST_FIELDS[list_model])) and complete and not deadline_expired()
+
+async def similar_recommendations(
+    recommendation_agent: Agent,
+    fast_agent: Agent,
+    list_model: type[BaseModel],
+    kind: str,
+    title: str,
+    cache_key: str,
+    prompt: str,
+    fanout: bool = False,
+    exclude_titles: tuple[str, ...] = (),
+    refresh: bool = False,
+):
+    # refresh: ignora a entrada atual e a substitui (usado pelo precompute.py)
+    cached = await response_cache.aget(cache_key, list_model) if not refresh else None
+    if cached is not None:
+        return cached
+
+    route = router.route_similar(kind, title, prompt, fanout=fanout)
+    content, complete = await routed_recommend(
+        kind, route, recommendation_agent, fast_agent, list_model, prompt,
+        flight_key=cache_key, fanout=fanout, exclude_titles=exclude_titles,
+    )
+    # Garantir que estamos retornando o objeto ListBooks/ListVideos corretamente
+    if cacheable(content, list_model, complete):
+        await response_cache.aset(cache_key, content)
+    return content
+
+async def custom_recommendations(
+    recommendation_agent: Agent,
+    list_model: type[BaseModel],
+    prompt: str,
+    fanout: bool = False,
+):
+    cached = await semantic_caches[list_model].aget(prompt, list_model)
+    if cached is not None:
+        return cached
+
+    kind = "book" if list_model is ListBooks else "video"
+    route = router.route_custom(kind, prompt)
+    content, complete = await routed_recommend(kind, route, recommendation_agent, None, list_model, prompt, fanout=fanout)
+    if cacheable(content, list_model, complete):
+        await semantic_caches[list_model].aset(prompt, content)
+    return content
+
+async def within_deadline(
+    request: Request,
+    seconds: float,
+    list_model: type[BaseModel],
+    work: Callable[[], Awaitable],
+    cached: Callable[[], Awaitable[Optional[BaseModel]]],
+    exclude_titles: tuple[str, ...] = (),
+):
+    """Runs `work` under the endpoint deadline. When it passes, returns a
+    cached answer (another request may have filled the cache meanwhile) or
+    the partial answer of the runs, flagged "cached" or "deadline"."""
+    with deadline_scope(seconds) as deadline:
+        try:
+            return await wait_for_deadline(work()), None
+        except TimeoutError:
+            if deadline is None or not deadline.expired:
+                raise
+
+    endpoint = request.url.path
+    content = await cached()
+    if content is not None:
+        DEADLINE_EXCEEDED.inc(endpoint=endpoint, outcome="cached")
+        return content, "cached"
+    content = deadline.partial(list_model)
+    if content is not None:
+        content = dedupe_list(content, LIST_FIELDS[list_model], DEDUPE_THRESHOLD, exclude_titles)
+        DEADLINE_EXCEEDED.inc(endpoint=endpoint, outcome="partial")
+        return content, "deadline"
+    DEADLINE_EXCEEDED.inc(endpoint=endpoint, outcome="none")
+    raise DeadlineExceeded(f"No recommendations within the {seconds:g}s deadline")
+
+def deadline_exception(e: DeadlineExceeded) -> HTTPException:
+    return HTTPException(status_code=504, detail=str(e))
+
+async def similar_books(book_title: str, fanout: bool = False, refresh: bool = False):
+    return await similar_recommendations(
+        book_recommendation_agent,
+        fast_book_recommendation_agent,
+        ListBooks,
+        "book",
+        book_title,
+        similar_cache_key("book", book_title),
+        similar_books_prompt(book_title),
+        fanout=fanout,
+        exclude_titles=(book_title,),
+        refresh=refresh,
+    )
+
+async def similar_videos(video_request: VideoRequest, fanout: bool = False, refresh: bool = False):
+    return await similar_recommendations(
+        video_recommendation_agent,
+        fast_video_recommendation_agent,
+        ListVideos,
+        "video",
+        video_request.title,
+        similar_cache_key(video_request.media_type, video_request.title),
+        similar_videos_prompt(video_request),
+        fanout=fanout,
+        exclude_titles=(video_request.title,),
+        refresh=refresh,
+    )
+
+async def iter_items(items: list[BaseModel]) -> AsyncIterator[BaseModel]:
+    for item in items:
+        yield item
+
+async def stream_recommendations(
+    recommendation_agent: Agent,
+    prompt: str,
+    item_model: type[BaseModel],
+    list_model: type[BaseModel],
+    cache_key: Optional[str] = None,
+    exclude_titles: tuple[str, ...] = (),
+) -> AsyncIterator[BaseModel]:
+    """Returns the items to stream: cached ones right away, otherwise those of
+    an agent run. Runs are shed (503) only on a cache miss."""
+    # Títulos usam o cache exato; prompts livres usam o cache semântico
+    field = LIST_FIELDS[list_model]
+    if cache_key is not None:
+        cached = await response_cache.aget(cache_key, list_model)
+    else:
+        cached = await semantic_caches[list_model].aget(prompt, list_model)
+    if cached is not None:
+        return iter_items(getattr(cached, field))
+    if agent_runner.queue_full:
+        raise queue_full_exception(QueueFullError("Agent runs over capacity", retry_after=admission.retry_after()))
+
+    async def run_items() -> AsyncIterator[BaseModel]:
+        await ensure_agents()
+        # Itens já enviados não podem ser alterados: duplicados só são descartados
+        deduplicator = Deduplicator(DEDUPE_THRESHOLD, exclude_titles)
+        async for item in stream_items(agent_runner.stream(recommendation_agent, prompt, key=cache_key), item_model):
+            if deduplicator.add(item):
+                yield item
+
+        if deduplicator.items:
+            # Cached with the fields merged from the discarded duplicates
+            result = list_model(**{field: deduplicator.items})
+            add_to_catalog(result)
+            if cache_key is not None:
+                await response_cache.aset(cache_key, result)
+            else:
+                await semantic_caches[list_model].aset(prompt, result)
+
+    return run_items()
+
+def streaming_response(request: Request, item_name: str, items: AsyncIterator[BaseModel]) -> StreamingResponse:
+    # NDJSON por padrão; SSE quando o cliente pede text/event-stream
+    use_sse = "text/event-stream" in request.headers.get("accept", "")
+
+    def encode(event: str, payload) -> str:
+        return sse_event(event, payload) if use_sse else ndjson_line({event: payload})
+
+    async def body():
+        count = 0
+        try:
+            async for item in iter_within_deadline(items, DEADLINE_STREAM):
+                count += 1
+                yield encode(item_name, item.model_dump(mode="json"))
+        except TimeoutError:
+            # Prazo esgotado: os itens já enviados são a resposta parcial
+            DEADLINE_EXCEEDED.inc(endpoint=request.url.path, outcome="partial" if count else "none")
+            yield encode("done", {"count": count, "partial": True})
+            return
+        except Exception as e:
+            print(f"Error details: {str(e)}")
+            yield encode("error", str(e))
+            return
+        yield encode("done", {"count": count})
+
+    return StreamingResponse(body(), media_type="text/event-stream" if use_sse else "application/x-ndjson")
+
+async def batch_lines(groups: dict, worker, list_model: type[BaseModel], describe) -> AsyncIterator[dict]:
+    # Um resultado por título distinto, na ordem em que ficam prontos
+    field = LIST_FIELDS[list_model]
+    async for key, values, content, error in iter_batch(groups, worker, BATCH_MAX_CONCURRENCY):
+        line = {"requests": [describe(value) for value in values]}
+        if error is not None:
+            line["error"] = str(error)
+        elif not isinstance(content, list_model):
+            line["error"] = "Invalid response from recommendation agent"
+        else:
+            line[field] = [item.model_dump(mode="json") for item in getattr(content, field)]
+        yield line
+
+def batch_response(lines: AsyncIterator[dict]) -> StreamingResponse:
+    async def body():
+        async for line in lines:
+            yield ndjson_line(line)
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+def check_batch_size(size: int):
+    if size > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {size} items (max {BATCH_MAX_ITEMS})")
+
+def batch_books(batch_request: BatchBookRequest) -> AsyncIterator[dict]:
+    groups = group_by_key(batch_request.book_titles, lambda title: similar_cache_key("book", title))
+    return batch_lines(groups, similar_books, ListBooks, lambda title: title)
+
+def batch_videos(batch_request: BatchVideoRequest) -> AsyncIterator[dict]:
+    groups = group_by_key(batch_request.videos, lambda video: similar_cache_key(video.media_type, video.title))
+    return batch_lines(groups, similar_videos, ListVideos, lambda video: video.model_dump())
+
+async def collect(lines: AsyncIterator[dict]) -> list[dict]:
+    return [line async for line in lines]
+
+job_queue = JobQueue(
+    JobStore(JOB_STORE_PATH),
+    workers=JOB_WORKERS,
+    max_attempts=JOB_MAX_ATTEMPTS,
+    ttl=JOB_TTL,
+    callback_hosts=JOB_CALLBACK_HOSTS,
+)
+
+# Cada tipo de job reaproveita o modelo de request e o fluxo do endpoint equivalente
+JOB_KINDS = {
+    "books/similar": (BookRequest, lambda r: similar_books(r.book_title)),
+    "books/custom": (CustomPromptRequest, lambda r: custom_recommendations(book_recommendation_agent, ListBooks, r.prompt)),
+    "books/batch": (BatchBookRequest, lambda r: collect(batch_books(r))),
+    "videos/similar": (VideoRequest, similar_videos),
+    "videos/custom": (CustomPromptRequest, lambda r: custom_recommendations(video_recommendation_agent, ListVideos, r.prompt)),
+    "videos/batch": (BatchVideoRequest, lambda r: collect(batch_videos(r))),
+}
+
+def job_handler(request_model: type[BaseModel], run):
+    async def handle(payload: dict):
+        result = await run(request_model.model_validate(payload))
+        if isinstance(result, BaseModel):
+            return result.model_dump(mode="json")
+        if isinstance(result, list):
+            return result
+        raise ValueError("Invalid response from recommendation agent")
+    return handle
+
+for kind, (request_model, run) in JOB_KINDS.items():
+    job_queue.register(kind, job_handler(request_model, run))
+
 # Book API Endpoints
-@app.post("/books/recommendations/similar", response_model=ListBooks)
+@app.post("/books/recommendations/similar", response_model=Union[ListBooks, BooksPage])
 @limiter.limit("20/minute")
 @agent(name="get_similar_books")
 async def get_similar_books(
     request: Request,
     book_request: BookRequest,
+    fanout: bool = FANOUT_DEFAULT,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX_LIMIT),
     api_key: APIKey = Depends(get_api_key)
 ):
+    projected = projection(Book, fields)
+    title = book_request.book_title
     try:
-        prompt = f"I really enjoyed {book_request.book_title}, can you suggest similar books?"
-        response = book_recommendation_agent.run(prompt, stream=False)
-        # Garantir que estamos retornando o objeto ListBooks corretamente
-        return response.content
+        content, partial = await within_deadline(
+            request,
+            DEADLINE_SIMILAR,
+            ListBooks,
+            lambda: similar_books(title, fanout=fanout),
+            lambda: response_cache.aget(similar_cache_key("book", title), ListBooks),
+            exclude_titles=(title,),
+        )
+        return await list_response(request, content, ListBooks, projected, limit, partial)
+    except QueueFullError as e:
+        raise queue_full_exception(e)
+    except DeadlineExceeded as e:
+        raise deadline_exception(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/books/recommendations/custom", response_model=ListBooks)
+@app.post("/books/recommendations/custom", response_model=Union[ListBooks, BooksPage])
 @limiter.limit("20/minute")
 @agent(name="get_custom_books_recommendations")
 async def get_custom_recommendations(
     request: Request,
     custom_request: CustomPromptRequest,
+    fanout: bool = FANOUT_DEFAULT,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX_LIMIT),
     api_key: APIKey = Depends(get_api_key)
 ):
+    projected = projection(Book, fields)
+    prompt = custom_request.prompt
     try:
-        response = book_recommendation_agent.run(custom_request.prompt, stream=False)
-        print("Full response content:")
-        print(response.content)
-        print("\nResponse content type:", type(response.content))
-        print("\nBooks data:")
-        for book in response.content.books:
-            print(f"\nBook: {book.title}")
-            print(f"Fields: {book.model_dump()}")
-        return response.content
+        content, partial = await within_deadline(
+            request,
+            DEADLINE_CUSTOM,
+            ListBooks,
+            lambda: custom_recommendations(book_recommendation_agent, ListBooks, prompt, fanout=fanout),
+            lambda: semantic_caches[ListBooks].aget(prompt, ListBooks),
+        )
+        return await list_response(request, content, ListBooks, projected, limit, partial)
+    except QueueFullError as e:
+        raise queue_full_exception(e)
+    except DeadlineExceeded as e:
+        raise deadline_exception(e)
     except Exception as e:
         print(f"Error details: {str(e)}")
-        print(f"Response content: {response.content if 'response' in locals() else 'No response'}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/books/recommendations/similar/stream")
+@limiter.limit("20/minute")
+@agent(name="stream_similar_books")
+async def stream_similar_books(
+    request: Request,
+    book_request: BookRequest,
+    api_key: APIKey = Depends(get_api_key)
+):
+    items = await stream_recommendations(
+        book_recommendation_agent,
+        similar_books_prompt(book_request.book_title),
+        Book,
+        ListBooks,
+        cache_key=similar_cache_key("book", book_request.book_title),
+        exclude_titles=(book_request.book_title,),
+    )
+    return streaming_response(request, "book", items)
+
+@app.post("/books/recommendations/custom/stream")
+@limiter.limit("20/minute")
+@agent(name="stream_custom_books_recommendations")
+async def stream_custom_recommendations(
+    request: Request,
+    custom_request: CustomPromptRequest,
+    api_key: APIKey = Depends(get_api_key)
+):
+    items = await stream_recommendations(book_recommendation_agent, custom_request.prompt, Book, ListBooks)
+    return streaming_response(request, "book", items)
+
+@app.post("/books/recommendations/batch")
+@limiter.limit("5/minute")
+@agent(name="get_batch_books")
+async def get_batch_books(
+    request: Request,
+    batch_request: BatchBookRequest,
+    api_key: APIKey = Depends(get_api_key)
+):
+    check_batch_size(len(batch_request.book_titles))
+    return batch_response(batch_books(batch_request))
+
+@app.get("/books/recommendations/results", response_model=BooksPage)
+async def get_books_page(
+    request: Request,
+    cursor: str,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX_LIMIT),
+    api_key: APIKey = Depends(get_api_key)
+):
+    return await result_page(request, ListBooks, Book, cursor, fields, limit)
+
+@app.get("/books/recommendations/results/{result_id}/{index}", response_model=Book)
+async def get_book_detail(result_id: str, index: int, api_key: APIKey = Depends(get_api_key)):
+    return await result_item(ListBooks, result_id, index)
+
 # @app.post("/books/prompts/{book_title}", response_model=Prompts)
 # @limiter.limit("20/minute")
 # async def get_book_prompts(
@@ -301,65 +1006,237 @@ async def get_custom_recommendations(
 #         raise HTTPException(status_code=500, detail=str(e))
 
 # Video API Endpoints
-@app.post("/videos/recommendations/similar", response_model=ListVideos)
+@app.post("/videos/recommendations/similar", response_model=Union[ListVideos, VideosPage])
 @limiter.limit("20/minute")
 @agent(name="get_similar_videos")
 async def get_video_recommendations(
     request: Request,
     video_request: VideoRequest,
+    fanout: bool = FANOUT_DEFAULT,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX_LIMIT),
     api_key: APIKey = Depends(get_api_key)
 ):
+    projected = projection(Video, fields)
     try:
-        prompt = f"Search for {video_request.media_type} similar to {video_request.title}"
-        response = video_recommendation_agent.run(prompt, stream=False)
-        # Garantir que estamos retornando o objeto ListVideos corretamente
-        return response.content
+        content, partial = await within_deadline(
+            request,
+            DEADLINE_SIMILAR,
+            ListVideos,
+            lambda: similar_videos(video_request, fanout=fanout),
+            lambda: response_cache.aget(similar_cache_key(video_request.media_type, video_request.title), ListVideos),
+            exclude_titles=(video_request.title,),
+        )
+        return await list_response(request, content, ListVideos, projected, limit, partial)
+    except QueueFullError as e:
+        raise queue_full_exception(e)
+    except DeadlineExceeded as e:
+        raise deadline_exception(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/videos/recommendations/custom", response_model=ListVideos)
+@app.post("/videos/recommendations/custom", response_model=Union[ListVideos, VideosPage])
 @limiter.limit("20/minute")
 @agent(name="get_custom_video_recommendations")
 async def get_custom_videos_recommendations(
     request: Request,
     custom_request: CustomPromptRequest,
+    fanout: bool = FANOUT_DEFAULT,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX_LIMIT),
     api_key: APIKey = Depends(get_api_key)
 ):
+    projected = projection(Video, fields)
+    prompt = custom_request.prompt
     try:
-        response = video_recommendation_agent.run(custom_request.prompt, stream=False)
+        content, partial = await within_deadline(
+            request,
+            DEADLINE_CUSTOM,
+            ListVideos,
+            lambda: custom_recommendations(video_recommendation_agent, ListVideos, prompt, fanout=fanout),
+            lambda: semantic_caches[ListVideos].aget(prompt, ListVideos),
+        )
         
         # Validação da resposta
-        if not response or not response.content:
+        if not content:
             raise HTTPException(
                 status_code=500,
                 detail="Empty response from recommendation agent"
             )
             
         # Garantir que a resposta tem a estrutura esperada
-        if not hasattr(response.content, 'videos') or not response.content.videos:
+        if not hasattr(content, 'videos') or not content.videos:
             # Criar uma resposta vazia válida se não houver recomendações
-            return ListVideos(videos=[])
-            
-        # Log para debug
-        print("Response content type:", type(response.content))
-        print("Response content:", response.content)
-        
-        return response.content
+            return await list_response(request, ListVideos(videos=[]), ListVideos, projected, limit)
+
+        return await list_response(request, content, ListVideos, projected, limit, partial)
         
+    except QueueFullError as e:
+        raise queue_full_exception(e)
+    except DeadlineExceeded as e:
+        raise deadline_exception(e)
     except Exception as e:
         print(f"Error details: {str(e)}")
-        print(f"Response content: {response.content if 'response' in locals() else 'No response'}")
+        print(f"Response content: {content if 'content' in locals() else 'No response'}")
         raise HTTPException(
             status_code=500,
             detail=f"Failed to process video recommendations: {str(e)}"
         )
 
-# Health Check Endpoint
+@app.post("/videos/recommendations/similar/stream")
+@limiter.limit("20/minute")
+@agent(name="stream_similar_videos")
+async def stream_video_recommendations(
+    request: Request,
+    video_request: VideoRequest,
+    api_key: APIKey = Depends(get_api_key)
+):
+    items = await stream_recommendations(
+        video_recommendation_agent,
+        similar_videos_prompt(video_request),
+        Video,
+        ListVideos,
+        cache_key=similar_cache_key(video_request.media_type, video_request.title),
+        exclude_titles=(video_request.title,),
+    )
+    return streaming_response(request, "video", items)
+
+@app.post("/videos/recommendations/custom/stream")
+@limiter.limit("20/minute")
+@agent(name="stream_custom_video_recommendations")
+async def stream_custom_videos_recommendations(
+    request: Request,
+    custom_request: CustomPromptRequest,
+    api_key: APIKey = Depends(get_api_key)
+):
+    items = await stream_recommendations(video_recommendation_agent, custom_request.prompt, Video, ListVideos)
+    return streaming_response(request, "video", items)
+
+@app.post("/videos/recommendations/batch")
+@limiter.limit("5/minute")
+@agent(name="get_batch_videos")
+async def get_batch_videos(
+    request: Request,
+    batch_request: BatchVideoRequest,
+    api_key: APIKey = Depends(get_api_key)
+):
+    check_batch_size(len(batch_request.videos))
+    return batch_response(batch_videos(batch_request))
+
+@app.get("/videos/recommendations/results", response_model=VideosPage)
+async def get_videos_page(
+    request: Request,
+    cursor: str,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX_LIMIT),
+    api_key: APIKey = Depends(get_api_key)
+):
+    return await result_page(request, ListVideos, Video, cursor, fields, limit)
+
+@app.get("/videos/recommendations/results/{result_id}/{index}", response_model=Video)
+async def get_video_detail(result_id: str, index: int, api_key: APIKey = Depends(get_api_key)):
+    return await result_item(ListVideos, result_id, index)
+
+# Job API Endpoints
+@app.post("/jobs", status_code=202)
+@limiter.limit("20/minute")
+async def submit_job(
+    request: Request,
+    job_request: JobRequest,
+    api_key: APIKey = Depends(get_api_key)
+):
+    if job_request.kind not in JOB_KINDS:
+        raise HTTPException(status_code=422, detail=f"Unknown job kind: {job_request.kind}")
+    request_model = JOB_KINDS[job_request.kind][0]
+    try:
+        parsed_request = request_model.model_validate(job_request.request)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+    if isinstance(parsed_request, BatchBookRequest):
+        check_batch_size(len(parsed_request.book_titles))
+    elif isinstance(parsed_request, BatchVideoRequest):
+        check_batch_size(len(parsed_request.videos))
+    if job_request.callback_url is not None:
+        try:
+            await job_queue.check_callback(job_request.callback_url)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+    job_id = job_queue.submit(job_request.kind, job_request.request, job_request.callback_url)
+    return {"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, api_key: APIKey = Depends(get_api_key)):
+    job = JobQueue.describe(job_queue.store.get(job_id))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+# Health Check Endpoints
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/health/live")
+async def liveness_check():
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness_check():
+    checks = {
+        "agents": all(lazy_agent.loaded for lazy_agent in AGENTS),
+        "jobs": job_queue.running_workers,
+        "caches": caches_warmed,
+    }
+    status_code = 200 if all(checks.values()) else 503
+    return JSONResponse({"status": "ready" if status_code == 200 else "starting", "checks": checks}, status_code=status_code)
+
+REGISTRY.register_collector("agent_runner", agent_runner.stats)
+REGISTRY.register_collector("admission", admission.stats)
+REGISTRY.register_collector("response_cache", response_cache.stats)
+REGISTRY.register_collector("result_sets", result_sets.stats)
+if tool_cache is not None:
+    REGISTRY.register_collector("tool_cache", tool_cache.stats)
+REGISTRY.register_collector("single_flight", single_flight.stats)
+REGISTRY.register_collector("hedging", hedger.stats)
+REGISTRY.register_collector("jobs", job_queue.stats)
+REGISTRY.register_collector("catalog", catalog.stats)
+REGISTRY.register_collector("http_pool", http_pool.stats)
+REGISTRY.register_collector("routing", router.stats)
+REGISTRY.register_collector("prompts", prompt_assembler.stats)
+if run_store is not None:
+    REGISTRY.register_collector("run_store", run_store.stats)
+for list_model, cache in semantic_caches.items():
+    REGISTRY.register_collector(f"semantic_cache_{LIST_FIELDS[list_model]}", cache.stats)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats")
+async def get_stats(api_key: APIKey = Depends(get_api_key)):
+    return {
+        "agent_runner": agent_runner.stats(),
+        "admission": admission.stats(),
+        "response_cache": response_cache.stats(),
+        "result_sets": result_sets.stats(),
+        "tool_cache": tool_cache.stats() if tool_cache is not None else None,
+        "single_flight": single_flight.stats(),
+        "hedging": hedger.stats(),
+        "jobs": job_queue.stats(),
+        "catalog": catalog.stats(),
+        "http_pool": http_pool.stats(),
+        "routing": router.stats(),
+        "prompts": prompt_assembler.stats(),
+        "run_store": run_store.stats() if run_store is not None else None,
+        "semantic_cache": {list_model.__name__: cache.stats() for list_model, cache in semantic_caches.items()},
+    }
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv('PORT', 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    if WEB_CONCURRENCY > 1:
+        # Workers precisam importar o app pelo caminho
+        uvicorn.run("recommendation_api:app", host="0.0.0.0", port=port, workers=WEB_CONCURRENCY)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port)
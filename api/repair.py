@@ -0,0 +1,194 @@
+import json
+import re
+import typing
+from decimal import Decimal, InvalidOperation
+from typing import Any, NamedTuple, Optional
+
+from pydantic import BaseModel, ValidationError
+
+NUMBER_RE = re.compile(r"-?\d+(?:[.,]\d+)?")
+YEAR_RE = re.compile(r"\b\d{4}\b")
+# Repairs are done field by field; more errors than this means a broken item
+MAX_REPAIR_ROUNDS = 3
+
+
+def list_field(list_model: type[BaseModel]) -> Optional[str]:
+    """Name of the only field of models like ListBooks/ListVideos (None for other models)."""
+    fields = list_model.model_fields
+    if len(fields) != 1:
+        return None
+    name, field = next(iter(fields.items()))
+    item_model = typing.get_args(field.annotation)[0] if typing.get_origin(field.annotation) is list else None
+    return name if isinstance(item_model, type) and issubclass(item_model, BaseModel) else None
+
+
+def item_model_of(list_model: type[BaseModel], field: str) -> type[BaseModel]:
+    return typing.get_args(list_model.model_fields[field].annotation)[0]
+
+
+def base_type(annotation: Any) -> Any:
+    """`Optional[list[str]]` -> `list`, `Optional[int]` -> `int`."""
+    args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+    if typing.get_origin(annotation) is typing.Union and len(args) == 1:
+        annotation = args[0]
+    return typing.get_origin(annotation) or annotation
+
+
+def coerce(annotation: Any, name: str, value: Any) -> Any:
+    """Best-effort conversion of a wrongly typed value; returns None when it can't."""
+    target = base_type(annotation)
+    if value is None:
+        return None
+    if target is list:
+        if isinstance(value, str):
+            return [part.strip() for part in value.split(",") if part.strip()]
+        if isinstance(value, list):
+            return [str(v) if not isinstance(v, (dict, list)) else json.dumps(v, ensure_ascii=False) for v in value if v is not None]
+        return [str(value)]
+    if target is str:
+        if isinstance(value, list):
+            return ", ".join(str(v) for v in value)
+        if isinstance(value, (int, float, bool, Decimal)):
+            return str(value)
+        return None
+    if target is int and isinstance(value, str):
+        # "1999-2001", "2019 (TV)", "320 pages"
+        match = YEAR_RE.search(value) if "year" in name else NUMBER_RE.search(value)
+        return int(float(match.group().replace(",", "."))) if match else None
+    if target in (float, Decimal) and isinstance(value, str):
+        # "4.2/5", "8,1"
+        match = NUMBER_RE.search(value)
+        if match is None:
+            return None
+        try:
+            return target(match.group().replace(",", "."))
+        except (InvalidOperation, ValueError):
+            return None
+    return None
+
+
+def repair_item(raw: Any, item_model: type[BaseModel], identity: tuple[str, ...] = ("title",)) -> tuple[Optional[BaseModel], bool]:
+    """Validates one item, fixing the fields that fail when possible.
+
+    Wrongly typed values are coerced; optional fields that still fail are
+    dropped; missing required text/list fields become empty. Items whose
+    identity fields (or required numbers, such as a video's release_year)
+    can't be fixed are discarded. Returns (item or None, repaired).
+    """
+    if not isinstance(raw, dict):
+        return None, False
+    data = dict(raw)
+    repaired = False
+    for _ in range(MAX_REPAIR_ROUNDS):
+        try:
+            return item_model.model_validate(data), repaired
+        except ValidationError as e:
+            errors = e.errors()
+        for error in errors:
+            name = error["loc"][0] if error["loc"] else None
+            field = item_model.model_fields.get(name)
+            if field is None:
+                data.pop(name, None)
+                continue
+            if name in identity:
+                return None, False
+            value = coerce(field.annotation, name, data.get(name))
+            if value is None and field.is_required():
+                target = base_type(field.annotation)
+                if target is str:
+                    value = ""
+                elif target is list:
+                    value = []
+                else:
+                    return None, False
+            data[name] = value
+        repaired = True
+    return None, False
+
+
+class RepairReport(NamedTuple):
+    content: Any
+    kept: int = 0
+    repaired: int = 0
+    dropped: int = 0
+    truncated: bool = False
+
+    def missing(self, expected: int) -> int:
+        """Items lost to parsing: the dropped ones, plus the rest up to
+        `expected` when the output was cut off."""
+        if self.truncated:
+            return max(expected - self.kept, self.dropped)
+        return self.dropped
+
+
+def strip_fence(text: str) -> str:
+    starts = [index for index in (text.find("{"), text.find("[")) if index >= 0]
+    return text[min(starts):] if starts else text
+
+
+def parse_list(list_model: type[BaseModel], content: Any) -> RepairReport:
+    """Tolerant parsing of a model answer for a ListBooks/ListVideos model.
+
+    Valid items are kept, broken ones repaired or dropped one at a time, and
+    when the JSON was cut off the complete items before the cut are kept.
+    Content that is not a string (already parsed) is returned as is.
+    """
+    field = list_field(list_model)
+    if field is None or not isinstance(content, str):
+        kept = len(getattr(content, field)) if field and isinstance(content, list_model) else 0
+        return RepairReport(content, kept=kept)
+
+    item_model = item_model_of(list_model, field)
+    text = strip_fence(content.strip())
+    truncated = False
+    try:
+        data = json.loads(text)
+        raw_items = data.get(field, []) if isinstance(data, dict) else data
+    except ValueError:
+        # streaming imports this module, so its parser is imported here
+        from streaming import IncrementalItemParser
+
+        # Cut-off (or otherwise broken) JSON: keep every complete object
+        truncated = True
+        raw_items = list(IncrementalItemParser().feed(text))
+    if not isinstance(raw_items, list):
+        raw_items = []
+
+    items, repaired, dropped = [], 0, 0
+    for raw in raw_items:
+        item, was_repaired = repair_item(raw, item_model)
+        if item is None:
+            dropped += 1
+            continue
+        items.append(item)
+        repaired += was_repaired
+    # With nothing usable the raw text is kept, so callers still see an invalid response
+    content = list_model(**{field: items}) if items else content
+    return RepairReport(content, len(items), repaired, dropped, truncated)
+
+
+def merge_reports(list_model: type[BaseModel], field: str, first: RepairReport, second: RepairReport) -> RepairReport:
+    """Appends the items of a follow-up run (duplicates are collapsed by the dedupe stage);
+    the counts are the follow-up's, i.e. what is still missing."""
+    items = [
+        item for report in (first, second) if isinstance(report.content, list_model)
+        for item in getattr(report.content, field)
+    ]
+    if not items and not isinstance(first.content, list_model):
+        return second
+    return RepairReport(
+        list_model(**{field: items}),
+        kept=len(items),
+        repaired=second.repaired,
+        dropped=second.dropped,
+        truncated=second.truncated,
+    )
+
+
+def reprompt(prompt: str, content: Any, field: str, missing: int) -> str:
+    titles = [item.title for item in getattr(content, field, None) or []] if isinstance(content, BaseModel) else []
+    already = f"You already recommended: {'; '.join(titles)}. " if titles else ""
+    return (
+        f"{prompt}\n\n{already}Recommend only {missing} more, different ones, "
+        f"with every field filled in (this replaces the minimum of 12 recommendations per query)."
+    )
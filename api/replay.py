@@ -0,0 +1,267 @@
+"""Replays the runs recorded by RunStore.
+
+`warm` rebuilds the response cache (and, in the server, the semantic caches)
+from the latest successful runs, so a fresh deploy starts warm. `score`
+re-parses every recorded raw output with the current parser and reports
+item counts, repairs, duplicates, empty fields, latency, tool calls and
+tokens per agent, model and system prompt version (so the savings of a
+prompt change can be read side by side), without calling Gemini or Exa.
+
+    python replay.py score --db runs.db --since 7d --output report.json
+    python replay.py warm --db runs.db --backend sqlite --cache-path response_cache.db
+"""
+import argparse
+import json
+import sys
+import time
+from typing import Optional
+
+from pydantic import BaseModel
+
+from dedupe import dedupe_items, dedupe_list
+from fanout import SIMILARITY_GROUPS
+from models import ListBooks, ListVideos
+from repair import RepairReport, item_model_of, list_field, merge_reports, parse_list
+from run_store import RunStore
+
+LIST_MODELS = {model.__name__: model for model in (ListBooks, ListVideos)}
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_duration(text: str) -> float:
+    """Seconds from "30d", "12h", "90m" or a plain number."""
+    text = text.strip().lower()
+    if text and text[-1] in DURATION_UNITS:
+        return float(text[:-1]) * DURATION_UNITS[text[-1]]
+    return float(text)
+
+
+def base_key(key: str) -> str:
+    # Fan-out runs are recorded as "<cache key>|<similarity group>|<fan-out id>"
+    return key.split("|", 1)[0]
+
+
+def complete_fanout(runs: list[dict]) -> list[dict]:
+    """Group runs of the newest fan-out request whose groups all succeeded
+    (runs newest first); empty when there is none."""
+    requests: dict[str, dict[str, dict]] = {}
+    for run in runs:
+        parts = run["key"].split("|")
+        # Runs recorded before the fan-out id can't be matched to their request
+        if len(parts) == 3:
+            requests.setdefault(parts[2], {}).setdefault(parts[1], run)
+    for groups in requests.values():
+        if len(groups) == len(SIMILARITY_GROUPS):
+            return list(groups.values())
+    return []
+
+
+def excluded_title(key: str) -> str:
+    # "similar:<media type>:<title>": the seed title never appears in its own list
+    return key.split(":", 2)[2] if key.count(":") >= 2 else ""
+
+
+def run_content(run: dict) -> Optional[BaseModel]:
+    list_model = LIST_MODELS.get(run.get("response_model") or "")
+    if list_model is None or not run.get("parsed"):
+        return None
+    return list_model.model_validate(run["parsed"])
+
+
+def merge_contents(contents: list[BaseModel]) -> BaseModel:
+    list_model = type(contents[0])
+    field = list_field(list_model)
+    return list_model(**{field: [item for content in contents for item in getattr(content, field)]})
+
+
+def warm_caches(
+    run_store: RunStore,
+    response_cache=None,
+    semantic_caches: Optional[dict] = None,
+    response_ttl: float = 7 * 24 * 3600,
+    semantic_ttl: float = 24 * 3600,
+    dedupe_threshold: float = 0.85,
+) -> dict:
+    """Refills the caches with the latest successful run per key still within
+    the cache TTL; entries expire when the original answer would have.
+
+    "similar" runs go to the response cache under their cache key (fan-out
+    groups merged back into one list, only when every group of the same
+    request succeeded), single custom prompts to the semantic cache of their
+    list model. Fan-out runs of custom prompts are skipped: each only holds
+    one group of the answer.
+    """
+    now = time.time()
+    similar: dict[str, list[dict]] = {}
+    custom: list[dict] = []
+    for run in run_store.latest_results(since=now - max(response_ttl, semantic_ttl)):
+        key = run["key"]
+        if key is None:
+            custom.append(run)
+        elif key.startswith("similar:"):
+            similar.setdefault(base_key(key), []).append(run)
+
+    warmed = {"response_cache": 0, "semantic_cache": 0}
+    if response_cache is not None:
+        for key, runs in similar.items():
+            # Newest answer wins; a fan-out answer is made of the group runs of one request
+            newest = runs[0]
+            if "|" in newest["key"]:
+                runs = complete_fanout([run for run in runs if "|" in run["key"] and run["agent"] == newest["agent"]])
+            else:
+                runs = [newest]
+            if not runs:
+                continue
+            contents = [content for content in map(run_content, runs) if content is not None]
+            ttl = response_ttl - (now - min(run["created_at"] for run in runs))
+            if not contents or ttl <= 0:
+                continue
+            content = merge_contents(contents)
+            field = list_field(type(content))
+            content = dedupe_list(content, field, dedupe_threshold, (excluded_title(key),))
+            if getattr(content, field):
+                response_cache.set(key, content, ttl=ttl)
+                warmed["response_cache"] += 1
+
+    if semantic_caches:
+        # Oldest first, so the newest answer wins when two prompts share an entry
+        for run in reversed(custom):
+            content = run_content(run)
+            cache = semantic_caches.get(type(content)) if content is not None else None
+            ttl = semantic_ttl - (now - run["created_at"])
+            if cache is None or ttl <= 0:
+                continue
+            cache.set(run["prompt"], dedupe_list(content, list_field(type(content)), dedupe_threshold), ttl=ttl)
+            warmed["semantic_cache"] += 1
+    return warmed
+
+
+def empty_fields(items: list[BaseModel]) -> int:
+    return sum(1 for item in items for value in item.model_dump().values() if value in (None, "", []))
+
+
+def score_run(run: dict, dedupe_threshold: float = 0.85) -> dict:
+    """Re-parses a run's raw outputs with the current parser."""
+    list_model = LIST_MODELS.get(run.get("response_model") or "")
+    score = {
+        "status": run["status"],
+        "seconds": run["seconds"] or 0.0,
+        "tool_calls": len(run.get("tool_calls") or []),
+        "tokens": run["timings"].get("tokens", {}),
+        "recorded_items": run["items"],
+    }
+    if list_model is None:
+        return score
+
+    field = list_field(list_model)
+    report = None
+    for raw in run.get("raw_output") or []:
+        current = parse_list(list_model, raw) if isinstance(raw, str) else RepairReport(raw)
+        if report is None:
+            report = current
+        else:
+            report = merge_reports(list_model, field, report, current)._replace(
+                repaired=report.repaired + current.repaired,
+                dropped=report.dropped + current.dropped,
+                truncated=report.truncated or current.truncated,
+            )
+    items = getattr(report.content, field) if report is not None and isinstance(report.content, list_model) else []
+    unique = dedupe_items(items, dedupe_threshold)
+    score.update({
+        "items": len(unique),
+        "repaired": report.repaired if report else 0,
+        "dropped": report.dropped if report else 0,
+        "truncated": bool(report and report.truncated),
+        "duplicates": len(items) - len(unique),
+        "empty_fields": empty_fields(unique),
+        "fields": len(item_model_of(list_model, field).model_fields) * len(unique),
+    })
+    return score
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(round(q * (len(values) - 1))), len(values) - 1)]
+
+
+def group_name(run: dict) -> str:
+    # Runs of different system prompts are kept apart, so a prompt change shows up as two rows
+    version = run["timings"].get("prompt_version")
+    return f"{run['agent']} / {run['model']}" + (f" / prompt {version}" if version else "")
+
+
+def score_runs(runs, dedupe_threshold: float = 0.85) -> dict:
+    """Aggregates `score_run` per "agent / model / prompt version"."""
+    groups: dict[str, list[dict]] = {}
+    for run in runs:
+        groups.setdefault(group_name(run), []).append(score_run(run, dedupe_threshold))
+
+    report = {}
+    for name, scores in sorted(groups.items()):
+        ok = [score for score in scores if score["status"] == "ok"]
+        listed = [score for score in ok if "items" in score]
+        seconds = [score["seconds"] for score in ok]
+        fields = sum(score["fields"] for score in listed)
+        report[name] = {
+            "runs": len(scores),
+            "errors": len(scores) - len(ok),
+            "items_mean": sum(score["items"] for score in listed) / len(listed) if listed else 0.0,
+            "items_changed": sum(1 for score in listed if score["items"] != score["recorded_items"]),
+            "repaired_items": sum(score["repaired"] for score in listed),
+            "dropped_items": sum(score["dropped"] for score in listed),
+            "truncated_runs": sum(score["truncated"] for score in listed),
+            "duplicates": sum(score["duplicates"] for score in listed),
+            "empty_field_ratio": sum(score["empty_fields"] for score in listed) / fields if fields else 0.0,
+            "seconds_p50": percentile(seconds, 0.50),
+            "seconds_p95": percentile(seconds, 0.95),
+            "tool_calls_mean": sum(score["tool_calls"] for score in ok) / len(ok) if ok else 0.0,
+            "input_tokens": sum(score["tokens"].get("input", 0) for score in ok),
+            "output_tokens": sum(score["tokens"].get("output", 0) for score in ok),
+            "input_tokens_per_run": sum(score["tokens"].get("input", 0) for score in ok) / len(ok) if ok else 0.0,
+            "output_tokens_per_run": sum(score["tokens"].get("output", 0) for score in ok) / len(ok) if ok else 0.0,
+        }
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=("score", "warm", "prune"))
+    parser.add_argument("--db", default="runs.db", help="run store path (RUN_STORE_PATH)")
+    parser.add_argument("--since", type=parse_duration, help="only runs newer than this (e.g. 7d)")
+    parser.add_argument("--agent", help="only runs of this agent (score)")
+    parser.add_argument("--output", help="write the score report as JSON")
+    parser.add_argument("--backend", default="sqlite", help="response cache backend to warm: sqlite or redis")
+    parser.add_argument("--cache-path", default="response_cache.db")
+    parser.add_argument("--redis-url")
+    parser.add_argument("--ttl", type=parse_duration, default=7 * 86400, help="response cache TTL (warm)")
+    parser.add_argument("--older-than", type=parse_duration, default=30 * 86400, help="retention (prune)")
+    args = parser.parse_args()
+
+    run_store = RunStore(args.db)
+    if args.command == "score":
+        since = time.time() - args.since if args.since else None
+        report = score_runs(run_store.iter_runs(since=since, agent=args.agent))
+        for name, values in report.items():
+            print(name)
+            for metric, value in values.items():
+                print(f"  {metric:>18}: {value:.3f}" if isinstance(value, float) else f"  {metric:>18}: {value}")
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+    elif args.command == "warm":
+        # The semantic caches live in the server's memory; only the shared response cache is warmed here
+        from response_cache import ResponseCache, create_backend
+
+        response_cache = ResponseCache(
+            create_backend(args.backend, path=args.cache_path, redis_url=args.redis_url), ttl=args.ttl
+        )
+        print(warm_caches(run_store, response_cache, response_ttl=args.ttl))
+    else:
+        print(f"{run_store.prune(args.older_than)} runs removed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+import asyncio
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional, Type, TypeVar
+
+from pydantic import BaseModel
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+LEADING_ARTICLES = ("the", "a", "an")
+
+
+def normalize_title(title: str) -> str:
+    """Normalizes a title so "The Hobbit", "hobbit" and "  Hobbit!" share a key."""
+    text = unicodedata.normalize("NFKD", title)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^\w\s]", " ", text.casefold())
+    words = text.split()
+    if len(words) > 1 and words[0] in LEADING_ARTICLES:
+        words = words[1:]
+    return " ".join(words)
+
+
+def similar_cache_key(media_type: str, title: str) -> str:
+    return f"similar:{normalize_title(media_type)}:{normalize_title(title)}"
+
+
+# Backends store serialized JSON strings and handle TTL and eviction themselves.
+
+class MemoryBackend:
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """Shared by the worker processes of one host through a SQLite file.
+
+    Reads don't write: the keys they hit are kept in memory and their
+    `accessed_at` is updated in one batch every `touch_interval` seconds (and
+    before evicting). Eviction runs every `evict_every` sets (a tenth of
+    `max_entries`), so the table may briefly hold that many extra entries.
+    """
+
+    def __init__(self, path: str, max_entries: int = 1000, touch_interval: float = 1.0):
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self.evict_every = max(1, max_entries // 10)
+        self._lock = threading.Lock()
+        self._touched: dict[str, float] = {}
+        self._touched_at = time.time()
+        self._sets = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS response_cache_accessed ON response_cache (accessed_at)")
+
+    def _flush_touches(self, now: float) -> None:
+        self._touched_at = now
+        if not self._touched:
+            return
+        touched, self._touched = self._touched, {}
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.executemany(
+                "UPDATE response_cache SET accessed_at = MAX(accessed_at, ?) WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in touched.items()],
+            )
+        finally:
+            self._conn.execute("COMMIT")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                return None
+            self._touched[key] = now
+            if now - self._touched_at >= self.touch_interval:
+                self._flush_touches(now)
+            return row[0]
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._touched.pop(key, None)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl, now),
+            )
+            self._sets += 1
+            if self._sets % self.evict_every:
+                return
+            self._flush_touches(now)
+            self._conn.execute("DELETE FROM response_cache WHERE expires_at < ?", (now,))
+            self._conn.execute(
+                "DELETE FROM response_cache WHERE key IN ("
+                "SELECT key FROM response_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._touched.pop(key, None)
+            self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+
+class RedisBackend:
+    """Any Redis-compatible server (Redis, Valkey, KeyDB...). TTL is native; LRU
+    eviction is left to the server's `maxmemory-policy allkeys-lru`, so there
+    is no entry limit: the size of each cache depends on the server's
+    `maxmemory` and eviction policy. Each cache uses its own key prefix."""
+
+    def __init__(self, url: str, prefix: str = "media-rec:"):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("`redis` not installed. Please install using `pip install redis`")
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+
+    def get(self, key: str) -> Optional[str]:
+        return self._client.get(self.prefix + key)
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        self._client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+    def delete(self, key: str) -> None:
+        self._client.delete(self.prefix + key)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self._client.scan_iter(match=self.prefix + "*"))
+
+
+def create_backend(
+    name: str,
+    max_entries: int = 1000,
+    path: str = "response_cache.db",
+    redis_url: Optional[str] = None,
+    namespace: str = "responses",
+):
+    """`max_entries` applies to memory and sqlite; with redis, `namespace`
+    keeps the keys (and the entry count) of each cache apart."""
+    if name == "memory":
+        return MemoryBackend(max_entries=max_entries)
+    if name == "sqlite":
+        return SQLiteBackend(path, max_entries=max_entries)
+    if name == "redis":
+        return RedisBackend(redis_url or "redis://localhost:6379/0", prefix=f"media-rec:{namespace}:")
+    raise ValueError(f"Unknown cache backend: {name}")
+
+
+class ResponseCache:
+    """Typed cache over a backend. The async `aget`/`aset` run shared backends
+    (SQLite, Redis) in a thread, so request handlers never block the event loop."""
+
+    def __init__(self, backend, ttl: float = 86400):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._blocking = not isinstance(backend, MemoryBackend)
+
+    async def _call(self, fn, *args):
+        return await asyncio.to_thread(fn, *args) if self._blocking else fn(*args)
+
+    def get(self, key: str, model: Type[ModelT]) -> Optional[ModelT]:
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return model.model_validate_json(value)
+
+    def set(self, key: str, value: BaseModel, ttl: Optional[float] = None) -> None:
+        self.backend.set(key, value.model_dump_json(), self.ttl if ttl is None else ttl)
+
+    async def aget(self, key: str, model: Type[ModelT]) -> Optional[ModelT]:
+        return await self._call(self.get, key, model)
+
+    async def aset(self, key: str, value: BaseModel, ttl: Optional[float] = None) -> None:
+        await self._call(self.set, key, value, ttl)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,100 @@
+import json
+import threading
+from typing import NamedTuple, Optional
+
+from catalog import Catalog
+from metrics import ROUTE_DECISIONS, ROUTE_SECONDS
+
+FAST = "fast"
+FULL = "full"
+
+
+class Route(NamedTuple):
+    tier: str
+    reason: str
+    # Prompt for the chosen tier (the fast tier gets the catalog records inlined)
+    prompt: str
+
+
+class ModelRouter:
+    """Picks the model tier per request.
+
+    A "similar" request whose seed title is in the catalog, with at least
+    `min_catalog_hits` related records, goes to the fast tier: one call to a
+    cheaper model without tools, over those records. Everything else (custom
+    prompts, fan-out, catalog misses) goes to the full tier with Exa search.
+    Every decision is logged with its latency and outcome; a fast answer with
+    fewer than `min_items` items is escalated to the full tier.
+    """
+
+    def __init__(
+        self,
+        catalog: Catalog,
+        enabled: bool = True,
+        min_catalog_hits: int = 6,
+        context_items: int = 20,
+        min_items: int = 8,
+    ):
+        self.catalog = catalog
+        self.enabled = enabled
+        self.min_catalog_hits = min_catalog_hits
+        self.context_items = context_items
+        self.min_items = min_items
+        self._lock = threading.Lock()
+        # (kind, tier, outcome) -> [count, total seconds]
+        self._outcomes: dict[tuple[str, str, str], list] = {}
+        self.decisions: dict[str, int] = {FAST: 0, FULL: 0}
+
+    def _decide(self, kind: str, route: Route) -> Route:
+        ROUTE_DECISIONS.inc(kind=kind, tier=route.tier, reason=route.reason)
+        with self._lock:
+            self.decisions[route.tier] += 1
+        return route
+
+    def route_custom(self, kind: str, prompt: str) -> Route:
+        return self._decide(kind, Route(FULL, "custom_prompt", prompt))
+
+    def route_similar(self, kind: str, title: str, prompt: str, fanout: bool = False) -> Route:
+        if not self.enabled:
+            return self._decide(kind, Route(FULL, "disabled", prompt))
+        if fanout:
+            return self._decide(kind, Route(FULL, "fanout", prompt))
+        seed = self.catalog.lookup(kind, title)
+        if seed is None:
+            return self._decide(kind, Route(FULL, "catalog_miss", prompt))
+        related = self.catalog.related(kind, seed, limit=self.context_items)
+        if len(related) < self.min_catalog_hits:
+            return self._decide(kind, Route(FULL, "few_catalog_hits", prompt))
+
+        noun = "book" if kind == "book" else "movie or tv show"
+        fast_prompt = (
+            f"{prompt}\n\n"
+            f"Catalog record of the {noun} asked about:\n{json.dumps(seed, ensure_ascii=False)}\n\n"
+            f"Related catalog records:\n{json.dumps(related, ensure_ascii=False)}"
+        )
+        return self._decide(kind, Route(FAST, "catalog_hit", fast_prompt))
+
+    def escalate(self, kind: str, prompt: str) -> Route:
+        return self._decide(kind, Route(FULL, "escalated", prompt))
+
+    def should_escalate(self, route: Route, items: Optional[int]) -> bool:
+        return route.tier == FAST and (items is None or items < self.min_items)
+
+    def observe(self, kind: str, route: Route, seconds: float, outcome: str) -> None:
+        ROUTE_SECONDS.observe(seconds, kind=kind, tier=route.tier, outcome=outcome)
+        with self._lock:
+            entry = self._outcomes.setdefault((kind, route.tier, outcome), [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {
+                "enabled": self.enabled,
+                "fast": self.decisions[FAST],
+                "full": self.decisions[FULL],
+            }
+            for (kind, tier, outcome), (count, total) in self._outcomes.items():
+                stats[f"{kind}_{tier}_{outcome}_count"] = count
+                stats[f"{kind}_{tier}_{outcome}_avg_seconds"] = total / count
+        return stats
@@ -0,0 +1,165 @@
+import json
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Iterator, Optional
+
+
+class RunStore:
+    """Append-only log of agent runs in a SQLite file.
+
+    Each row keeps the searchable metadata (agent, model, key, prompt,
+    status, timings) in columns and the bulky part (tool calls with their
+    results, raw model output, parsed result) as one zlib-compressed JSON
+    blob. `record` only enqueues; a background thread writes in batches so
+    agent runs never wait on the disk.
+    """
+
+    def __init__(self, path: str, batch_size: int = 50):
+        self.path = path
+        self.batch_size = batch_size
+        self.written = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            "id INTEGER PRIMARY KEY, created_at REAL NOT NULL, agent TEXT NOT NULL, model TEXT, "
+            "response_model TEXT, key TEXT, prompt TEXT NOT NULL, status TEXT NOT NULL, error TEXT, "
+            "items INTEGER, seconds REAL, timings TEXT NOT NULL, trace BLOB NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS runs_created_at ON runs (created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS runs_key ON runs (key, created_at)")
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._writer = threading.Thread(target=self._write_loop, name="run-store-writer", daemon=True)
+        self._writer.start()
+
+    def record(self, run: dict) -> None:
+        """Queues a run: agent, prompt, status and created_at are required;
+        model, response_model, key, error, items, seconds, timings,
+        tool_calls, raw_output and parsed are optional."""
+        self._idle.clear()
+        self._queue.put(run)
+
+    @staticmethod
+    def _row(run: dict) -> tuple:
+        trace = {name: run.get(name) for name in ("tool_calls", "raw_output", "parsed")}
+        return (
+            run["created_at"], run["agent"], run.get("model"), run.get("response_model"), run.get("key"),
+            run["prompt"], run["status"], run.get("error"), run.get("items"), run.get("seconds"),
+            json.dumps(run.get("timings") or {}),
+            zlib.compress(json.dumps(trace, ensure_ascii=False, default=str).encode(), 6),
+        )
+
+    def _write_loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                rows = [self._row(run) for run in batch]
+                with self._lock:
+                    self._conn.execute("BEGIN")
+                    self._conn.executemany(
+                        "INSERT INTO runs (created_at, agent, model, response_model, key, prompt, status, error, "
+                        "items, seconds, timings, trace) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        rows,
+                    )
+                    self._conn.execute("COMMIT")
+                self.written += len(rows)
+            except Exception as e:
+                self.errors += len(batch)
+                print(f"Error details: run store: {str(e)}")
+            if self._queue.empty():
+                self._idle.set()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Waits until every queued run is written."""
+        return self._idle.wait(timeout)
+
+    @staticmethod
+    def decode(row: sqlite3.Row) -> dict:
+        run = dict(row)
+        run["timings"] = json.loads(run["timings"])
+        run.update(json.loads(zlib.decompress(run.pop("trace"))))
+        return run
+
+    def iter_runs(
+        self,
+        since: Optional[float] = None,
+        agent: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[dict]:
+        """Runs in insertion order, optionally filtered."""
+        conditions, params = [], []
+        for column, value in (("created_at >=", since), ("agent =", agent), ("status =", status)):
+            if value is not None:
+                conditions.append(f"{column} ?")
+                params.append(value)
+        sql = "SELECT * FROM runs" + (" WHERE " + " AND ".join(conditions) if conditions else "") + " ORDER BY id"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        # A separate connection, so long scans don't hold the writer's lock
+        conn = sqlite3.connect(self.path)
+        conn.row_factory = sqlite3.Row
+        try:
+            for row in conn.execute(sql, params):
+                yield self.decode(row)
+        finally:
+            conn.close()
+
+    def latest_results(self, since: float) -> Iterator[dict]:
+        """Latest successful run with a parsed result per (agent, key, prompt), newest first."""
+        conn = sqlite3.connect(self.path)
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute(
+                "SELECT * FROM runs WHERE id IN ("
+                "SELECT MAX(id) FROM runs WHERE status = 'ok' AND items > 0 AND created_at >= ? "
+                "GROUP BY agent, key, CASE WHEN key IS NULL THEN prompt END) ORDER BY id DESC",
+                (since,),
+            )
+            for row in rows:
+                yield self.decode(row)
+        finally:
+            conn.close()
+
+    def prune(self, older_than: float) -> int:
+        with self._lock:
+            return self._conn.execute("DELETE FROM runs WHERE created_at < ?", (time.time() - older_than,)).rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def stats(self) -> dict:
+        return {
+            "runs": len(self),
+            "written": self.written,
+            "pending": self._queue.qsize(),
+            "errors": self.errors,
+        }
+
+
+def tool_calls_of(response: Any) -> list[dict]:
+    """Tool calls of an agno RunResponse: name, arguments, seconds and result."""
+    calls = []
+    for tool in getattr(response, "tools", None) or []:
+        metrics = getattr(tool, "metrics", None)
+        calls.append({
+            "name": tool.tool_name,
+            "args": tool.tool_args,
+            "seconds": getattr(metrics, "time", None),
+            "error": bool(tool.tool_call_error),
+            "result": tool.result,
+        })
+    return calls
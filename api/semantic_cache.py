@@ -0,0 +1,258 @@
+import asyncio
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Optional, Type, TypeVar
+
+import numpy as np
+from pydantic import BaseModel
+
+from response_cache import normalize_title
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+WORD_RE = re.compile(r"\w+")
+
+# Words that carry no meaning for "what should I read/watch next" prompts
+STOPWORDS = frozenset(
+    "a an and are as at be by can for from i in is it like me my "
+    "of on or recommend recommendations similar some something suggest that the to "
+    "want what with you".split()
+)
+
+# Media type words: "movies like X" and "tv shows like X" are different requests
+MEDIA_TYPES = {
+    "book": "book", "books": "book", "novel": "book", "novels": "book",
+    "movie": "movie", "movies": "movie", "film": "movie", "films": "movie",
+    "tv": "tv", "show": "tv", "shows": "tv", "series": "tv",
+}
+
+# "unlike X" / "not X" / "without X" ask for the opposite of "like X"
+NEGATIONS = frozenset("unlike not without no except nothing never".split())
+
+
+class HashedNgramEmbedder:
+    """Dependency-free embedding: word unigrams, word bigrams and character
+    trigrams hashed into a fixed number of signed buckets (the hashing trick),
+    L2-normalized so a dot product is the cosine similarity.
+
+    Media types and negations are few words that change the whole request, so
+    each group is hashed into its own vector, weighted as much as (negations:
+    twice as much as) all the other features together. Prompts that differ
+    only in them score at most ~0.71 and never reach the cache threshold."""
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    def _features(self, text: str) -> tuple[list[str], list[str], list[str]]:
+        words = WORD_RE.findall(normalize_title(text))
+        media = [f"m:{MEDIA_TYPES[w]}" for w in words if w in MEDIA_TYPES]
+        # A negação vale junto com a palavra seguinte ("not horror" != "not sci")
+        negations = [f"n:{w}_{next_word}" for w, next_word in zip(words, words[1:] + [""]) if w in NEGATIONS]
+        words = [w for w in words if w not in STOPWORDS and w not in MEDIA_TYPES and w not in NEGATIONS]
+        features = [f"w:{w}" for w in words]
+        features += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"#{word}#"
+            features += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+        return features, media, negations
+
+    def _hash(self, features: list[str]) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in features:
+            # crc32 instead of hash() so vectors are stable across processes
+            h = zlib.crc32(feature.encode())
+            vector[h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed(self, text: str) -> np.ndarray:
+        features, media, negations = self._features(text)
+        vector = self._hash(features) + self._hash(media) + 2 * self._hash(negations)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class SentenceTransformerEmbedder:
+    """Local CPU embedding model (e.g. all-MiniLM-L6-v2) via sentence-transformers."""
+
+    def __init__(self, model_name: str):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise ImportError(
+                "`sentence-transformers` not installed. Please install using `pip install sentence-transformers`"
+            )
+        self._model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self._model.get_sentence_embedding_dimension()
+
+    def embed(self, text: str) -> np.ndarray:
+        return self._model.encode(text, normalize_embeddings=True).astype(np.float32)
+
+
+class SQLiteSemanticStore:
+    """Append-only log of semantic cache entries shared by the worker
+    processes of a host; each worker replays the rows it has not seen yet
+    into its own matrix."""
+
+    # Expired rows are deleted every this many inserts
+    PURGE_EVERY = 500
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._inserts = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS semantic_entries ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, namespace TEXT NOT NULL, vector BLOB NOT NULL, "
+            "value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS semantic_entries_namespace ON semantic_entries (namespace, id)")
+
+    def add(self, namespace: str, vector: np.ndarray, value: str, expires_at: float) -> int:
+        with self._lock:
+            self._inserts += 1
+            if self._inserts % self.PURGE_EVERY == 0:
+                self._conn.execute("DELETE FROM semantic_entries WHERE expires_at < ?", (time.time(),))
+            return self._conn.execute(
+                "INSERT INTO semantic_entries (namespace, vector, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, vector.astype(np.float32).tobytes(), value, expires_at),
+            ).lastrowid
+
+    def since(self, namespace: str, last_id: int) -> list[tuple[int, np.ndarray, str, float]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, vector, value, expires_at FROM semantic_entries "
+                "WHERE namespace = ? AND id > ? AND expires_at > ? ORDER BY id",
+                (namespace, last_id, time.time()),
+            ).fetchall()
+        return [(id, np.frombuffer(vector, dtype=np.float32), value, expires_at) for id, vector, value, expires_at in rows]
+
+
+class SemanticCache:
+    """Caches responses by prompt meaning instead of exact text.
+
+    Embeddings live in a preallocated (max_entries x dim) matrix, so a lookup
+    is one matrix-vector product (exact cosine search). When full, the least
+    recently used entry is overwritten.
+
+    With a `store`, entries set by any worker are written to it and pulled
+    into the other workers' matrices (at most every `sync_interval` seconds).
+    The async `aget`/`aset` run in a thread when there is a store or the
+    embedder is a model, so request handlers never block the event loop.
+    """
+
+    def __init__(
+        self,
+        embedder,
+        threshold: float = 0.85,
+        max_entries: int = 5000,
+        ttl: float = 86400,
+        store: Optional[SQLiteSemanticStore] = None,
+        namespace: str = "default",
+        sync_interval: float = 1.0,
+    ):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = store
+        self.namespace = namespace
+        self.sync_interval = sync_interval
+        self._last_id = 0
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+        self._matrix = np.zeros((max_entries, embedder.dim), dtype=np.float32)
+        self._values: list[Optional[str]] = [None] * max_entries
+        self._expires_at = np.zeros(max_entries)
+        self._last_used = np.zeros(max_entries)
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self._blocking = store is not None or not isinstance(embedder, HashedNgramEmbedder)
+
+    async def _call(self, fn, *args):
+        return await asyncio.to_thread(fn, *args) if self._blocking else fn(*args)
+
+    def _best_match(self, vector: np.ndarray) -> tuple[int, float]:
+        if self._size == 0:
+            return -1, 0.0
+        scores = self._matrix[:self._size] @ vector
+        scores[self._expires_at[:self._size] < time.time()] = -1.0
+        index = int(np.argmax(scores))
+        return index, float(scores[index])
+
+    def _sync(self) -> None:
+        now = time.time()
+        if self.store is None or now - self._synced_at < self.sync_interval:
+            return
+        self._synced_at = now
+        try:
+            rows = self.store.since(self.namespace, self._last_id)
+        except sqlite3.Error as e:
+            print(f"Error details: semantic cache sync: {str(e)}")
+            return
+        for id, vector, value, expires_at in rows:
+            if vector.shape[0] == self.embedder.dim:
+                self._put(vector, value, expires_at, now)
+            self._last_id = id
+
+    def get(self, prompt: str, model: Type[ModelT]) -> Optional[ModelT]:
+        vector = self.embedder.embed(prompt)
+        with self._lock:
+            self._sync()
+            index, score = self._best_match(vector)
+            if index < 0 or score < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._last_used[index] = time.time()
+            value = self._values[index]
+        return model.model_validate_json(value)
+
+    def _put(self, vector: np.ndarray, value: str, expires_at: float, now: float) -> None:
+        index, score = self._best_match(vector)
+        if index < 0 or score < 0.999:
+            if self._size < self.max_entries:
+                index = self._size
+                self._size += 1
+            else:
+                index = int(np.argmin(np.where(self._expires_at < now, -1.0, self._last_used)))
+        self._matrix[index] = vector
+        self._values[index] = value
+        self._expires_at[index] = expires_at
+        self._last_used[index] = now
+
+    def set(self, prompt: str, value: BaseModel, ttl: Optional[float] = None) -> None:
+        vector = self.embedder.embed(prompt)
+        now = time.time()
+        value = value.model_dump_json()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._put(vector, value, expires_at, now)
+        if self.store is not None:
+            try:
+                self.store.add(self.namespace, vector, value, expires_at)
+            except sqlite3.Error as e:
+                print(f"Error details: semantic cache store: {str(e)}")
+
+    async def aget(self, prompt: str, model: Type[ModelT]) -> Optional[ModelT]:
+        return await self._call(self.get, prompt, model)
+
+    async def aset(self, prompt: str, value: BaseModel, ttl: Optional[float] = None) -> None:
+        await self._call(self.set, prompt, value, ttl)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "shared": self.store is not None,
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,94 @@
+import gzip
+import json
+from decimal import Decimal
+from typing import Any, Optional
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# "string" keeps Decimal ratings exact ("4.1"), the format FastAPI's default
+# encoding produced; "float" writes them as JSON numbers (4.1).
+DECIMAL_POLICIES = ("string", "float")
+
+
+def decimal_default(policy: str):
+    def default(value: Any):
+        if isinstance(value, Decimal):
+            return str(value) if policy == "string" else float(value)
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+    return default
+
+
+def encode_json(content: Any, decimal_policy: str = "string") -> bytes:
+    """Encodes already validated models without validating them again.
+
+    With the "string" policy pydantic-core serializes the model directly
+    (the same output as FastAPI's `response_model` path); with "float" the
+    model is dumped to Python and encoded with orjson (json if missing).
+    """
+    if decimal_policy not in DECIMAL_POLICIES:
+        raise ValueError(f"Unknown decimal policy: {decimal_policy}")
+    if isinstance(content, BaseModel):
+        if decimal_policy == "string":
+            # Straight to bytes (model_dump_json would decode to str first)
+            return content.__pydantic_serializer__.to_json(content)
+        content = content.model_dump()
+    default = decimal_default(decimal_policy)
+    if orjson is not None:
+        return orjson.dumps(content, default=default)
+    return json.dumps(content, default=default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        # Quality 4 keeps most of the size gain at a fraction of the CPU of 11
+        return brotli.compress(body, quality=4)
+    return gzip.compress(body, compresslevel=5)
+
+
+class FastJSONResponse(Response):
+    """JSON response for already validated models (bypasses FastAPI's
+    `response_model` re-validation), compressed when the body is at least
+    `min_size` bytes and the client accepts gzip or brotli."""
+
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        content: Any,
+        accept_encoding: str = "",
+        decimal_policy: str = "string",
+        min_size: Optional[int] = None,
+        **kwargs,
+    ):
+        body = encode_json(content, decimal_policy)
+        headers = dict(kwargs.pop("headers", None) or {})
+        encoding = choose_encoding(accept_encoding) if min_size is not None and len(body) >= min_size else None
+        if encoding is not None:
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+        if min_size is not None:
+            headers["Vary"] = "Accept-Encoding"
+        super().__init__(body, headers=headers, **kwargs)
+
+    def render(self, content: Any) -> bytes:
+        return content
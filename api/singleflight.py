@@ -0,0 +1,69 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+import deadlines
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.casefold().split())
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into a single execution.
+
+    The first caller starts the work as a task; callers arriving while it is in
+    flight await the same task and share its result (or exception). The task is
+    shielded, so a disconnecting caller does not cancel the run for the others;
+    it is cancelled once no caller waits for it anymore.
+
+    Each caller waits under its own deadline (deadlines.py). The task runs
+    under a SharedDeadline of all its callers, not the first caller's.
+    """
+
+    def __init__(self):
+        self._in_flight: dict[Hashable, tuple[asyncio.Task, deadlines.SharedDeadline]] = {}
+        self.executions = 0
+        self.coalesced = 0
+        self.waiters = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._in_flight.get(key)
+        if flight is None:
+            self.executions += 1
+            shared = deadlines.SharedDeadline()
+            task = asyncio.get_running_loop().create_task(fn(), context=deadlines.shared_context(shared))
+            self._in_flight[key] = task, shared
+            task.add_done_callback(lambda _: self._finished(key, task))
+            joined = False
+        else:
+            task, shared = flight
+            self.coalesced += 1
+            self.waiters += 1
+            joined = True
+
+        deadline = deadlines.current()
+        shared.join(deadline)
+        try:
+            return await deadlines.wait_for_deadline(asyncio.shield(task))
+        finally:
+            shared.leave(deadline)
+            if joined:
+                self.waiters -= 1
+            # Ninguém mais espera o resultado
+            if not shared.members and not task.done():
+                task.cancel()
+
+    def _finished(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key, (None,))[0] is task:
+            del self._in_flight[key]
+        # Callers that gave up (deadline, disconnect) no longer await the task: mark its error as seen
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._in_flight),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "waiters": self.waiters,
+        }
@@ -0,0 +1,84 @@
+import json
+from typing import Any, AsyncIterator, Iterator, Type
+
+from pydantic import BaseModel
+
+from repair import repair_item
+
+
+class IncrementalItemParser:
+    """Pulls complete objects out of a JSON array while the text is still arriving.
+
+    The first array found in the stream is treated as the item list, so both
+    `{"books": [{...}, {...}]}` and a bare `[{...}, {...}]` work, with or
+    without a markdown fence around them. Each object is returned as soon as
+    its closing brace arrives.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escaped = False
+        self._items_depth = None
+        self._item_start = None
+
+    def feed(self, chunk: str) -> Iterator[dict]:
+        self._buffer += chunk
+        while self._pos < len(self._buffer):
+            char = self._buffer[self._pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "[{":
+                if char == "[" and self._items_depth is None:
+                    self._items_depth = len(self._stack) + 1
+                elif char == "{" and len(self._stack) == self._items_depth:
+                    self._item_start = self._pos
+                self._stack.append(char)
+            elif char in "]}" and self._stack:
+                self._stack.pop()
+                if char == "}" and self._item_start is not None and len(self._stack) == self._items_depth:
+                    raw = self._buffer[self._item_start:self._pos + 1]
+                    self._item_start = None
+                    try:
+                        item = json.loads(raw)
+                    except ValueError:
+                        item = None
+                    if isinstance(item, dict):
+                        yield item
+            self._pos += 1
+
+        # Drop text that can no longer be part of a pending item
+        keep_from = self._item_start if self._item_start is not None else self._pos
+        self._buffer = self._buffer[keep_from:]
+        self._pos -= keep_from
+        if self._item_start is not None:
+            self._item_start = 0
+
+
+async def stream_items(chunks: AsyncIterator[str], item_model: Type[BaseModel]) -> AsyncIterator[BaseModel]:
+    """Validates each parsed object against `item_model`, repairing or skipping invalid ones."""
+    parser = IncrementalItemParser()
+    async for chunk in chunks:
+        for raw_item in parser.feed(chunk):
+            item, _ = repair_item(raw_item, item_model)
+            if item is None:
+                print(f"Skipping invalid {item_model.__name__}: {str(raw_item.get('title', ''))[:80]}")
+                continue
+            yield item
+
+
+def ndjson_line(payload: Any) -> str:
+    return json.dumps(payload, ensure_ascii=False) + "\n"
+
+
+def sse_event(event: str, payload: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
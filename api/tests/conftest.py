@@ -0,0 +1,38 @@
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+# Throwaway stores and fake credentials, set before recommendation_api reads its config
+STATE_DIR = tempfile.mkdtemp(prefix="media-rec-tests-")
+os.environ.update({
+    "CLIENT_API_KEY": "test",
+    "API_KEY_GEMINI": "test",
+    "API_KEY_EXA": "test",
+    "AGNO_TELEMETRY": "false",
+    "SHARED_STATE": "memory",
+    "RUN_STORE_ENABLED": "false",
+    "RUN_STORE_WARM_ON_STARTUP": "false",
+    "ROUTING_ENABLED": "false",
+    "HEDGE_ENABLED": "false",
+    "CATALOG_PATH": os.path.join(STATE_DIR, "catalog.db"),
+    "JOB_STORE_PATH": os.path.join(STATE_DIR, "jobs.db"),
+    "RUN_STORE_PATH": os.path.join(STATE_DIR, "runs.db"),
+})
+os.environ.pop("API_KEY_TRACELOOP", None)
+
+
+def book(i, **fields) -> dict:
+    return {
+        "title": f"Book {i}", "author": "Author", "similarity_type": "genre & themes",
+        "publication_year": "2001", "explanation": "why", "genre": ["📚 Fiction"], "plot_summary": "plot",
+        **fields,
+    }
+
+
+def fake_request(path: str = "/books/recommendations/similar", **headers) -> SimpleNamespace:
+    """What the helpers of recommendation_api read from a FastAPI request."""
+    return SimpleNamespace(url=SimpleNamespace(path=path), headers=headers)
@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, MemoryCounterStore, QueueFullError, SQLiteCounterStore
+
+
+def controller(**kwargs) -> AdmissionController:
+    return AdmissionController(MemoryCounterStore(), **kwargs)
+
+
+def test_limit_grows_additively_and_shrinks_multiplicatively():
+    admission = controller(initial_limit=4, max_limit=8, cooldown=0)
+    for _ in range(4):
+        admission.increase()
+    assert 4.9 < admission.limit < 5.0
+    admission.decrease()
+    assert 2.4 < admission.limit < 2.5
+    for _ in range(10):
+        admission.decrease()
+    assert admission.limit == admission.min_limit
+
+
+def test_decreases_within_cooldown_count_once():
+    admission = controller(initial_limit=8, cooldown=60)
+    admission.observe_upstream("api.exa.ai", 429, 0.1)
+    admission.observe_upstream("api.exa.ai", 503, 0.1)
+    admission.observe_upstream("api.exa.ai", 200, 0.1)
+    assert admission.limit == 4
+    assert (admission.decreases, admission.throttled) == (1, 2)
+
+
+def test_slow_runs_shrink_and_fast_runs_grow_the_limit():
+    async def main():
+        admission = controller(initial_limit=4, latency_target=1.0, cooldown=0)
+        await admission.acquire()
+        await admission.release(0.1)
+        grown = admission.limit
+        await admission.acquire()
+        await admission.release(5.0)
+        return grown, admission.limit
+
+    grown, shrunk = asyncio.run(main())
+    assert grown == pytest.approx(4.25)
+    assert shrunk == pytest.approx(2.125)
+
+
+def test_runs_over_the_limit_wait_for_a_slot():
+    async def main():
+        admission = controller(initial_limit=1, max_limit=1, queue_timeout=5)
+        order = []
+
+        async def run(name, seconds):
+            async with admission.slot():
+                order.append(name)
+                await asyncio.sleep(seconds)
+
+        await asyncio.gather(run("a", 0.05), run("b", 0))
+        return order, admission.stats()
+
+    order, stats = asyncio.run(main())
+    assert order == ["a", "b"]
+    assert (stats["admitted"], stats["rejected"], stats["in_flight"]) == (2, 0, 0)
+
+
+def test_full_queue_is_shed_with_retry_after():
+    async def main():
+        admission = controller(initial_limit=1, max_limit=1, max_queue=1, queue_timeout=5)
+        await admission.acquire()
+        waiter = asyncio.ensure_future(admission.acquire())
+        await asyncio.sleep(0.01)
+        assert admission.should_shed()
+        with pytest.raises(QueueFullError) as error:
+            await admission.acquire()
+        await admission.release()
+        await waiter
+        await admission.release()
+        return error.value, admission.rejected
+
+    error, rejected = asyncio.run(main())
+    assert error.retry_after >= 1
+    assert rejected == 1
+
+
+def test_estimated_wait_past_the_queue_timeout_is_shed():
+    async def main():
+        admission = controller(initial_limit=1, max_limit=1, queue_timeout=1)
+        await admission.acquire()
+        admission.avg_run_seconds = 10.0
+        with pytest.raises(QueueFullError) as error:
+            await admission.acquire()
+        return error.value
+
+    assert asyncio.run(main()).retry_after == 10
+
+
+def test_no_slot_within_the_queue_timeout_is_rejected():
+    async def main():
+        admission = controller(initial_limit=1, max_limit=1, queue_timeout=0.05, poll_interval=0.01)
+        await admission.acquire()
+        with pytest.raises(QueueFullError):
+            await admission.acquire()
+        return admission.timed_out
+
+    assert asyncio.run(main()) == 1
+
+
+def test_sqlite_store_shares_counters_and_keeps_the_learned_limit(tmp_path):
+    path = str(tmp_path / "admission.db")
+    first = AdmissionController(SQLiteCounterStore(path), initial_limit=2, max_limit=2)
+    second = AdmissionController(SQLiteCounterStore(path), initial_limit=8)
+
+    async def main():
+        await first.acquire()
+        assert second.store.try_acquire(second.COUNTER, 2)
+        assert not second.store.try_acquire(second.COUNTER, 2)
+
+    asyncio.run(main())
+    assert second.limit == 2
+    assert second.store.total(second.COUNTER) == 2
@@ -0,0 +1,174 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import recommendation_api as api
+from agent_runner import deadline_tool_hook
+from deadlines import (
+    DeadlineExceeded, current, deadline_expired, deadline_scope, iter_within_deadline, offer, wait_for_deadline,
+)
+from exa_client import CachedExaTools
+from models import ListBooks
+from response_cache import MemoryBackend
+from tool_cache import ToolCache
+
+from conftest import book, fake_request
+
+
+def test_tool_hook_calls_the_tool_without_deadline():
+    assert deadline_tool_hook(None, "search_exa", lambda query: f"found {query}", {"query": "dune"}) == "found dune"
+
+
+def test_tool_hook_skips_calls_after_the_deadline():
+    called = []
+    with deadline_scope(0.01):
+        time.sleep(0.02)
+        result = deadline_tool_hook(None, "search_exa", lambda: called.append(1), {})
+    assert result.startswith("Error: request deadline exceeded")
+    assert called == []
+
+
+def test_tool_hook_calls_the_tool_before_the_deadline():
+    with deadline_scope(5):
+        assert deadline_tool_hook(None, "search_exa", lambda: "ok", {}) == "ok"
+
+
+@pytest.fixture
+def exa_tools():
+    return CachedExaTools(ToolCache(MemoryBackend()), api_key="test", timeout=30)
+
+
+def test_exa_call_is_cut_at_the_deadline_without_changing_the_toolkit(exa_tools):
+    started_at = time.perf_counter()
+    with deadline_scope(0.2):
+        with pytest.raises(TimeoutError):
+            exa_tools._execute_with_timeout(time.sleep, 0.5)
+    assert time.perf_counter() - started_at < 0.4
+    # The toolkit is shared by every run: its own timeout stays as configured
+    assert exa_tools.timeout == 30
+
+
+def test_exa_search_after_timeout_returns_an_uncached_error(exa_tools, monkeypatch):
+    monkeypatch.setattr(exa_tools.exa, "search_and_contents", lambda *args, **kwargs: time.sleep(0.5))
+    with deadline_scope(0.1):
+        result = exa_tools.search_exa("books like dune")
+    assert result.startswith("Error")
+    assert exa_tools.cache.stats()["stored"] == 0
+
+
+def test_deadline_scope_sets_and_resets_the_deadline():
+    assert current() is None
+    with deadline_scope(0.01) as deadline:
+        offer(ListBooks(books=[book(1)]))
+        offer("not a list")
+        time.sleep(0.02)
+        assert deadline_expired()
+    assert current() is None
+    assert [item.title for item in deadline.partial(ListBooks).books] == ["Book 1"]
+
+
+def test_iter_within_deadline_stops_a_stalled_producer():
+    async def items():
+        yield 1
+        await asyncio.sleep(5)
+        yield 2
+
+    async def main():
+        received = []
+        with pytest.raises(TimeoutError):
+            async for item in iter_within_deadline(items(), 0.1):
+                received.append(item)
+        return received
+
+    assert asyncio.run(main()) == [1]
+
+
+async def no_cached():
+    return None
+
+
+def run_within_deadline(work, cached=no_cached):
+    return asyncio.run(api.within_deadline(fake_request(), 0.1, ListBooks, work, cached))
+
+
+def test_within_deadline_returns_the_answer_unflagged():
+    async def work():
+        return ListBooks(books=[book(1)])
+
+    content, partial = run_within_deadline(work)
+    assert partial is None
+    assert len(content.books) == 1
+
+
+def test_within_deadline_flags_cached_fallback():
+    cached = ListBooks(books=[book("cached")])
+
+    async def work():
+        await asyncio.sleep(1)
+
+    async def from_cache():
+        return cached
+
+    content, partial = run_within_deadline(work, cached=from_cache)
+    assert content == cached
+    assert partial == "cached"
+
+
+def test_within_deadline_flags_partial_answer():
+    async def work():
+        offer(ListBooks(books=[book("first group")]))
+        await asyncio.sleep(1)
+
+    content, partial = run_within_deadline(work)
+    assert [item.title for item in content.books] == ["Book first group"]
+    assert partial == "deadline"
+
+
+def test_within_deadline_raises_with_nothing_to_return():
+    async def work():
+        await asyncio.sleep(1)
+
+    with pytest.raises(DeadlineExceeded):
+        run_within_deadline(work)
+
+
+@pytest.mark.parametrize("partial", ["cached", "deadline"])
+def test_list_response_marks_fallback_answers(partial):
+    response = asyncio.run(api.list_response(fake_request(), ListBooks(books=[book(1)]), ListBooks, partial=partial))
+    assert response.headers["X-Partial-Result"] == partial
+
+
+def test_list_response_leaves_complete_answers_unmarked():
+    response = asyncio.run(api.list_response(fake_request(), ListBooks(books=[book(1)]), ListBooks))
+    assert "X-Partial-Result" not in response.headers
+
+
+def test_caller_without_deadline_outlives_a_shared_run_deadline(monkeypatch):
+    async def execute_agent(agent, prompt, expected_items=None, record_key=None):
+        # Like AgentRunner: model calls stop at the deadline the run sees
+        await wait_for_deadline(asyncio.sleep(0.3))
+        return SimpleNamespace(content=ListBooks(books=[book(prompt)]))
+
+    async def ensure_agents():
+        pass
+
+    monkeypatch.setattr(api, "execute_agent", execute_agent)
+    monkeypatch.setattr(api, "ensure_agents", ensure_agents)
+
+    async def main():
+        # An endpoint with a deadline and a job/batch caller without one share the run
+        endpoint = api.within_deadline(
+            fake_request(), 0.1, ListBooks, lambda: api.similar_books("Shared Flight"), no_cached
+        )
+        async def job():
+            # Joins the run the endpoint started
+            await asyncio.sleep(0.02)
+            return await api.similar_books("Shared Flight")
+
+        return await asyncio.gather(endpoint, job(), return_exceptions=True)
+
+    endpoint, job = asyncio.run(main())
+    assert isinstance(endpoint, DeadlineExceeded)
+    assert len(job.books) == 1
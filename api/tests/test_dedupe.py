@@ -0,0 +1,59 @@
+from models import ListBooks, ListVideos
+from dedupe import Deduplicator, dedupe_items, dedupe_list, title_key
+
+from conftest import book
+
+
+def video(i, **fields) -> dict:
+    return {
+        "title": f"Video {i}", "type": "Movie", "similarity_type": "genre & themes", "explanation": "why",
+        "actors": ["Actor"], "genre": ["🎬 Drama"], "release_year": 2000, "plot_summary": "plot",
+        **fields,
+    }
+
+
+def test_title_key_drops_series_notes_and_articles():
+    assert title_key("The Expanse: Leviathan Wakes (The Expanse #1)") == title_key("expanse leviathan wakes")
+    assert title_key("(Untitled)") == "untitled"
+
+
+def test_near_duplicate_titles_are_merged():
+    books = ListBooks(books=[
+        book(1, title="Leviathan Wakes", author="James S. A. Corey", awards=["Hugo nominee"]),
+        book(2, title="Leviathan Wakes (The Expanse #1)", author="Corey, James S. A.", page_count=592),
+        book(3, title="Leviathan Wake", author="James Corey", awards=["Locus nominee"]),
+    ])
+    merged = dedupe_list(books, "books")
+    assert len(merged.books) == 1
+    assert merged.books[0].page_count == 592
+    assert merged.books[0].awards == ["Hugo nominee", "Locus nominee"]
+
+
+def test_numbers_authors_and_years_keep_works_apart():
+    books = ListBooks(books=[
+        book(1, title="Dune Messiah 2", author="Frank Herbert"),
+        book(2, title="Dune Messiah 3", author="Frank Herbert"),
+        book(3, title="Dune Messiah 2", author="Brian Herbert"),
+        book(4, title="Foundation", author="Isaac Asimov"),
+        book(5, title="Foundation", author="Someone Else"),
+    ])
+    assert [b.title for b in dedupe_list(books, "books").books] == ["Dune Messiah 2", "Dune Messiah 3", "Foundation", "Foundation"]
+
+    videos = ListVideos(videos=[
+        video(1, title="Dune", release_year=1984),
+        video(2, title="Dune", release_year=2021),
+        video(3, title="Dune.", release_year=2022),
+    ])
+    assert [v.release_year for v in dedupe_list(videos, "videos").videos] == [1984, 2021]
+
+
+def test_seed_titles_are_excluded():
+    deduplicator = Deduplicator(exclude_titles=["The Hobbit"])
+    assert not deduplicator.add(ListBooks(books=[book(1, title="Hobbit!")]).books[0])
+    assert deduplicator.add(ListBooks(books=[book(2, title="The Silmarillion")]).books[0])
+    assert (deduplicator.excluded, deduplicator.merged, len(deduplicator.items)) == (1, 0, 1)
+
+
+def test_many_distinct_items_are_kept():
+    items = ListBooks(books=[book(i, title=f"Completely Different Title {i} of the saga") for i in range(500)]).books
+    assert len(dedupe_items(items + items)) == 500
@@ -0,0 +1,64 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import recommendation_api as api
+from fanout import SIMILARITY_GROUPS, fan_out
+from models import ListBooks
+from response_cache import similar_cache_key
+
+from conftest import book
+
+
+def run_groups(failing=()):
+    async def run_group(group_prompt, group):
+        if group in failing:
+            raise RuntimeError(f"{group} failed")
+        return ListBooks(books=[book(group)])
+    return run_group
+
+
+def test_all_groups_merged_and_complete():
+    content, complete = asyncio.run(fan_out(run_groups(), "prompt", ListBooks, "books"))
+    assert [item.title for item in content.books] == [f"Book {group}" for group in SIMILARITY_GROUPS]
+    assert complete
+
+
+def test_failed_group_left_out_and_incomplete():
+    content, complete = asyncio.run(fan_out(run_groups(failing=SIMILARITY_GROUPS[:1]), "prompt", ListBooks, "books"))
+    assert len(content.books) == len(SIMILARITY_GROUPS) - 1
+    assert not complete
+
+
+def test_error_raised_when_no_group_answers():
+    with pytest.raises(RuntimeError):
+        asyncio.run(fan_out(run_groups(failing=SIMILARITY_GROUPS), "prompt", ListBooks, "books"))
+
+
+@pytest.fixture
+def group_runs(monkeypatch):
+    """Replaces the agent runs of fan-out groups; groups in `failing` raise."""
+    failing = set()
+
+    async def run_agent(agent, prompt, flight_key=None, expected_items=None, record_key=None):
+        group = next(group for group in SIMILARITY_GROUPS if f"by {group}." in prompt)
+        if group in failing:
+            raise RuntimeError(f"{group} failed")
+        return SimpleNamespace(content=ListBooks(books=[book(f"{flight_key} {group}")]))
+
+    monkeypatch.setattr(api, "run_agent", run_agent)
+    return failing
+
+
+def test_complete_fanout_answer_is_cached(group_runs):
+    content = asyncio.run(api.similar_books("Fanout Complete", fanout=True))
+    assert len(content.books) == len(SIMILARITY_GROUPS)
+    assert api.response_cache.get(similar_cache_key("book", "Fanout Complete"), ListBooks) == content
+
+
+def test_fanout_answer_missing_a_group_is_not_cached(group_runs):
+    group_runs.add(SIMILARITY_GROUPS[0])
+    content = asyncio.run(api.similar_books("Fanout Partial", fanout=True))
+    assert len(content.books) == len(SIMILARITY_GROUPS) - 1
+    assert api.response_cache.get(similar_cache_key("book", "Fanout Partial"), ListBooks) is None
@@ -0,0 +1,45 @@
+import asyncio
+
+from hedging import Hedger
+
+
+def hedger(**kwargs) -> Hedger:
+    return Hedger(min_samples=3, min_delay=0.05, max_ratio=1.0, **kwargs)
+
+
+def test_hedged_run_records_latency_from_the_first_start():
+    h = hedger()
+    for _ in range(3):
+        h.observe("Shelfie", 0.05, expected_items=12)
+    calls = []
+
+    async def fn():
+        calls.append(len(calls))
+        # The first run hangs; the hedge answers quickly
+        await asyncio.sleep(1 if len(calls) == 1 else 0.02)
+        return len(calls)
+
+    assert asyncio.run(h.run("Shelfie", fn, expected_items=12)) == 2
+    assert (h.hedged, h.hedge_wins) == (1, 1)
+    latest = h._seconds[("Shelfie", 12)][-1]
+    assert latest >= 0.07
+
+
+def test_windows_are_kept_per_expected_item_count():
+    h = hedger()
+    for _ in range(3):
+        h.observe("Shelfie", 10.0, expected_items=12)
+    assert h.delay("Shelfie", 12) == 10.0
+    assert h.delay("Shelfie", 4) is None
+    assert h.stats()["delay_seconds"] == {"Shelfie/12": 10.0}
+
+
+def test_unhedged_runs_are_observed():
+    h = hedger()
+
+    async def fn():
+        return "ok"
+
+    assert asyncio.run(h.run("Shelfie", fn, expected_items=4)) == "ok"
+    assert len(h._seconds[("Shelfie", 4)]) == 1
+    assert h.hedged == 0
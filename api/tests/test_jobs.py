@@ -0,0 +1,123 @@
+import asyncio
+import functools
+import os
+import subprocess
+import sys
+
+import httpx
+import pytest
+
+import jobs
+from jobs import QUEUED, RUNNING, SUCCEEDED, JobQueue, JobStore, check_callback_url, pin_address
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "jobs.db")
+
+
+def test_claim_marks_job_running(path):
+    store = JobStore(path)
+    job_id = store.insert("books/similar", {"book_title": "Dune"}, None, ttl=60)
+    job = store.claim(job_id)
+    assert job["status"] == RUNNING
+    assert job["attempts"] == 1
+    assert job["worker"] == os.getpid()
+
+
+def test_claim_recovers_job_after_restart_with_same_pid(path):
+    job_id = JobStore(path).insert("books/similar", {}, None, ttl=60)
+    assert JobStore(path).claim(job_id) is not None
+    # The restarted process got the same pid back: its old job is reclaimed
+    job = JobStore(path).claim(job_id)
+    assert job is not None
+    assert job["attempts"] == 2
+
+
+def test_claim_recovers_job_of_dead_worker(path):
+    store = JobStore(path)
+    job_id = store.insert("books/similar", {}, None, ttl=60)
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    store.update(job_id, status=RUNNING, worker=dead.pid)
+    assert store.claim(job_id) is not None
+
+
+def test_claim_skips_job_of_live_worker(path):
+    store = JobStore(path)
+    job_id = store.insert("books/similar", {}, None, ttl=60)
+    store.update(job_id, status=RUNNING, worker=os.getppid())
+    assert store.claim(job_id) is None
+
+
+def test_claim_skips_finished_and_expired_jobs(path):
+    store = JobStore(path)
+    finished = store.insert("books/similar", {}, None, ttl=60)
+    store.update(finished, status=SUCCEEDED)
+    expired = store.insert("books/similar", {}, None, ttl=-1)
+    assert store.claim(finished) is None
+    assert store.claim(expired) is None
+    assert store.get(expired) is None
+
+
+def test_unfinished_lists_queued_and_running(path):
+    store = JobStore(path)
+    queued = store.insert("books/similar", {}, None, ttl=60)
+    running = store.insert("books/similar", {}, None, ttl=60)
+    store.claim(running)
+    done = store.insert("books/similar", {}, None, ttl=60)
+    store.update(done, status=SUCCEEDED)
+    assert store.unfinished() == [queued, running]
+    assert store.get(queued)["status"] == QUEUED
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1:8000/hook",
+    "http://localhost/hook",
+    "http://169.254.169.254/latest/meta-data",
+    "http://10.0.0.5/hook",
+    "http://[::1]/hook",
+    "ftp://127.0.0.1/hook",
+    "not a url",
+])
+def test_check_callback_url_rejects_internal_and_invalid_urls(url):
+    with pytest.raises(ValueError):
+        check_callback_url(url)
+
+
+def test_check_callback_url_allowlist():
+    assert check_callback_url("https://hooks.example.com/done", ["hooks.example.com"]) is None
+    with pytest.raises(ValueError):
+        check_callback_url("https://other.example.com/done", ["hooks.example.com"])
+
+
+def test_check_callback_url_returns_the_checked_address():
+    assert check_callback_url("https://93.184.216.34/done") == "93.184.216.34"
+
+
+def test_pin_address_keeps_host_header_and_server_name():
+    url, headers, extensions = pin_address("https://user:pw@hooks.example.com:8443/done?x=1", "93.184.216.34")
+    assert url == "https://user:pw@93.184.216.34:8443/done?x=1"
+    assert headers == {"Host": "hooks.example.com:8443"}
+    assert extensions == {"sni_hostname": "hooks.example.com"}
+
+    url, headers, extensions = pin_address("http://hooks.example.com/done", "2606:2800:220:1::1")
+    assert (url, headers, extensions) == ("http://[2606:2800:220:1::1]/done", {"Host": "hooks.example.com"}, {})
+    assert pin_address("https://hooks.example.com/done", None) == ("https://hooks.example.com/done", {}, {})
+
+
+def test_notify_posts_to_the_checked_address(tmp_path, monkeypatch):
+    requests = []
+    transport = httpx.MockTransport(lambda request: requests.append(request) or httpx.Response(200))
+    monkeypatch.setattr(jobs.httpx, "AsyncClient", functools.partial(httpx.AsyncClient, transport=transport))
+    queue = JobQueue(JobStore(str(tmp_path / "jobs.db")))
+
+    async def check_callback(url):
+        # The host would resolve to an internal address on a second lookup
+        return "93.184.216.34"
+
+    monkeypatch.setattr(queue, "check_callback", check_callback)
+    asyncio.run(queue._notify("https://hooks.example.com/done", {"status": "succeeded"}))
+    assert requests[0].url.host == "93.184.216.34"
+    assert requests[0].headers["host"] == "hooks.example.com"
+    assert requests[0].extensions["sni_hostname"] == "hooks.example.com"
@@ -0,0 +1,85 @@
+import asyncio
+import base64
+import json
+
+import pytest
+from fastapi import HTTPException
+
+import recommendation_api as api
+from models import Book, ListBooks
+from pagination import decode_cursor, encode_cursor, item_at, page, parse_fields, result_id, result_key
+
+from conftest import book, fake_request
+
+CONTENT = ListBooks(books=[book(i) for i in range(5)])
+RID = result_id(CONTENT)
+
+
+def raw_cursor(**payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def test_parse_fields():
+    assert parse_fields(Book, None) is None
+    assert parse_fields(Book, "title, author,title") == ("title", "author")
+    for fields in ("", "title,rating"):
+        with pytest.raises(ValueError):
+            parse_fields(Book, fields)
+
+
+def test_pages_follow_their_cursors():
+    first = page(CONTENT, RID, limit=2, fields=("title",))
+    assert first["books"] == [{"title": "Book 0"}, {"title": "Book 1"}]
+    assert (first["offset"], first["total"]) == (0, 5)
+
+    titles = [item["title"] for item in first["books"]]
+    cursor = first["next_cursor"]
+    while cursor is not None:
+        rid, offset, limit, fields = decode_cursor(cursor, Book, 50)
+        current = page(CONTENT, rid, offset, limit, fields)
+        titles += [item["title"] for item in current["books"]]
+        cursor = current["next_cursor"]
+    assert titles == [f"Book {i}" for i in range(5)]
+
+
+def test_result_id_is_content_addressed():
+    assert result_id(ListBooks(books=[book(i) for i in range(5)])) == RID
+    assert result_id(ListBooks(books=[book(1)])) != RID
+
+
+def test_item_at():
+    assert item_at(CONTENT, 4).title == "Book 4"
+    assert item_at(CONTENT, 5) is None
+    assert item_at(CONTENT, -1) is None
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64 json",
+    raw_cursor(o=0),
+    raw_cursor(r=RID, o=-3),
+    raw_cursor(r=RID, o="2"),
+    raw_cursor(r=RID, o=0, l=0),
+    raw_cursor(r=RID, o=0, l=-1),
+    raw_cursor(r=RID, o=0, l="x"),
+    raw_cursor(r=RID, o=0, l=51),
+    raw_cursor(r=RID, o=0, f=["rating"]),
+    raw_cursor(r=RID, o=0, f="title"),
+])
+def test_invalid_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, Book, 50)
+
+
+def test_result_page_answers_bad_cursors_with_400():
+    api.result_sets.set(result_key(ListBooks, RID), CONTENT)
+    response = asyncio.run(api.result_page(fake_request(), ListBooks, Book, encode_cursor(RID, 2, 2, ("title",)), None, None))
+    assert json.loads(response.body)["books"] == [{"title": "Book 2"}, {"title": "Book 3"}]
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(api.result_page(fake_request(), ListBooks, Book, raw_cursor(r=RID, o=0, l=0), None, None))
+    assert error.value.status_code == 400
+
+
+def test_expired_result_set_is_404():
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(api.result_page(fake_request(), ListBooks, Book, encode_cursor("missing", 0, 2, None), None, None))
+    assert error.value.status_code == 404
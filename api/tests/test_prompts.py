@@ -0,0 +1,52 @@
+from datetime import date
+
+from agno.agent import Agent
+from agno.models.message import Message, MessageMetrics
+from agno.run.messages import RunMessages
+
+from admission import AdmissionController, MemoryCounterStore
+from agent_runner import AgentRunner, run_copy
+from prompts import TRIM_MARKER, PromptAssembler
+
+
+def agent() -> Agent:
+    return Agent(name="Shelfie", description="Book recommendations", instructions="Search, then answer.")
+
+
+def runner(max_input_tokens: int) -> AgentRunner:
+    prompts = PromptAssembler(max_input_tokens=max_input_tokens, today=lambda: date(2025, 1, 1))
+    return AgentRunner(AdmissionController(MemoryCounterStore()), prompts=prompts)
+
+
+def with_model_calls(run_agent: Agent, *input_tokens: int) -> Agent:
+    run_agent.run_messages = RunMessages(messages=[
+        Message(role="assistant", metrics=MessageMetrics(input_tokens=tokens)) for tokens in input_tokens
+    ])
+    return run_agent
+
+
+def test_long_prompts_are_trimmed_to_the_budget():
+    prompts = PromptAssembler(max_input_tokens=50, today=lambda: date(2025, 1, 1))
+    message = prompts.assemble(agent(), "x" * 1000)
+    assert TRIM_MARKER in message
+    assert message.endswith("Today's date: 2025-01-01")
+    assert prompts.stats()["agents"]["Shelfie"]["trimmed"] == 1
+
+
+def test_tool_calls_are_refused_once_the_run_is_over_budget():
+    agent_runner = runner(max_input_tokens=1000)
+    run_agent = run_copy(agent(), agent_runner._hooks)
+    assert agent_runner._budget_tool_hook in run_agent.tool_hooks
+
+    calls = []
+    search = lambda **arguments: calls.append(arguments) or "results"
+    hook = agent_runner._budget_tool_hook
+    assert hook(with_model_calls(run_agent, 400, 500), "search_exa", search, {"query": "a"}) == "results"
+    refused = hook(with_model_calls(run_agent, 400, 700), "search_exa", search, {"query": "b"})
+    assert refused.startswith("Error: input token budget used")
+    assert calls == [{"query": "a"}]
+    assert agent_runner.prompts.stats()["agents"]["Shelfie"]["over_budget"] == 1
+
+
+def test_no_budget_hook_without_a_limit():
+    assert runner(max_input_tokens=0)._hooks == ()
@@ -0,0 +1,47 @@
+import json
+
+from models import ListBooks
+from repair import parse_list
+
+from conftest import book
+
+
+
+def test_valid_json_is_kept():
+    report = parse_list(ListBooks, json.dumps({"books": [book(1), book(2), book(3)]}))
+    assert [item.title for item in report.content.books] == ["Book 1", "Book 2", "Book 3"]
+    assert (report.kept, report.repaired, report.dropped, report.truncated) == (3, 0, 0, False)
+
+
+def test_cut_off_json_keeps_complete_items():
+    text = json.dumps({"books": [book(1), book(2), book(3)]})
+    report = parse_list(ListBooks, text[:-40])
+    assert [item.title for item in report.content.books] == ["Book 1", "Book 2"]
+    assert report.truncated
+
+
+def test_broken_items_are_repaired_or_dropped():
+    text = json.dumps({"books": [book(1, publication_year=2001), {"author": "No title"}, book(3, genre="🔮 Fantasy")]})
+    report = parse_list(ListBooks, text)
+    assert [item.title for item in report.content.books] == ["Book 1", "Book 3"]
+    assert report.content.books[0].publication_year == "2001"
+    assert report.content.books[1].genre == ["🔮 Fantasy"]
+    assert (report.kept, report.repaired, report.dropped) == (2, 2, 1)
+
+
+def test_fenced_json_is_parsed():
+    text = "```json\n" + json.dumps({"books": [book(1), book(2)]}) + "\n```"
+    assert len(parse_list(ListBooks, text).content.books) == 2
+
+
+def test_unusable_text_is_returned_as_is():
+    report = parse_list(ListBooks, "Sorry, I could not find anything.")
+    assert report.content == "Sorry, I could not find anything."
+    assert report.kept == 0
+
+
+def test_parsed_content_is_returned_as_is():
+    content = ListBooks(books=[book(1)])
+    report = parse_list(ListBooks, content)
+    assert report.content is content
+    assert report.kept == 1
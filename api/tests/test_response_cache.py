@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+import pytest
+
+from models import ListBooks
+from response_cache import MemoryBackend, ResponseCache, SQLiteBackend, create_backend, normalize_title, similar_cache_key
+
+from conftest import book
+
+
+@pytest.mark.parametrize("title", ["The Hobbit", "hobbit", "  Hobbit!", "THE HOBBIT.", "Thé Hobbit"])
+def test_title_variants_share_a_key(title):
+    assert similar_cache_key("book", title) == similar_cache_key("Book", "Hobbit")
+
+
+def test_normalize_title_keeps_meaningful_words():
+    assert normalize_title("The") == "the"
+    assert normalize_title("A Game of Thrones") == "game of thrones"
+    assert normalize_title("Breaking Bad") != normalize_title("Breaking")
+    assert similar_cache_key("movie", "Dune") != similar_cache_key("tv", "Dune")
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBackend(max_entries=2)
+    return SQLiteBackend(str(tmp_path / "cache.db"), max_entries=2)
+
+
+def test_least_recently_used_entry_is_evicted(backend):
+    backend.set("a", "1", ttl=60)
+    time.sleep(0.01)
+    backend.set("b", "2", ttl=60)
+    time.sleep(0.01)
+    assert backend.get("a") == "1"
+    time.sleep(0.01)
+    backend.set("c", "3", ttl=60)
+    assert backend.get("b") is None
+    assert (backend.get("a"), backend.get("c")) == ("1", "3")
+    assert len(backend) == 2
+
+
+def test_expired_entries_are_misses(backend):
+    backend.set("a", "1", ttl=-1)
+    assert backend.get("a") is None
+
+
+def test_response_cache_round_trip_and_stats():
+    cache = ResponseCache(MemoryBackend(), ttl=60)
+    assert cache.get("k", ListBooks) is None
+    cache.set("k", ListBooks(books=[book(1)]))
+    assert cache.get("k", ListBooks).books[0].title == "Book 1"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"], stats["hit_rate"]) == (1, 1, 1, 0.5)
+
+
+def test_sqlite_reads_touch_in_batches(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.db"), max_entries=100, touch_interval=60)
+    backend.set("a", "1", ttl=60)
+    accessed_at = lambda: backend._conn.execute("SELECT accessed_at FROM response_cache").fetchone()[0]
+    stored_at = accessed_at()
+    time.sleep(0.01)
+    assert backend.get("a") == "1"
+    assert accessed_at() == stored_at
+    backend.touch_interval = 0
+    backend.get("a")
+    assert accessed_at() > stored_at
+
+
+def test_response_cache_async_calls_use_shared_backends(tmp_path):
+    cache = ResponseCache(SQLiteBackend(str(tmp_path / "cache.db")), ttl=60)
+
+    async def main():
+        await cache.aset("k", ListBooks(books=[book(1)]))
+        return await cache.aget("k", ListBooks)
+
+    assert asyncio.run(main()).books[0].title == "Book 1"
+
+
+def test_redis_caches_get_their_own_prefix():
+    pytest.importorskip("redis")
+    responses = create_backend("redis", redis_url="redis://localhost:6379/0")
+    tools = create_backend("redis", redis_url="redis://localhost:6379/0", namespace="tools")
+    assert responses.prefix == "media-rec:responses:"
+    assert tools.prefix == "media-rec:tools:"
@@ -0,0 +1,39 @@
+import pytest
+
+from models import ListBooks
+from semantic_cache import HashedNgramEmbedder, SemanticCache
+
+from conftest import book
+
+NEAR_MISSES = [
+    ("movies like Breaking Bad", "tv shows like Breaking Bad"),
+    ("films like Arrival", "books like Arrival"),
+    ("sci-fi books unlike Project Hail Mary", "sci-fi books like Project Hail Mary"),
+    ("fantasy books without romance", "fantasy books with romance"),
+    ("thrillers like Gone Girl but not horror", "thrillers like Gone Girl but not comedy"),
+]
+
+PARAPHRASES = [
+    ("sci-fi books like Project Hail Mary", "Sci-Fi books similar to Project Hail Mary!"),
+    ("books like Dune", "recommend me books like the Dune"),
+    ("fantasy novels", "fantasy books"),
+]
+
+
+@pytest.mark.parametrize("a, b", NEAR_MISSES)
+def test_near_misses_stay_below_threshold(a, b):
+    embedder = HashedNgramEmbedder()
+    assert float(embedder.embed(a) @ embedder.embed(b)) < 0.85
+
+
+@pytest.mark.parametrize("a, b", PARAPHRASES)
+def test_paraphrases_match(a, b):
+    embedder = HashedNgramEmbedder()
+    assert float(embedder.embed(a) @ embedder.embed(b)) > 0.95
+
+
+def test_cache_does_not_serve_near_miss():
+    cache = SemanticCache(HashedNgramEmbedder(), max_entries=10)
+    cache.set("sci-fi books like Project Hail Mary", ListBooks(books=[book(1)]))
+    assert cache.get("sci-fi books unlike Project Hail Mary", ListBooks) is None
+    assert cache.get("Sci-Fi books similar to Project Hail Mary", ListBooks).books[0].title == "Book 1"
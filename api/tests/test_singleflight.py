@@ -0,0 +1,141 @@
+import asyncio
+import gc
+
+import pytest
+
+from deadlines import deadline_scope, offer
+from models import ListBooks
+from singleflight import SingleFlight
+
+from conftest import book
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", work) for _ in range(3)))
+
+    assert asyncio.run(main()) == ["result"] * 3
+    assert len(calls) == 1
+    assert flight.stats() == {"in_flight": 0, "executions": 1, "coalesced": 2, "waiters": 0}
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+
+    async def main():
+        return await asyncio.gather(flight.do("a", lambda: asyncio.sleep(0, "a")), flight.do("b", lambda: asyncio.sleep(0, "b")))
+
+    assert asyncio.run(main()) == ["a", "b"]
+    assert flight.executions == 2
+
+
+def test_error_is_shared_and_key_released():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        results = await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+        # A finished flight is not reused
+        again = await flight.do("key", lambda: asyncio.sleep(0, "ok"))
+        return results, again
+
+    results, again = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert again == "ok"
+    assert flight.executions == 2
+
+
+def test_cancelled_caller_does_not_cancel_the_run():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "result"
+
+
+def test_abandoned_failing_run_is_not_reported_as_unretrieved():
+    flight = SingleFlight()
+    reported = []
+
+    async def fail():
+        await asyncio.sleep(0.02)
+        raise ValueError("boom")
+
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: reported.append(context))
+        caller = asyncio.ensure_future(flight.do("key", fail))
+        await asyncio.sleep(0.005)
+        # Like a request giving up at its deadline
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0.05)
+        gc.collect()
+
+    asyncio.run(main())
+    assert reported == []
+
+
+def test_each_caller_waits_under_its_own_deadline():
+    flight = SingleFlight()
+
+    async def work():
+        offer(ListBooks(books=[book(1)]))
+        await asyncio.sleep(0.3)
+        return "result"
+
+    async def with_deadline(seconds):
+        with deadline_scope(seconds) as deadline:
+            try:
+                return await flight.do("key", work), deadline
+            except TimeoutError:
+                return "timeout", deadline
+
+    async def main():
+        return await asyncio.gather(with_deadline(0.1), flight.do("key", work), with_deadline(5))
+
+    (short, short_deadline), unbounded, (long, long_deadline) = asyncio.run(main())
+    # The first caller's deadline does not end the run for the others
+    assert (short, unbounded, long) == ("timeout", "result", "result")
+    # What the run offers reaches every caller's deadline
+    assert len(short_deadline.partial(ListBooks).books) == 1
+    assert len(long_deadline.partial(ListBooks).books) == 1
+
+
+def test_run_is_cancelled_when_every_caller_left():
+    flight = SingleFlight()
+    finished = []
+
+    async def work():
+        await asyncio.sleep(0.2)
+        finished.append(1)
+
+    async def main():
+        with deadline_scope(0.05):
+            with pytest.raises(TimeoutError):
+                await flight.do("key", work)
+        await asyncio.sleep(0.3)
+
+    asyncio.run(main())
+    assert finished == []
+    assert flight.stats()["in_flight"] == 0
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import recommendation_api as api
+from models import Book, ListBooks
+from response_cache import similar_cache_key
+
+from conftest import book
+
+
+@pytest.fixture
+def shedding(monkeypatch):
+    monkeypatch.setattr(api.admission, "should_shed", lambda: True)
+
+
+async def collect(items):
+    return [item.title async for item in items]
+
+
+def stream(title):
+    async def main():
+        items = await api.stream_recommendations(
+            api.book_recommendation_agent, api.similar_books_prompt(title), Book, ListBooks,
+            cache_key=similar_cache_key("book", title),
+        )
+        return await collect(items)
+    return asyncio.run(main())
+
+
+def test_cached_answers_stream_while_shedding(shedding):
+    api.response_cache.set(similar_cache_key("book", "Streamed Cached"), ListBooks(books=[book(1), book(2)]))
+    assert stream("Streamed Cached") == ["Book 1", "Book 2"]
+
+
+def test_custom_prompts_use_the_semantic_cache_while_shedding(shedding):
+    prompt = "slow burn gothic mysteries set in old libraries"
+    api.semantic_caches[ListBooks].set(prompt, ListBooks(books=[book(1)]))
+
+    async def main():
+        return await collect(await api.stream_recommendations(api.book_recommendation_agent, prompt, Book, ListBooks))
+
+    assert asyncio.run(main()) == ["Book 1"]
+
+
+def test_cache_miss_is_shed_with_503(shedding):
+    with pytest.raises(HTTPException) as error:
+        stream("Streamed Miss")
+    assert error.value.status_code == 503
+    assert "Retry-After" in error.value.headers
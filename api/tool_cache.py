@@ -0,0 +1,98 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from typing import Callable, Optional
+
+from response_cache import normalize_title
+
+WORD_RE = re.compile(r"\w+")
+
+# Function words only: "books like Dune" and "movies like Dune" must stay different searches
+QUERY_STOPWORDS = frozenset(
+    "a an and about as at by for from in into is of on or similar same than that the their to with like "
+    "me my i you some recommend recommendations suggest suggestions".split()
+)
+
+
+def normalize_query(query: str) -> str:
+    """Word set of a search query, so "Books similar to Project Hail Mary" and
+    "project hail mary books like" share a key."""
+    words = WORD_RE.findall(normalize_title(query))
+    return " ".join(sorted({word for word in words if word not in QUERY_STOPWORDS} or set(words)))
+
+
+class ToolCache:
+    """Caches tool call results (Exa searches) by tool, normalized arguments
+    and the toolkit options that change the result.
+
+    Values go to a response cache backend (memory; sqlite to keep them on
+    disk and share them between workers; redis), which applies the TTL and
+    the entry limit. Error results and results over `max_result_chars` are
+    not stored.
+    """
+
+    def __init__(self, backend, ttl: float = 86400, max_result_chars: int = 100_000):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_result_chars = max_result_chars
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.skipped = 0
+        self.miss_seconds = 0.0
+
+    def __deepcopy__(self, memo):
+        # agno deep-copies the tools of every run; all copies share the cache
+        return self
+
+    @staticmethod
+    def key(tool: str, args: dict, options: dict) -> str:
+        options_hash = hashlib.sha256(json.dumps(options, sort_keys=True, default=str).encode()).hexdigest()[:12]
+        return f"tools:{tool}:{json.dumps(args, sort_keys=True, ensure_ascii=False)}:{options_hash}"
+
+    def call(self, tool: str, args: dict, options: dict, run: Callable[[], str]) -> str:
+        key = self.key(tool, args, options)
+        try:
+            cached = self.backend.get(key)
+        except Exception as e:
+            print(f"Error details: tool cache: {str(e)}")
+            cached = None
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            return cached
+
+        started_at = time.perf_counter()
+        result = run()
+        with self._lock:
+            self.misses += 1
+            self.miss_seconds += time.perf_counter() - started_at
+            if not isinstance(result, str) or result.startswith("Error") or len(result) > self.max_result_chars:
+                self.skipped += 1
+                return result
+            self.stored += 1
+        try:
+            self.backend.set(key, result, self.ttl)
+        except Exception as e:
+            print(f"Error details: tool cache: {str(e)}")
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            avg_miss_seconds = self.miss_seconds / self.misses if self.misses else 0.0
+            return {
+                "backend": type(self.backend).__name__,
+                "entries": len(self.backend),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stored": self.stored,
+                "skipped": self.skipped,
+                "avg_miss_seconds": avg_miss_seconds,
+                # Estimated from the average time of an uncached call
+                "seconds_saved": self.hits * avg_miss_seconds,
+            }
@@ -0,0 +1,39 @@
+import functools
+
+# traceloop pulls in every OpenTelemetry instrumentation on import (~1 s), so it
+# is only imported by init_tracing() and by the first traced call.
+_enabled = False
+
+
+def init_tracing(api_key: str) -> None:
+    global _enabled
+    from traceloop.sdk import Traceloop
+
+    Traceloop.init(
+      disable_batch=True,
+      api_key=api_key
+    )
+    _enabled = True
+
+
+def agent(name: str):
+    """Lazy stand-in for `traceloop.sdk.decorators.agent`: a pass-through until
+    tracing is initialized, then the real decorator applied on first call."""
+
+    def decorator(func):
+        traced = None
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            nonlocal traced
+            if not _enabled:
+                return await func(*args, **kwargs)
+            if traced is None:
+                from traceloop.sdk.decorators import agent as traceloop_agent
+
+                traced = traceloop_agent(name=name)(func)
+            return await traced(*args, **kwargs)
+
+        return wrapper
+
+    return decorator